@@ -1,7 +1,22 @@
 from django.contrib import admin
-from .models import Mesa, Plato, Pedido, DetallePedido, Perfil, Reserva, Incidente, Piso
+from . import tokens
+from .models import Mesa, Plato, Pedido, DetallePedido, Perfil, Reserva, Incidente, Piso, TokenDispositivo
 admin.site.register(Mesa)
 admin.site.register(Plato)
 admin.site.register(Pedido)
 admin.site.register(DetallePedido)
-admin.site.register(Incidente)
\ No newline at end of file
+admin.site.register(Incidente)
+
+
+@admin.register(TokenDispositivo)
+class TokenDispositivoAdmin(admin.ModelAdmin):
+    list_display = ['prefijo', 'usuario', 'dispositivo', 'fecha_creacion', 'ultimo_uso', 'revocado']
+    list_filter = ['revocado']
+    # Se revoca con la acción, que pasa por tokens.revocar y anota la fecha
+    readonly_fields = ['clave', 'prefijo', 'fecha_creacion', 'ultimo_uso', 'revocado', 'fecha_revocacion']
+    actions = ['revocar']
+
+    @admin.action(description='Revocar los tokens seleccionados')
+    def revocar(self, request, queryset):
+        # Pasa por tokens.revocar para sacarlos también de la caché
+        self.message_user(request, f'{tokens.revocar(queryset)} tokens revocados.')
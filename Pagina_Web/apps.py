@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class PaginaWebConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Pagina_Web'
+
+    def ready(self):
+        from . import metricas, signals  # noqa: F401
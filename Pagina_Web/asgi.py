@@ -3,6 +3,13 @@ ASGI config for Pagina_Web project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The dashboards' live updates (/api/eventos/, Server-Sent Events) are only
+streamed when the project is served through this entry point, e.g.
+``uvicorn Pagina_Web.asgi:application``. This entry point also turns on
+LECTURAS_ASYNC, which serves the dashboards' polling reads and the kitchen
+screens' long-poll from async views (Pagina_Web/lecturas.py); set
+LECTURAS_ASYNC=0 to keep the sync views.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +19,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Pagina_Web.settings')
+os.environ.setdefault('LECTURAS_ASYNC', '1')
 
 application = get_asgi_application()
@@ -0,0 +1,101 @@
+"""
+Búsqueda de texto completo con FTS5 de SQLite sobre los incidentes (mensaje) y la carta
+(nombre y descripción de los platos).
+
+Las tablas <tabla>_fts (migración 0013) son índices de contenido externo: guardan solo el índice
+invertido y leen el texto de la tabla original. Los mantienen al día triggers en la base, así
+también cubren bulk_create, queryset.update() y los borrados en cascada, que no pasan por
+save(). Ignoran mayúsculas y tildes ('cafe' encuentra 'Café'). El comando reconstruir_busqueda
+los regenera desde cero.
+"""
+import html
+import re
+
+from django.db import connections, router
+from django.db.models import CharField, FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Incidente, Plato
+
+# Columnas indexadas de cada modelo y su peso en la relevancia (bm25)
+INDICES = {
+    Incidente: {'mensaje': 1.0},
+    Plato: {'nombre': 10.0, 'descripcion': 1.0},
+}
+# Marcas del fragmento: caracteres de control que no aparecen en el texto, para escaparlo
+# antes de convertirlas en <mark>
+INICIO_MARCA, FIN_MARCA = '\x02', '\x03'
+PALABRAS_FRAGMENTO = 12
+
+
+def tabla_fts(modelo):
+    return f'{modelo._meta.db_table}_fts'
+
+
+def consulta_fts(texto):
+    """
+    Traduce lo que escribe el usuario a una consulta FTS5: cada palabra como prefijo y todas
+    obligatorias. Las comillas evitan que operadores o signos rompan la sintaxis. None si no
+    hay palabras.
+    """
+    palabras = re.findall(r'\w+', texto)
+    if not palabras:
+        return None
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def buscar(queryset, texto, fragmento=False, ventana=None):
+    """
+    Filtra 'queryset' a las filas que coinciden con 'texto' usando el índice FTS5 de su modelo,
+    con 'relevancia' anotada (mayor es mejor) y, si se pide, 'fragmento' con las coincidencias
+    marcadas (ver resaltar). No cambia el orden.
+
+    Con 'ventana' solo se consideran las N coincidencias más recientes (ids más altos): una
+    palabra frecuente en un registro grande coincide con casi todo, y calcular la relevancia
+    de cada fila costaría más que todo lo demás.
+    """
+    consulta = consulta_fts(texto)
+    if consulta is None:
+        return queryset.none()
+    modelo = queryset.model
+    fts, tabla = tabla_fts(modelo), modelo._meta.db_table
+    pesos = ', '.join(str(peso) for peso in INDICES[modelo].values())
+    # El índice entra al FROM junto a la tabla; bm25() y snippet() solo valen en esa consulta
+    condiciones, parametros = [f'"{fts}".rowid = "{tabla}"."id"', f'"{fts}" MATCH %s'], [consulta]
+    if ventana:
+        # El índice recorre las coincidencias por rowid descendente sin calcular relevancias
+        condiciones.append(
+            f'"{fts}".rowid >= coalesce((SELECT rowid FROM "{fts}" WHERE "{fts}" MATCH %s '
+            f'ORDER BY rowid DESC LIMIT 1 OFFSET {int(ventana) - 1}), 0)'
+        )
+        parametros.append(consulta)
+    queryset = queryset.extra(tables=[fts], where=condiciones, params=parametros)
+    # bm25 es negativo y menor cuanto mejor coincide
+    queryset = queryset.annotate(relevancia=RawSQL(f'-bm25("{fts}", {pesos})', [], output_field=FloatField()))
+    if fragmento:
+        queryset = queryset.annotate(fragmento=RawSQL(
+            f"snippet(\"{fts}\", -1, '{INICIO_MARCA}', '{FIN_MARCA}', '…', {PALABRAS_FRAGMENTO})", [],
+            output_field=CharField(),
+        ))
+    return queryset
+
+
+def resaltar(fragmento):
+    """El fragmento de FTS5 como HTML seguro, con las coincidencias en <mark>."""
+    return html.escape(fragmento).replace(INICIO_MARCA, '<mark>').replace(FIN_MARCA, '</mark>')
+
+
+def reconstruir(modelo):
+    """Regenera el índice del modelo desde su tabla y lo compacta. Devuelve las filas indexadas."""
+    fts = tabla_fts(modelo)
+    with connections[router.db_for_write(modelo)].cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
+        cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'optimize\')')
+    return modelo.objects.count()
+
+
+def verificar(modelo):
+    """Comprueba que el índice coincide con el contenido de la tabla; lanza DatabaseError si no."""
+    fts = tabla_fts(modelo)
+    with connections[router.db_for_write(modelo)].cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{fts}"("{fts}", rank) VALUES (\'integrity-check\', 1)')
@@ -0,0 +1,270 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from . import sucursales
+
+
+class LRUCache(BaseCache):
+    """
+    Caché en memoria del proceso acotada por tamaño total (OPTIONS['MAX_BYTES']);
+    al superarlo se descartan primero las entradas usadas hace más tiempo.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        self.max_bytes = int(params.get('OPTIONS', {}).get('MAX_BYTES', 16 * 1024 * 1024))
+        self._datos = OrderedDict()  # clave -> (valor serializado, expiración)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _vigente(self, key):
+        entrada = self._datos.get(key)
+        if entrada is None:
+            return None
+        if entrada[1] is not None and entrada[1] <= time.monotonic():
+            self._quitar(key)
+            return None
+        self._datos.move_to_end(key)
+        return entrada
+
+    def _quitar(self, key):
+        valor, _ = self._datos.pop(key)
+        self._bytes -= len(valor)
+
+    def _guardar(self, key, valor, timeout):
+        serializado = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        if len(serializado) > self.max_bytes:
+            return False
+        if key in self._datos:
+            self._quitar(key)
+        timeout = self.get_backend_timeout(timeout)
+        expira = None if timeout is None else time.monotonic() + timeout
+        self._datos[key] = (serializado, expira)
+        self._bytes += len(serializado)
+        while self._bytes > self.max_bytes:
+            self._quitar(next(iter(self._datos)))
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._vigente(key) is not None:
+                return False
+            return self._guardar(key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entrada = self._vigente(key)
+        if entrada is None:
+            return default
+        return pickle.loads(entrada[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._guardar(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entrada = self._vigente(key)
+            if entrada is None:
+                return False
+            timeout = self.get_backend_timeout(timeout)
+            self._datos[key] = (entrada[0], None if timeout is None else time.monotonic() + timeout)
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entrada = self._vigente(key)
+            if entrada is None:
+                raise ValueError("Key '%s' not found" % key)
+            nuevo = pickle.loads(entrada[0]) + delta
+            self._datos[key] = (pickle.dumps(nuevo, pickle.HIGHEST_PROTOCOL), entrada[1])
+            return nuevo
+
+    # Todo ocurre en memoria y sin E/S: las vistas async lo llaman directo, sin pasar por un hilo
+    async def aget(self, key, default=None, version=None):
+        return self.get(key, default, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.set(key, value, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.add(key, value, timeout, version)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._vigente(key) is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key not in self._datos:
+                return False
+            self._quitar(key)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {'entradas': len(self._datos), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+# --- Caché de respuestas de la API ---
+
+_contadores = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_contadores_lock = threading.Lock()
+
+
+def cache_respuestas():
+    return caches['respuestas']
+
+
+def cache_generaciones():
+    # Compartida entre procesos (ver settings.CACHES): los cuerpos viven en cada proceso, pero
+    # todos leen la misma generación, así un cambio hecho en otro deja sus claves sin uso
+    return caches['generaciones']
+
+
+def contar(grupo, resultado):
+    with _contadores_lock:
+        _contadores[grupo][resultado] += 1
+
+
+def estadisticas():
+    with _contadores_lock:
+        grupos = {grupo: dict(valores) for grupo, valores in _contadores.items()}
+    for valores in grupos.values():
+        consultas = valores['hits'] + valores['misses']
+        valores['tasa_aciertos'] = round(valores['hits'] / consultas, 4) if consultas else None
+    datos = {'grupos': grupos}
+    backend = cache_respuestas()
+    if hasattr(backend, 'estadisticas'):
+        datos['almacen'] = backend.estadisticas()
+    return datos
+
+
+def prefijo(grupo, sucursal=None):
+    # Cada sucursal tiene sus propios datos (y los mismos ids): sus respuestas no se comparten
+    return f'respuestas:{sucursal or sucursales.actual()}:{grupo}'
+
+
+def clave_generacion(grupo, pk=None, sucursal=None):
+    # La del grupo invalida los listados; la de cada objeto, su detalle
+    if pk is None:
+        return f'{prefijo(grupo, sucursal)}:generacion'
+    return f'{prefijo(grupo, sucursal)}:detalle:{pk}:generacion'
+
+
+def generacion(grupo, pk=None):
+    # Si la generación se perdió (desalojo o reinicio del backend) se parte de la hora
+    # actual, así nunca coincide con claves escritas bajo una generación anterior.
+    clave = clave_generacion(grupo, pk)
+    valor = cache_generaciones().get(clave)
+    if valor is None:
+        valor = time.time_ns()
+        cache_generaciones().add(clave, valor, timeout=None)
+        valor = cache_generaciones().get(clave, valor)
+    return valor
+
+
+async def ageneracion(grupo, pk=None):
+    clave = clave_generacion(grupo, pk)
+    valor = await cache_generaciones().aget(clave)
+    if valor is None:
+        valor = time.time_ns()
+        await cache_generaciones().aadd(clave, valor, timeout=None)
+        valor = await cache_generaciones().aget(clave, valor)
+    return valor
+
+
+def clave_lista(grupo, generacion_actual, request):
+    # La URL completa incluye esquema y host, con los que se arman las URLs absolutas de las imágenes
+    consulta = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()[:16]
+    return f'{prefijo(grupo)}:{generacion_actual}:lista:{consulta}'
+
+
+def clave_detalle(grupo, pk, generacion_actual, request):
+    origen = hashlib.sha1(request.build_absolute_uri('/').encode()).hexdigest()[:16]
+    return f'{prefijo(grupo)}:detalle:{pk}:{generacion_actual}:{origen}'
+
+
+def respuesta_cacheada(cuerpo, resultado):
+    response = HttpResponse(cuerpo, content_type='application/json')
+    response['X-Cache'] = resultado
+    return response
+
+
+def _avanzar(clave):
+    # Una petición en curso que guarde su cuerpo después de esto lo hace con la generación
+    # anterior, bajo una clave que ya nadie lee. Un valor nuevo en vez de incr(): en archivos
+    # incr() es leer y escribir, y dos procesos a la vez podrían dejar el mismo número
+    cache_generaciones().set(clave, time.time_ns(), timeout=None)
+
+
+def invalidar_grupo(grupo, sucursal=None):
+    _avanzar(clave_generacion(grupo, sucursal=sucursal))
+
+
+def invalidar_detalle(grupo, pk, sucursal=None):
+    _avanzar(clave_generacion(grupo, pk, sucursal))
+
+
+class RespuestaCacheMixin:
+    """
+    Guarda como bytes JSON ya renderizados las respuestas de list y retrieve.
+    Los listados se invalidan por grupo y los detalles por id, en ambos casos avanzando una
+    generación que forma parte de la clave; ver signals.py.
+    """
+    cache_grupo = None
+    # Si el detalle depende de otras tablas (p. ej. un piso y sus mesas anidadas), también
+    # se invalida con la generación del grupo en vez de solo por id
+    cache_detalle_por_generacion = False
+
+    def usar_cache(self, request):
+        return request.method == 'GET' and getattr(request.accepted_renderer, 'format', None) == 'json'
+
+    def responder_con_cache(self, request, clave, generar):
+        if not self.usar_cache(request):
+            return generar()
+        cuerpo = cache_respuestas().get(clave)
+        if cuerpo is not None:
+            contar(self.cache_grupo, 'hits')
+            return respuesta_cacheada(cuerpo, 'HIT')
+        contar(self.cache_grupo, 'misses')
+        response = generar()
+        if response.status_code != 200:
+            return response
+        cuerpo = JSONRenderer().render(response.data)
+        cache_respuestas().set(clave, cuerpo)
+        return respuesta_cacheada(cuerpo, 'MISS')
+
+    def list(self, request, *args, **kwargs):
+        clave = clave_lista(self.cache_grupo, generacion(self.cache_grupo), request)
+        return self.responder_con_cache(request, clave, lambda: super(RespuestaCacheMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        clave = clave_detalle(self.cache_grupo, pk, generacion(self.cache_grupo, pk), request)
+        if self.cache_detalle_por_generacion:
+            clave = f'{clave}:{generacion(self.cache_grupo)}'
+        if request.query_params:
+            # Con parámetros adicionales no se reutiliza la entrada del detalle
+            return super().retrieve(request, *args, **kwargs)
+        return self.responder_con_cache(request, clave, lambda: super(RespuestaCacheMixin, self).retrieve(request, *args, **kwargs))
@@ -0,0 +1,123 @@
+"""
+Pantallas de cocina: cada cambio en una línea de pedido genera un TicketCocina para la
+estación que prepara el plato, y las estaciones los reciben por long-poll en orden de llegada.
+Bajo ASGI el long-poll lo atiende lecturas.py con aesperar_tickets, que espera en el event loop
+en vez de ocupar un hilo por pantalla.
+"""
+import asyncio
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Plato, TicketCocina
+
+ESTACION_POR_CATEGORIA = {
+    'Bebida': 'barra',
+    'Entrada': 'fria',
+    'Postre': 'fria',
+    'Fondo': 'caliente',
+}
+MAXIMO_POR_ENTREGA = 100
+
+# Los hilos que esperan tickets se despiertan con esta condición apenas se confirma uno nuevo.
+# La secuencia evita perder un aviso que llegue entre la consulta y la espera.
+_condicion = threading.Condition()
+_secuencia = 0
+# (loop, asyncio.Event) de cada espera async en curso; se despiertan junto con los hilos
+_esperas_async = set()
+
+
+def revision():
+    # Con varios procesos el aviso no cruza entre ellos: se vuelve a consultar cada tanto
+    return getattr(settings, 'COCINA_REVISION_SEGUNDOS', 2.0)
+
+
+def agrupacion():
+    # Pausa breve tras un aviso para entregar juntos los tickets de una misma ráfaga
+    return getattr(settings, 'COCINA_AGRUPAR_MS', 50) / 1000
+
+
+def notificar():
+    global _secuencia
+    with _condicion:
+        _secuencia += 1
+        _condicion.notify_all()
+        esperas = list(_esperas_async)
+    for loop, evento in esperas:
+        try:
+            loop.call_soon_threadsafe(evento.set)
+        except RuntimeError:
+            # El loop de esa petición ya se cerró
+            pass
+
+
+def crear_ticket(pedido_id, plato, cantidad):
+    """Registra el cambio (cantidad negativa = quitar) para la estación del plato."""
+    if not cantidad:
+        return None
+    categoria = plato.categoria if isinstance(plato, Plato) else Plato.objects.values_list('categoria', flat=True).get(pk=plato)
+    ticket = TicketCocina.objects.create(
+        pedido_id=pedido_id,
+        plato_id=plato.pk if isinstance(plato, Plato) else plato,
+        cantidad=abs(cantidad),
+        tipo='Agregar' if cantidad > 0 else 'Quitar',
+        estacion=ESTACION_POR_CATEGORIA.get(categoria, 'caliente'),
+    )
+    transaction.on_commit(notificar, using=ticket._state.db)
+    return ticket
+
+
+def cola(estacion):
+    return TicketCocina.objects.filter(estacion=estacion, listo=False).select_related('pedido__mesa', 'plato').order_by('id')
+
+
+def esperar_tickets(estacion, desde, espera):
+    """
+    Devuelve los tickets pendientes de la estación con id mayor que 'desde'. Si no hay,
+    espera hasta 'espera' segundos a que llegue alguno y los entrega en un solo lote.
+    """
+    limite = time.monotonic() + espera
+    while True:
+        with _condicion:
+            vista = _secuencia
+        tickets = list(cola(estacion).filter(id__gt=desde)[:MAXIMO_POR_ENTREGA])
+        restante = limite - time.monotonic()
+        if tickets or restante <= 0:
+            return tickets
+        with _condicion:
+            avisado = _condicion.wait_for(lambda: _secuencia != vista, timeout=min(restante, revision()))
+        if avisado:
+            time.sleep(agrupacion())
+
+
+async def aesperar_tickets(estacion, desde, espera):
+    """Como esperar_tickets, pero la espera no ocupa ningún hilo."""
+    limite = time.monotonic() + espera
+    evento = asyncio.Event()
+    espera_async = (asyncio.get_running_loop(), evento)
+    with _condicion:
+        _esperas_async.add(espera_async)
+    try:
+        while True:
+            # Se limpia antes de consultar: un aviso que llegue durante la consulta no se pierde
+            evento.clear()
+            tickets = [ticket async for ticket in cola(estacion).filter(id__gt=desde)[:MAXIMO_POR_ENTREGA]]
+            restante = limite - time.monotonic()
+            if tickets or restante <= 0:
+                return tickets
+            try:
+                await asyncio.wait_for(evento.wait(), timeout=min(restante, revision()))
+            except asyncio.TimeoutError:
+                continue
+            await asyncio.sleep(agrupacion())
+    finally:
+        with _condicion:
+            _esperas_async.discard(espera_async)
+
+
+def marcar_listo(ticket_id):
+    # Una sola sentencia UPDATE sobre una fila; False si no existe o ya estaba listo
+    return bool(TicketCocina.objects.filter(pk=ticket_id, listo=False).update(listo=True, fecha_listo=timezone.now()))
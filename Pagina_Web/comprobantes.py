@@ -0,0 +1,69 @@
+"""
+Comprobantes: la foto de un pedido al cerrarlo (ver models.Comprobante).
+
+PedidoViewSet.finalizar crea el comprobante en la misma transacción que marca el pedido como
+completado; congelar_pendientes() genera por lotes los de pedidos cerrados antes de que
+existieran, con los precios vigentes al momento de correrlo (no hay otros guardados).
+"""
+from django.db.models import Prefetch
+
+from .db import escritura
+from .models import Comprobante, DetallePedido, Pedido
+
+LOTE = 500
+
+
+def armar(pedido):
+    """Comprobante (sin guardar) de un pedido con 'mesa__piso' y sus líneas con plato ya cargados."""
+    lineas = [
+        {
+            'plato_id': detalle.plato_id, 'nombre': detalle.plato.nombre, 'categoria': detalle.plato.categoria,
+            'precio': detalle.plato.precio, 'cantidad': detalle.cantidad,
+        }
+        for detalle in pedido.detallepedido_set.all()
+    ]
+    return Comprobante(
+        pedido=pedido,
+        fecha_creacion=pedido.fecha_creacion,
+        mesa_nombre=pedido.mesa.nombre,
+        piso_id=pedido.mesa.piso_id,
+        piso_nombre=pedido.mesa.piso.nombre,
+        total=sum(linea['precio'] * linea['cantidad'] for linea in lineas),
+        unidades=sum(linea['cantidad'] for linea in lineas),
+        lineas=lineas,
+    )
+
+
+def _con_lineas(pedidos):
+    return pedidos.select_related('mesa__piso').prefetch_related(
+        Prefetch('detallepedido_set', queryset=DetallePedido.objects.select_related('plato').order_by('id'))
+    )
+
+
+def congelar(pedido):
+    """Crea y devuelve el comprobante de un pedido recién cerrado."""
+    pedido = _con_lineas(Pedido.objects.filter(pk=pedido.pk)).get()
+    comprobante = armar(pedido)
+    comprobante.save(force_insert=True)
+    return comprobante
+
+
+def congelar_pendientes(lote=LOTE, progreso=None):
+    """
+    Crea los comprobantes que faltan para pedidos completados, de a 'lote' pedidos por
+    transacción (cada una espera su turno de escritura como cualquier otra). Devuelve cuántos creó.
+    """
+    creados, ultimo = 0, 0
+    while True:
+        with escritura():
+            pendientes = list(_con_lineas(
+                Pedido.objects.filter(completado=True, comprobante__isnull=True, pk__gt=ultimo).order_by('pk')
+            )[:lote])
+            if not pendientes:
+                return creados
+            # ignore_conflicts: si un finalizar lo creó entre la consulta y la inserción, se respeta ese
+            Comprobante.objects.bulk_create([armar(pedido) for pedido in pendientes], ignore_conflicts=True)
+        creados += len(pendientes)
+        ultimo = pendientes[-1].pk
+        if progreso:
+            progreso(creados)
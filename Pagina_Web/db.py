@@ -0,0 +1,53 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import router, transaction
+
+from . import sucursales
+
+# SQLite admite un solo escritor a la vez. Dentro del proceso las transacciones de escritura
+# esperan su turno en este lock (en orden de llegada), en vez de competir por el archivo y
+# agotar el busy_timeout; entre procesos las ordena el BEGIN IMMEDIATE de settings.DATABASES.
+# Cada sucursal es otra base con su propio lock, así las escrituras de una no esperan a las de otra.
+_locks = defaultdict(threading.RLock)
+_locks_lock = threading.Lock()
+
+
+def _lock(using):
+    with _locks_lock:
+        return _locks[using]
+
+
+@contextmanager
+def escritura(using=None):
+    using = using or sucursales.actual()
+    with _lock(using):
+        with transaction.atomic(using=using):
+            yield
+
+
+class EscrituraSerializadaMixin:
+    """
+    Hace las escrituras de un ViewSet dentro de escritura(): perform_create/update/destroy y las
+    acciones que escriben con 'with self.escritura():'. Autenticación, throttling, validación y
+    render quedan fuera: el lock (y el BEGIN IMMEDIATE, que bloquea a los demás procesos) dura
+    solo lo que la escritura. Un chequeo de contraseña nunca va dentro.
+    """
+
+    def escritura(self):
+        # La base del modelo de la vista: la sucursal, o 'default' para usuarios y tokens
+        queryset = getattr(self, 'queryset', None)
+        return escritura(router.db_for_write(queryset.model) if queryset is not None else None)
+
+    def perform_create(self, serializer):
+        with self.escritura():
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with self.escritura():
+            super().perform_update(serializer)
+
+    def perform_destroy(self, instance):
+        with self.escritura():
+            super().perform_destroy(instance)
@@ -0,0 +1,217 @@
+"""
+Lista de espera de grupos sin reserva y asignación de mesas.
+
+IndiceMesas guarda en memoria las mesas libres de cada piso (y de todo el restaurante)
+ordenadas por capacidad, así la mesa más chica en la que cabe un grupo se encuentra con una
+búsqueda binaria. Antes de cada uso se pone al día leyendo solo las mesas con versión mayor a la
+última vista y las lápidas de las eliminadas (lo mismo que ?since=). Cada versión se asigna en
+la misma transacción que escribe la fila y en SQLite las escrituras van de a una, así que las
+versiones se confirman en orden y no se pierde ningún cambio.
+
+El índice solo propone: la mesa se toma con Mesa.objects.transicion, y si otra petición la
+ocupó primero se descarta y se prueba la siguiente. Cada sucursal tiene el suyo.
+
+Las esperas estimadas usan la duración mediana de los últimos turnos (desde que se abre un
+pedido hasta su comprobante) y la hora de apertura de los pedidos abiertos.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+from statistics import median
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from . import sucursales
+from .models import Comprobante, Eliminacion, Espera, Mesa, Pedido, Reserva, duracion_reserva_defecto
+
+TURNOS_MUESTRA = 200  # comprobantes recientes con los que se estima la duración de un turno
+TURNOS_DIAS = 14
+TURNO_MINIMO = timedelta(minutes=5)  # los más cortos o más largos no son turnos reales
+TURNO_MAXIMO = timedelta(hours=6)
+TURNO_CACHE = 5 * 60
+
+
+class IndiceMesas:
+    """Mesas libres por piso (None: todas) como listas ordenadas de (capacidad, id)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.libres = {}  # id -> (piso_id, capacidad)
+        self.por_piso = defaultdict(list)
+
+    def _quitar(self, mesa_id):
+        piso_id, capacidad = self.libres.pop(mesa_id)
+        for lista in (self.por_piso[piso_id], self.por_piso[None]):
+            del lista[bisect_left(lista, (capacidad, mesa_id))]
+
+    def _poner(self, mesa_id, piso_id, capacidad):
+        self.libres[mesa_id] = (piso_id, capacidad)
+        insort(self.por_piso[piso_id], (capacidad, mesa_id))
+        insort(self.por_piso[None], (capacidad, mesa_id))
+
+    def sincronizar(self):
+        """Aplica los cambios de mesas posteriores a la última versión vista."""
+        version = max(
+            Mesa.objects.aggregate(v=Max('version'))['v'] or 0,
+            Eliminacion.objects.filter(modelo='mesa').aggregate(v=Max('version'))['v'] or 0,
+        )
+        with self.lock:
+            if version == self.version:
+                return
+            if self.version is not None and version < self.version:
+                # El contador retrocedió: es otra base de datos (p. ej. la temporal de un benchmark)
+                self.version = None
+            mesas = Mesa.objects.all() if self.version is None else Mesa.objects.filter(version__gt=self.version)
+            eliminadas = [] if self.version is None else Eliminacion.objects.filter(
+                modelo='mesa', version__gt=self.version).values_list('objeto_id', flat=True)
+            if self.version is None:
+                self.libres.clear()
+                self.por_piso.clear()
+            for mesa_id, piso_id, capacidad, estado in mesas.values_list('id', 'piso_id', 'capacidad', 'estado'):
+                if mesa_id in self.libres:
+                    self._quitar(mesa_id)
+                if estado == 'Libre':
+                    self._poner(mesa_id, piso_id, capacidad)
+            for mesa_id in eliminadas:
+                if mesa_id in self.libres:
+                    self._quitar(mesa_id)
+            self.version = version
+
+    def descartar(self, mesa_id):
+        # Una mesa que otra petición tomó; la próxima sincronización la repone si vuelve a quedar libre
+        with self.lock:
+            if mesa_id in self.libres:
+                self._quitar(mesa_id)
+
+    def mejor(self, personas, piso_id=None, excluir=()):
+        """La mesa libre más chica con capacidad para 'personas': (capacidad, id) o None."""
+        with self.lock:
+            lista = self.por_piso.get(piso_id, [])
+            for posicion in range(bisect_left(lista, (personas, 0)), len(lista)):
+                if lista[posicion][1] not in excluir:
+                    return lista[posicion]
+        return None
+
+    def capacidades(self, piso_id=None, excluir=()):
+        with self.lock:
+            return [capacidad for capacidad, mesa_id in self.por_piso.get(piso_id, []) if mesa_id not in excluir]
+
+
+_indices = defaultdict(IndiceMesas)  # alias de la sucursal -> IndiceMesas
+_indices_lock = threading.Lock()
+
+
+def indice():
+    """El índice de mesas de la sucursal en curso."""
+    with _indices_lock:
+        return _indices[sucursales.actual()]
+
+
+def duracion_turno():
+    """Duración mediana de los turnos recientes; la de una reserva si todavía no hay historia."""
+    clave = f'espera:turno:{sucursales.actual()}'
+    segundos = cache.get(clave)
+    if segundos is None:
+        recientes = Comprobante.objects.filter(
+            fecha_creacion__gte=timezone.now() - timedelta(days=TURNOS_DIAS),
+        ).order_by('-fecha_creacion', '-pedido_id').values_list('fecha_creacion', 'fecha_cierre')[:TURNOS_MUESTRA]
+        duraciones = [
+            (cierre - apertura).total_seconds() for apertura, cierre in recientes
+            if TURNO_MINIMO <= cierre - apertura <= TURNO_MAXIMO
+        ]
+        segundos = median(duraciones) if duraciones else duracion_reserva_defecto().total_seconds()
+        cache.set(clave, segundos, TURNO_CACHE)
+    return timedelta(seconds=segundos)
+
+
+def reservadas_pronto(turno, ahora=None):
+    """Ids de mesas con una reserva que empieza antes de que termine un turno que se abre ahora."""
+    ahora = ahora or timezone.now()
+    return set(
+        Reserva.objects.solapadas(ahora, ahora + turno).filter(mesa__isnull=False).values_list('mesa_id', flat=True)
+    )
+
+
+def tomar_mesa(personas, piso_id=None, excluir=()):
+    """Ocupa la mesa libre más chica donde caben 'personas' y la devuelve, o None si no hay."""
+    mesas = indice()
+    while (encontrada := mesas.mejor(personas, piso_id, excluir)) is not None:
+        mesa = Mesa.objects.filter(pk=encontrada[1]).first()
+        mesas.descartar(encontrada[1])
+        if mesa is not None and Mesa.objects.transicion(mesa, ('Libre',), 'Ocupada'):
+            return mesa
+    return None
+
+
+def asignar(espera, excluir=None):
+    """
+    Sienta al grupo en la mesa libre más chica donde cabe (en su piso preferido, si tiene),
+    evitando las 'excluir' (por defecto, las reservadas durante el turno), y le abre el pedido.
+    Devuelve la mesa, o None si ninguna calza o el grupo ya no estaba esperando. Se llama
+    dentro de una transacción.
+    """
+    mesas = indice()
+    mesas.sincronizar()
+    if excluir is None:
+        excluir = reservadas_pronto(duracion_turno())
+    if mesas.mejor(espera.cantidad_personas, espera.piso_id, excluir) is None:
+        return None
+    # Primero se toma el grupo: si otra petición ya lo sentó o lo canceló, no se ocupa ninguna mesa
+    grupo = Espera.objects.filter(pk=espera.pk, estado='Esperando')
+    if not grupo.update(estado='Sentado'):
+        return None
+    mesa = tomar_mesa(espera.cantidad_personas, espera.piso_id, excluir)
+    if mesa is None:
+        Espera.objects.filter(pk=espera.pk).update(estado='Esperando')
+        return None
+    espera.mesa, espera.pedido = mesa, Pedido.objects.create(mesa=mesa)
+    espera.estado, espera.fecha_asignacion = 'Sentado', timezone.now()
+    Espera.objects.filter(pk=espera.pk).update(mesa=mesa, pedido=espera.pedido, fecha_asignacion=espera.fecha_asignacion)
+    return mesa
+
+
+def asignar_fila():
+    """Recorre la fila en orden de llegada sentando a cada grupo que cabe en alguna mesa libre."""
+    excluir = reservadas_pronto(duracion_turno())
+    return [espera for espera in Espera.objects.filter(estado='Esperando') if asignar(espera, excluir)]
+
+
+def estimar(esperas):
+    """
+    Minutos de espera estimados para cada grupo de 'esperas' (en orden de llegada), por id.
+    Un grupo compite con los que llegaron antes y necesitan su mismo tamaño de mesa: el k-ésimo
+    de ellos recibe la k-ésima mesa en liberarse entre las libres ahora y las ocupadas (cada una
+    al cumplir un turno desde que se abrió su pedido), dando vueltas si son más que las mesas.
+    None si ninguna mesa tiene capacidad para el grupo.
+    """
+    mesas = indice()
+    mesas.sincronizar()
+    ahora, turno = timezone.now(), duracion_turno()
+    excluir = reservadas_pronto(turno, ahora)
+    ocupadas = list(
+        Pedido.objects.filter(completado=False, mesa__estado='Ocupada')
+        .values_list('mesa__piso_id', 'mesa__capacidad', 'fecha_creacion')
+    )
+    delante = defaultdict(int)  # (piso, capacidad de mesa que necesita) -> grupos que esperan antes
+    estimadas = {}
+    for espera in esperas:
+        personas, piso_id = espera.cantidad_personas, espera.piso_id
+        libres = [c for c in mesas.capacidades(piso_id, excluir) if c >= personas]
+        liberaciones = [ahora] * len(libres) + sorted(
+            max(ahora, apertura + turno) for piso, capacidad, apertura in ocupadas
+            if capacidad >= personas and piso_id in (None, piso)
+        )
+        if not liberaciones:
+            estimadas[espera.id] = None
+            continue
+        # La mesa más chica que le sirve define con quién compite
+        necesaria = min(libres + [c for p, c, _ in ocupadas if c >= personas and piso_id in (None, p)])
+        k = delante[piso_id, necesaria]
+        delante[piso_id, necesaria] += 1
+        liberacion = liberaciones[k % len(liberaciones)] + turno * (k // len(liberaciones))
+        estimadas[espera.id] = round((liberacion - ahora).total_seconds() / 60)
+    return estimadas
@@ -0,0 +1,228 @@
+"""
+Archivos estáticos con nombre por contenido, minificados y precomprimidos, servidos por la
+propia aplicación.
+
+AlmacenEstaticos (collectstatic) deja en STATIC_ROOT, además de las copias con hash de
+ManifestStaticFilesStorage (js/dashboard.1a2b3c4d5e6f.js), los JS y CSS propios minificados
+y las variantes .gz y .br (con el paquete 'brotli' de requirements.txt; sin él, solo .gz) de
+todo lo que vale la pena comprimir. {% static %} ya apunta a los nombres con hash.
+
+EstaticosMiddleware atiende STATIC_URL antes que el resto de la cadena: elige la variante
+según Accept-Encoding y marca los nombres con hash como inmutables por un año, así una tablet
+con caché no vuelve a pedirlos hasta que cambie el contenido (y con él el nombre). Los
+nombres sin hash, que solo usa quien los pida a mano, se revalidan con ETag.
+
+Se activa con ESTATICOS_COMPRIMIDOS=1 después de correr collectstatic.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse, HttpResponseNotAllowed, HttpResponseNotModified, HttpResponseNotFound
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # está en requirements.txt; si falta, solo se genera .gz
+    brotli = None
+
+# Solo se minifican los archivos de Pagina_Web/static; los de admin y DRF ya vienen como se publican
+MINIFICAR = ('js/', 'css/')
+COMPRIMIBLES = ('.js', '.css', '.html', '.svg', '.json', '.txt', '.map', '.xml')
+AHORRO_MINIMO = 0.95  # una variante comprimida se guarda solo si pesa menos que esto del original
+TAMANO_MINIMO = 256
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+CACHE_REVALIDAR = 'public, max-age=0, must-revalidate'
+
+
+def minificar_js(texto):
+    """
+    Minificación conservadora: quita la sangría, las líneas vacías y los comentarios de línea
+    completa, y deja los saltos de línea para no depender de la inserción de punto y coma.
+    Las líneas dentro de un template literal de varias líneas no se tocan.
+    """
+    lineas, en_template = [], False
+    for linea in texto.splitlines():
+        limpia = linea.strip()
+        if not en_template and (not limpia or limpia.startswith('//')):
+            continue
+        lineas.append(linea.rstrip() if en_template else limpia)
+        if len(re.findall(r'(?<!\\)`', linea)) % 2:
+            en_template = not en_template
+    return '\n'.join(lineas) + '\n'
+
+
+def minificar_css(texto):
+    texto = re.sub(r'/\*.*?\*/', '', texto, flags=re.S)
+    texto = re.sub(r'\s+', ' ', texto)
+    texto = re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+    texto = re.sub(r':\s+', ':', texto)
+    return texto.replace(';}', '}').strip() + '\n'
+
+
+MINIFICADORES = {'.js': minificar_js, '.css': minificar_css}
+
+
+def comprimir(contenido):
+    """Variantes que valen la pena de 'contenido': {'br': bytes, 'gzip': bytes}."""
+    variantes = {}
+    if len(contenido) < TAMANO_MINIMO:
+        return variantes
+    # mtime=0: el mismo archivo produce siempre los mismos bytes
+    variantes['gzip'] = gzip.compress(contenido, compresslevel=9, mtime=0)
+    if brotli is not None:
+        variantes['br'] = brotli.compress(contenido, quality=11)
+    return {codificacion: datos for codificacion, datos in variantes.items() if len(datos) < len(contenido) * AHORRO_MINIMO}
+
+
+EXTENSIONES = {'gzip': '.gz', 'br': '.br'}
+
+
+class AlmacenEstaticos(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage que además minifica y precomprime las copias con hash."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        procesados = {}
+        for nombre, con_hash, procesado in super().post_process(paths, dry_run, **options):
+            if con_hash and not isinstance(procesado, Exception):
+                procesados[nombre] = con_hash
+            yield nombre, con_hash, procesado
+        if dry_run:
+            return
+        for nombre, con_hash in procesados.items():
+            self.optimizar(nombre, con_hash)
+            if nombre.endswith(COMPRIMIBLES):
+                # También el original sin hash, para quien lo pida por su nombre
+                self.optimizar(nombre, nombre, minificar=False)
+
+    def optimizar(self, nombre, destino, minificar=True):
+        ruta = self.path(destino)
+        with open(ruta, 'rb') as archivo:
+            contenido = archivo.read()
+        extension = os.path.splitext(nombre)[1]
+        if minificar and nombre.startswith(MINIFICAR) and extension in MINIFICADORES:
+            # El hash se calculó sobre la fuente: sigue cambiando cuando cambia el archivo
+            contenido = MINIFICADORES[extension](contenido.decode('utf-8')).encode('utf-8')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(contenido)
+        if not nombre.endswith(COMPRIMIBLES):
+            return
+        for codificacion, datos in comprimir(contenido).items():
+            with open(ruta + EXTENSIONES[codificacion], 'wb') as archivo:
+                archivo.write(datos)
+
+
+class Estatico:
+    """Un archivo de STATIC_ROOT con sus variantes; el contenido se lee la primera vez que se pide."""
+
+    def __init__(self, ruta, inmutable):
+        self.ruta = ruta
+        self.inmutable = inmutable
+        self.tipo = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+        if self.tipo.startswith('text/') or self.tipo in ('application/javascript', 'text/javascript'):
+            self.tipo += '; charset=utf-8'
+        self.codificaciones = [c for c in ('br', 'gzip') if os.path.exists(ruta + EXTENSIONES[c])]
+        self.contenidos = {}
+        self.huella = None
+
+    def contenido(self, codificacion):
+        datos = self.contenidos.get(codificacion)
+        if datos is None:
+            with open(self.ruta + EXTENSIONES.get(codificacion, ''), 'rb') as archivo:
+                datos = self.contenidos[codificacion] = archivo.read()
+        return datos
+
+    def etag(self, codificacion):
+        # Cada variante es una representación distinta y lleva su propio ETag
+        if self.huella is None:
+            self.huella = hashlib.md5(self.contenido(None), usedforsecurity=False).hexdigest()[:16]
+        return f'"{self.huella}-{codificacion}"' if codificacion else f'"{self.huella}"'
+
+
+def aceptadas(cabecera):
+    """Codificaciones de Accept-Encoding que el cliente acepta (q distinto de 0)."""
+    resultado = set()
+    for parte in cabecera.split(','):
+        codificacion, *parametros = parte.split(';')
+        q = 1.0
+        for parametro in parametros:
+            clave, _, valor = parametro.strip().partition('=')
+            if clave == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        if codificacion.strip() and q > 0:
+            resultado.add(codificacion.strip().lower())
+    return resultado
+
+
+def indexar(raiz, storage):
+    """URL relativa a STATIC_URL -> Estatico, para todo lo que dejó collectstatic."""
+    con_hash = set(storage.hashed_files.values())
+    archivos = {}
+    for carpeta, _, nombres in os.walk(raiz):
+        for nombre in nombres:
+            if nombre.endswith(('.gz', '.br')) and os.path.exists(os.path.join(carpeta, nombre[:-3])):
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            relativa = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+            archivos[relativa] = Estatico(ruta, relativa in con_hash)
+    return archivos
+
+
+class EstaticosMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'ESTATICOS_COMPRIMIDOS', False):
+            raise MiddlewareNotUsed
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        self.get_response = get_response
+        self.prefijo = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.archivos = indexar(settings.STATIC_ROOT, staticfiles_storage)
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if request.path_info.startswith(self.prefijo):
+            return self.servir(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path_info.startswith(self.prefijo):
+            return self.servir(request)
+        return await self.get_response(request)
+
+    def servir(self, request):
+        archivo = self.archivos.get(request.path_info[len(self.prefijo):])
+        if archivo is None:
+            return HttpResponseNotFound()
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        aceptables = aceptadas(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        codificacion = next((c for c in archivo.codificaciones if c in aceptables), None)
+        etag = archivo.etag(codificacion)
+        if not archivo.inmutable and request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            respuesta = HttpResponseNotModified()
+        else:
+            datos = archivo.contenido(codificacion)
+            respuesta = HttpResponse(b'' if request.method == 'HEAD' else datos, content_type=archivo.tipo)
+            respuesta['Content-Length'] = len(datos)
+            if codificacion:
+                respuesta['Content-Encoding'] = codificacion
+        respuesta['ETag'] = etag
+        respuesta['Cache-Control'] = CACHE_INMUTABLE if archivo.inmutable else CACHE_REVALIDAR
+        if archivo.codificaciones:
+            patch_vary_headers(respuesta, ['Accept-Encoding'])
+        return respuesta
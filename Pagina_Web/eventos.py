@@ -0,0 +1,116 @@
+import asyncio
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import sucursales
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente conectado, ligada al event loop que la creó."""
+    max_pendientes = 200
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.sucursal = sucursales.actual()
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=self.max_pendientes)
+
+    def entregar(self, evento):
+        # Se llama desde cualquier hilo; el encolado ocurre dentro del loop del cliente
+        self.loop.call_soon_threadsafe(self._encolar, evento)
+
+    def _encolar(self, evento):
+        if self.cola.full():
+            # Cliente demasiado lento: se descartan sus diffs y se le pide recargar todo
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            evento = {'tipo': 'resync'}
+        self.cola.put_nowait(evento)
+
+    async def siguiente(self):
+        return await self.cola.get()
+
+    def cerrar(self):
+        self.broker.desuscribir(self)
+
+
+class BrokerEnMemoria:
+    """
+    Reparte cada evento a las suscripciones de este proceso abiertas en su sucursal
+    (evento['sucursal']). Con varios workers, EVENTOS_BROKER puede apuntar a otra clase con la
+    misma interfaz (publicar/suscribir/desuscribir) que reenvíe los eventos entre procesos.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.suscripciones = set()
+
+    def suscribir(self):
+        suscripcion = Suscripcion(self)
+        with self.lock:
+            self.suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self.lock:
+            self.suscripciones.discard(suscripcion)
+
+    def publicar(self, evento):
+        with self.lock:
+            suscripciones = [s for s in self.suscripciones if s.sucursal == evento.get('sucursal')]
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.entregar(evento)
+            except RuntimeError:
+                # El loop del cliente ya se cerró
+                self.desuscribir(suscripcion)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                ruta = getattr(settings, 'EVENTOS_BROKER', 'Pagina_Web.eventos.BrokerEnMemoria')
+                _broker = import_string(ruta)()
+    return _broker
+
+
+def set_broker(broker):
+    # Permite reemplazar el broker (por ejemplo, en pruebas con varios workers simulados)
+    global _broker
+    _broker = broker
+
+
+def publicar(evento, sucursal=None):
+    get_broker().publicar({**evento, 'sucursal': sucursal or sucursales.actual()})
+
+
+# --- Diffs compactos por modelo ---
+
+def diff_mesa(mesa, accion='guardado'):
+    datos = None
+    if accion != 'eliminado':
+        datos = {'nombre': mesa.nombre, 'capacidad': mesa.capacidad, 'estado': mesa.estado, 'piso': mesa.piso_id}
+    return {'tipo': 'mesa', 'accion': accion, 'id': mesa.pk, 'datos': datos}
+
+
+def diff_pedido(pedido, accion='guardado'):
+    return {
+        'tipo': 'pedido', 'accion': accion, 'id': pedido.pk,
+        'datos': {'mesa': pedido.mesa_id, 'completado': pedido.completado},
+    }
+
+
+def diff_detalle(detalle, accion='guardado'):
+    datos = {'pedido': detalle.pedido_id, 'plato': detalle.plato_id, 'cantidad': detalle.cantidad}
+    if accion != 'eliminado':
+        plato = detalle.plato
+        datos['plato'] = {'id': plato.pk, 'nombre': plato.nombre, 'precio': plato.precio}
+    return {'tipo': 'detalle', 'accion': accion, 'id': detalle.pk, 'datos': datos}
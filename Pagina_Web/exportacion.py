@@ -0,0 +1,128 @@
+"""
+Exportación del historial de pedidos completados, con sus líneas, para contabilidad.
+Se lee de los comprobantes: precios y nombres son los del momento del cierre.
+
+CSV:    una fila por línea de pedido (los datos del pedido se repiten en cada una; un pedido
+        sin líneas ocupa una fila con las columnas de la línea vacías).
+NDJSON: un objeto JSON por pedido y por línea de texto, con sus líneas en "detalles".
+
+Los comprobantes se leen por lotes con iterator()/aiterator() y la salida se entrega en trozos a
+medida que se genera, así la memoria no crece con el tamaño del período exportado.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import timedelta
+
+from .filters import inicio_del_dia
+from .models import Comprobante
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+COLUMNAS = [
+    'pedido', 'fecha_creacion', 'mesa', 'piso', 'total_pedido',
+    'plato_id', 'plato', 'categoria', 'precio_unitario', 'cantidad', 'subtotal',
+]
+LOTE = 1000  # comprobantes por lectura
+TROZO = 64 * 1024  # bytes que se juntan antes de entregar un trozo de la respuesta
+
+
+def comprobantes(desde=None, hasta=None):
+    """Comprobantes entre dos fechas locales inclusivas, del pedido más antiguo al más nuevo."""
+    consulta = Comprobante.objects.all()
+    if desde:
+        consulta = consulta.filter(fecha_creacion__gte=inicio_del_dia(desde))
+    if hasta:
+        consulta = consulta.filter(fecha_creacion__lt=inicio_del_dia(hasta + timedelta(days=1)))
+    return consulta.order_by('fecha_creacion', 'pedido_id')
+
+
+def filas_csv(comprobante):
+    comunes = [
+        comprobante.pedido_id, comprobante.fecha_creacion.isoformat(),
+        comprobante.mesa_nombre, comprobante.piso_nombre, comprobante.total,
+    ]
+    if not comprobante.lineas:
+        return [comunes + [''] * 6]
+    return [
+        comunes + [l['plato_id'], l['nombre'], l['categoria'], l['precio'], l['cantidad'], l['precio'] * l['cantidad']]
+        for l in comprobante.lineas
+    ]
+
+
+def objeto_json(comprobante):
+    return {
+        'id': comprobante.pedido_id,
+        'fecha_creacion': comprobante.fecha_creacion.isoformat(),
+        'mesa': comprobante.mesa_nombre,
+        'piso': comprobante.piso_nombre,
+        'total': comprobante.total,
+        'detalles': [
+            {
+                'plato_id': l['plato_id'], 'plato': l['nombre'], 'categoria': l['categoria'],
+                'precio_unitario': l['precio'], 'cantidad': l['cantidad'], 'subtotal': l['precio'] * l['cantidad'],
+            }
+            for l in comprobante.lineas
+        ],
+    }
+
+
+class Salida:
+    """Escribe los pedidos en un búfer y lo entrega en trozos de ~TROZO bytes, en gzip si se pide."""
+
+    def __init__(self, formato, comprimir=False):
+        self.formato = formato
+        self.texto = io.StringIO()
+        self.csv = csv.writer(self.texto)
+        # wbits=31: formato gzip (encabezado y CRC), no zlib crudo
+        self.compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+        if formato == 'csv':
+            self.csv.writerow(COLUMNAS)
+
+    def escribir(self, comprobante):
+        """Agrega un pedido; devuelve un trozo listo para enviar, o b'' si aún no se juntó suficiente."""
+        if self.formato == 'csv':
+            self.csv.writerows(filas_csv(comprobante))
+        else:
+            self.texto.write(json.dumps(objeto_json(comprobante), ensure_ascii=False) + '\n')
+        if self.texto.tell() < TROZO:
+            return b''
+        return self.vaciar()
+
+    def vaciar(self):
+        datos = self.texto.getvalue().encode()
+        self.texto.seek(0)
+        self.texto.truncate()
+        return self.compresor.compress(datos) if self.compresor else datos
+
+    def cerrar(self):
+        trozo = self.vaciar()
+        return trozo + self.compresor.flush() if self.compresor else trozo
+
+
+def generar(formato, desde=None, hasta=None, comprimir=False):
+    salida = Salida(formato, comprimir)
+    for comprobante in comprobantes(desde, hasta).iterator(chunk_size=LOTE):
+        trozo = salida.escribir(comprobante)
+        if trozo:
+            yield trozo
+    yield salida.cerrar()
+
+
+async def agenerar(formato, desde=None, hasta=None, comprimir=False):
+    # Bajo ASGI, Django junta en memoria las respuestas con iteradores sync: se usa el ORM async
+    salida = Salida(formato, comprimir)
+    async for comprobante in comprobantes(desde, hasta).aiterator(chunk_size=LOTE):
+        trozo = salida.escribir(comprobante)
+        if trozo:
+            yield trozo
+    yield salida.cerrar()
+
+
+def nombre_archivo(formato, desde=None, hasta=None, comprimir=False):
+    rango = '_'.join(str(fecha) for fecha in (desde, hasta) if fecha)
+    nombre = f'pedidos_{rango}.{formato}' if rango else f'pedidos.{formato}'
+    return nombre + '.gz' if comprimir else nombre
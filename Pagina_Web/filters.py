@@ -0,0 +1,68 @@
+from datetime import datetime, time, timedelta
+
+import django_filters
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from . import busqueda
+from .models import Comprobante, Pedido
+
+
+def inicio_del_dia(fecha):
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+class RangoFechasFilter(django_filters.FilterSet):
+    # Fechas locales inclusivas; se traducen a rangos sobre fecha_creacion para usar el índice
+    desde = django_filters.DateFilter(method='filtrar_desde')
+    hasta = django_filters.DateFilter(method='filtrar_hasta')
+
+    def filtrar_desde(self, queryset, name, value):
+        return queryset.filter(fecha_creacion__gte=inicio_del_dia(value))
+
+    def filtrar_hasta(self, queryset, name, value):
+        return queryset.filter(fecha_creacion__lt=inicio_del_dia(value + timedelta(days=1)))
+
+
+class PedidoFilter(RangoFechasFilter):
+    class Meta:
+        model = Pedido
+        fields = ['mesa', 'completado', 'desde', 'hasta']
+
+
+class ComprobanteFilter(RangoFechasFilter):
+    class Meta:
+        model = Comprobante
+        fields = ['desde', 'hasta']
+
+
+class BusquedaTextoFilter(BaseFilterBackend):
+    """
+    ?search=<texto> busca con el índice FTS5 del modelo (ver busqueda.py) y ordena por relevancia
+    (?relevancia=0 conserva el orden habitual); ?fragmento=1 agrega el trozo que coincide y
+    ?limite= acota los resultados. Va último entre los filtros, porque recorta el queryset.
+    Si la vista define 'busqueda_ventana', se busca solo entre esas últimas coincidencias.
+    """
+    limite_defecto = 50
+    limite_maximo = 500
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get('search', '').strip()
+        if not texto:
+            return queryset
+        if busqueda.consulta_fts(texto) is None:
+            # Solo signos: no hay palabras que buscar
+            return queryset.none()
+        try:
+            limite = int(request.query_params.get('limite', self.limite_defecto))
+        except ValueError:
+            raise ValidationError({'limite': 'Debe ser un número entero.'})
+        limite = max(1, min(limite, self.limite_maximo))
+        resultados = busqueda.buscar(
+            queryset, texto, fragmento=request.query_params.get('fragmento') in ('1', 'true'),
+            ventana=getattr(view, 'busqueda_ventana', None),
+        )
+        if request.query_params.get('relevancia') not in ('0', 'false'):
+            resultados = resultados.order_by('-relevancia', 'pk')
+        return resultados[:limite]
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from . import sucursales
+
+logger = logging.getLogger(__name__)
+
+# Anchos en píxeles de cada variante y parámetros de compresión por formato
+ANCHOS = (320, 640, 1024)
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 75, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 78, 'optimize': True, 'progressive': True}),
+}
+DIRECTORIO_VARIANTES = 'platos/variantes'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGENES_WORKERS', 2),
+                    thread_name_prefix='imagenes',
+                )
+    return _pool
+
+
+def necesita_variantes(plato):
+    origen = plato.imagen.name if plato.imagen else None
+    return origen != plato.imagen_variantes.get('origen')
+
+
+def encolar(plato_id, using):
+    # Solo después de confirmar la transacción; fuera del hilo de la petición salvo con
+    # IMAGENES_WORKERS = 0, y nada con IMAGENES_VARIANTES desactivado (ver settings.py)
+    if not getattr(settings, 'IMAGENES_VARIANTES', True):
+        return
+    if getattr(settings, 'IMAGENES_WORKERS', 2) == 0:
+        transaction.on_commit(lambda: _generar(plato_id, using), using=using)
+    else:
+        transaction.on_commit(lambda: get_pool().submit(_tarea, plato_id, using), using=using)
+
+
+def _generar(plato_id, using):
+    try:
+        # El hilo no hereda la sucursal de la petición que guardó el plato
+        with sucursales.en_sucursal(using):
+            generar_variantes(plato_id)
+    except Exception:
+        logger.exception('No se pudieron generar las variantes del plato %s', plato_id)
+
+
+def _tarea(plato_id, using):
+    try:
+        _generar(plato_id, using)
+    finally:
+        connections.close_all()
+
+
+def _redimensionar(original, ancho, formato, opciones):
+    imagen = original
+    if imagen.width > ancho:
+        imagen = imagen.resize((ancho, round(imagen.height * ancho / imagen.width)), Image.Resampling.LANCZOS)
+    if formato == 'JPEG' and imagen.mode != 'RGB':
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A') if 'A' in imagen.getbands() else None)
+        imagen = fondo
+    salida = io.BytesIO()
+    # Se guarda sin pasar exif=, así la variante no conserva los metadatos EXIF
+    imagen.save(salida, formato, **opciones)
+    return salida.getvalue()
+
+
+def generar_variantes(plato_id, forzar=False):
+    """Genera las variantes que falten para la imagen actual del plato y borra las obsoletas."""
+    from .models import Plato
+    from .signals import filas_actualizadas
+
+    plato = Plato.objects.get(pk=plato_id)
+    almacen = plato.imagen.storage
+    anteriores = plato.imagen_variantes.get('archivos', [])
+    variantes = {}
+
+    if plato.imagen:
+        with plato.imagen.open('rb') as archivo:
+            contenido = archivo.read()
+        huella = hashlib.sha1(contenido).hexdigest()[:12]
+        base = os.path.splitext(os.path.basename(plato.imagen.name))[0]
+        original = None
+        archivos = []
+        variantes = {'origen': plato.imagen.name, 'huella': huella, 'formatos': {}}
+
+        for extension, (formato, opciones) in FORMATOS.items():
+            for ancho in ANCHOS:
+                # El nombre depende del contenido: si la imagen no cambió, la variante ya existe
+                nombre = f'{DIRECTORIO_VARIANTES}/{base}-{huella}-{ancho}.{extension}'
+                if forzar or not almacen.exists(nombre):
+                    if original is None:
+                        original = ImageOps.exif_transpose(Image.open(io.BytesIO(contenido)))
+                        original.load()
+                    if almacen.exists(nombre):
+                        almacen.delete(nombre)
+                    nombre = almacen.save(nombre, ContentFile(_redimensionar(original, ancho, formato, opciones)))
+                variantes['formatos'].setdefault(extension, {})[str(ancho)] = nombre
+                archivos.append(nombre)
+        variantes['archivos'] = archivos
+
+    for nombre in set(anteriores) - set(variantes.get('archivos', [])):
+        almacen.delete(nombre)
+
+    # Solo se guarda si la imagen no cambió mientras se procesaba
+    misma_imagen = Q(imagen=plato.imagen.name) if plato.imagen else Q(imagen='') | Q(imagen__isnull=True)
+    actualizados = Plato.objects.filter(misma_imagen, pk=plato_id).update(imagen_variantes=variantes)
+    if actualizados:
+        filas_actualizadas.send(sender=Plato, queryset=Plato.objects.filter(pk=plato_id))
+    return variantes
@@ -0,0 +1,205 @@
+"""
+Lecturas de los tableros (mesas, pisos, carta, pedido abierto de una mesa e incidentes sin ver)
+y el long-poll de las pantallas de cocina, atendidos con vistas async y el ORM async de Django,
+para que bajo ASGI el sondeo constante y las esperas no ocupen un hilo durante toda la petición
+ni compitan por ellos con las escrituras.
+
+DRF no tiene vistas async, así que aquí solo se responde el caso que usan los tableros: GET en
+JSON con los mismos serializadores, ETag y caché de respuestas que el ViewSet. Todo lo demás
+(escrituras, ?since=, otros filtros, la API navegable, errores de permisos) se delega al ViewSet
+de siempre, de modo que la respuesta es idéntica por cualquiera de los dos caminos.
+
+Las rutas solo se montan cuando settings.LECTURAS_ASYNC está activo (asgi.py lo enciende);
+bajo WSGI quedan las vistas sync sin cambios.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.renderers import JSONRenderer
+
+from . import cache, cocina, metricas, tokens
+from .models import Incidente, Mesa, Pedido, Piso, Plato, TicketCocina
+from .pagination import FechaCursorPagination
+from .serializers import (
+    IncidenteSerializer, MesaSerializer, PedidoSerializer, PisoSerializer, PlatoSerializer, TicketCocinaSerializer,
+)
+from .sincronizacion import aversion_actual, etag_listado, etag_vigente
+from .views import CocinaViewSet, IncidenteViewSet, MesaViewSet, PedidoViewSet, PisoViewSet, PlatoViewSet
+
+BOOLEANOS = {'true': True, 'false': False}
+
+
+def acepta_json(request):
+    # Quien pide HTML (un navegador en la URL de la API) recibe la API navegable de DRF
+    return 'text/html' not in request.headers.get('Accept', '')
+
+
+def respuesta_json(datos):
+    response = HttpResponse(JSONRenderer().render(datos), content_type='application/json')
+    response['Vary'] = 'Accept'
+    return response
+
+
+def lectura(viewset, basename, solo_admin=False, accion='list'):
+    """
+    Convierte 'leer(request)' en la vista de la ruta de listado de 'viewset' (o de su acción
+    'accion' sin detalle). Si 'leer' devuelve None, o la petición no es un GET JSON de un
+    usuario con permiso, responde el ViewSet.
+    """
+    # Igual que lo registra el router, para que el ViewSet arme los mismos ETag
+    acciones = {'get': 'list', 'post': 'create'} if accion == 'list' else {'get': accion}
+    vista_sync = viewset.as_view(acciones, basename=basename, detail=False)
+    delegar = sync_to_async(vista_sync)
+
+    def decorador(leer):
+        @csrf_exempt
+        @wraps(leer)
+        async def vista(request):
+            if request.method == 'GET' and acepta_json(request):
+                usuario = await tokens.ausuario(request)
+                if usuario is not None and usuario.is_authenticated and (usuario.is_staff or not solo_admin):
+                    response = await leer(request)
+                    if response is not None:
+                        return response
+            request.metricas.vista = metricas.nombre_vista(vista_sync, request.method)
+            return await delegar(request)
+
+        # Nombre con el que aparece en /api/metricas/, junto al de la vista sync
+        vista.__name__ = f'{viewset.__name__}.{accion}_async'
+        return vista
+    return decorador
+
+
+async def versionado(request, basename, modelos, generar):
+    # Mismo ETag, X-Version y 304 que VersionadoListMixin.list
+    version = await aversion_actual(modelos)
+    etag = etag_listado(basename, request, version)
+    if etag_vigente(request, etag):
+        response = HttpResponse(status=304)
+    else:
+        response = await generar()
+    response['ETag'] = etag
+    response['X-Version'] = str(version)
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+async def cacheado(request, grupo, generar):
+    # Misma clave que RespuestaCacheMixin.list, así ambas vistas comparten las entradas
+    clave = cache.clave_lista(grupo, await cache.ageneracion(grupo), request)
+    cuerpo = await cache.cache_respuestas().aget(clave)
+    if cuerpo is not None:
+        cache.contar(grupo, 'hits')
+        return cache.respuesta_cacheada(cuerpo, 'HIT')
+    cache.contar(grupo, 'misses')
+    cuerpo = JSONRenderer().render(await generar())
+    await cache.cache_respuestas().aset(clave, cuerpo)
+    return cache.respuesta_cacheada(cuerpo, 'MISS')
+
+
+@lectura(MesaViewSet, 'mesa')
+async def mesas(request):
+    if request.GET:
+        return None
+
+    async def generar():
+        return respuesta_json(MesaSerializer([m async for m in Mesa.objects.all()], many=True).data)
+    return await versionado(request, 'mesa', (Mesa,), generar)
+
+
+@lectura(PisoViewSet, 'piso', solo_admin=True)
+async def pisos(request):
+    if request.GET:
+        return None
+
+    async def serializar():
+        pisos = [p async for p in Piso.objects.prefetch_related('mesas')]
+        return PisoSerializer(pisos, many=True).data
+
+    async def generar():
+        return await cacheado(request, 'piso', serializar)
+    return await versionado(request, 'piso', (Piso, Mesa), generar)
+
+
+@lectura(PlatoViewSet, 'plato')
+async def platos(request):
+    if request.GET:
+        return None
+
+    async def serializar():
+        platos = [p async for p in Plato.objects.all()]
+        return PlatoSerializer(platos, many=True, context={'request': request}).data
+    return await cacheado(request, 'plato', serializar)
+
+
+@lectura(PedidoViewSet, 'pedido')
+async def pedidos(request):
+    # Solo la consulta del tablero: el pedido abierto de una mesa (?mesa=<id>&completado=false)
+    parametros = request.GET
+    if set(parametros) - {'mesa', 'completado', 'page_size'} or parametros.get('completado') != 'false':
+        return None
+    mesa = parametros.get('mesa', '')
+    if not mesa.isdigit():
+        return None
+    paginacion = FechaCursorPagination()
+    try:
+        tamano = int(parametros.get('page_size', paginacion.page_size))
+    except ValueError:
+        tamano = paginacion.page_size
+    tamano = max(1, min(tamano, paginacion.max_page_size))
+
+    consulta = Pedido.objects.con_totales().filter(mesa_id=mesa, completado=False).order_by('-fecha_creacion', '-id')
+    abiertos = [p async for p in consulta[:tamano + 1]]
+    if len(abiertos) > tamano:
+        # Hay más de una página: el enlace al cursor siguiente lo arma la paginación del ViewSet
+        return None
+    if not abiertos and not await Mesa.objects.filter(pk=mesa).aexists():
+        # El filtro del ViewSet responde 400 para una mesa inexistente
+        return None
+    return respuesta_json({'next': None, 'results': PedidoSerializer(abiertos, many=True, context={'request': request}).data})
+
+
+@lectura(IncidenteViewSet, 'incidente')
+async def incidentes(request):
+    if set(request.GET) - {'visto'}:
+        return None
+    consulta = Incidente.objects.all()
+    if 'visto' in request.GET:
+        if request.GET['visto'] not in BOOLEANOS:
+            return None
+        consulta = consulta.filter(visto=BOOLEANOS[request.GET['visto']])
+    return respuesta_json(IncidenteSerializer([i async for i in consulta], many=True).data)
+
+
+@lectura(CocinaViewSet, 'cocina', accion='esperar')
+async def cocina_esperar(request):
+    # Las validaciones y sus 400 quedan en CocinaViewSet.esperar
+    estaciones = [clave for clave, _ in TicketCocina.ESTACION_CHOICES]
+    estacion = request.GET.get('estacion')
+    try:
+        desde = int(request.GET.get('desde', 0))
+        espera = min(float(request.GET.get('espera', 25)), CocinaViewSet.espera_maxima)
+    except ValueError:
+        return None
+    if estacion not in estaciones:
+        return None
+    if hasattr(request, 'metricas'):
+        request.metricas.espera_larga = True
+    tickets = await cocina.aesperar_tickets(estacion, desde, max(espera, 0))
+    return respuesta_json({
+        'cursor': tickets[-1].id if tickets else desde,
+        'tickets': TicketCocinaSerializer(tickets, many=True, context={'request': request}).data,
+    })
+
+
+urlpatterns = [
+    path('api/mesas/', mesas, name='mesa-list-async'),
+    path('api/pisos/', pisos, name='piso-list-async'),
+    path('api/platos/', platos, name='plato-list-async'),
+    path('api/pedidos/', pedidos, name='pedido-list-async'),
+    path('api/incidentes/', incidentes, name='incidente-list-async'),
+    path('api/cocina/esperar/', cocina_esperar, name='cocina-esperar-async'),
+]
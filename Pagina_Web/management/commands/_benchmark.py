@@ -0,0 +1,43 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+@contextmanager
+def base_de_datos_temporal(opciones=None):
+    # Las pruebas de carga corren sobre una base SQLite temporal en disco (no en memoria)
+    # para que cada hilo abra su propia conexión, como en producción.
+    # 'opciones' reemplaza DATABASES['default']['OPTIONS'] mientras dura la prueba.
+    directorio = tempfile.mkdtemp(prefix='bench_')
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directorio, 'bench.sqlite3')
+    opciones_originales = connection.settings_dict['OPTIONS']
+    if opciones is not None:
+        connection.settings_dict['OPTIONS'] = opciones
+    setup_test_environment()
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    original = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(original, verbosity=0)
+        connection.settings_dict['OPTIONS'] = opciones_originales
+        teardown_test_environment()
+
+
+def cliente_autenticado(usuario):
+    cliente = Client()
+    cliente.force_login(usuario)
+    return cliente
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
@@ -0,0 +1,202 @@
+import asyncio
+import importlib
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, override_settings
+from django.urls import clear_url_caches
+
+from Pagina_Web.models import Pedido, Plato
+from .poblar_restaurante import poblar
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+
+MODOS = ('wsgi', 'asgi')
+
+
+@contextmanager
+def rutas(lecturas_async):
+    # urls.py decide al importarse si monta las vistas async; se recarga para cada modo
+    from Pagina_Web import urls
+    try:
+        with override_settings(LECTURAS_ASYNC=lecturas_async):
+            importlib.reload(urls)
+            clear_url_caches()
+            yield
+    finally:
+        importlib.reload(urls)
+        clear_url_caches()
+
+
+class Medidas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.lecturas, self.escrituras, self.errores = [], [], []
+        self.hilos_max = threading.active_count()
+
+    def anotar(self, lista, inicio, respuesta):
+        with self.lock:
+            lista.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code not in (200, 304):
+                self.errores.append(respuesta.status_code)
+            self.hilos_max = max(self.hilos_max, threading.active_count())
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara cuántas conexiones de tableros (sondeo de mesas, carta, pedido abierto e incidentes, '
+        'más un flujo fijo de escrituras) se atienden bajo WSGI con un número fijo de hilos y bajo ASGI '
+        'con las lecturas async de lecturas.py. Todo corre en este proceso.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conexiones', default='25,100,300', help='Conexiones concurrentes a probar, separadas por coma.')
+        parser.add_argument('--duracion', type=float, default=8.0, help='Segundos por modo y nivel de concurrencia.')
+        parser.add_argument('--hilos', type=int, default=8, help='Hilos del despliegue WSGI (p. ej. gunicorn --threads).')
+        parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos entre rondas de sondeo de cada tablero.')
+        parser.add_argument('--escrituras', type=float, default=5.0, help='Platos agregados por segundo durante la prueba.')
+        parser.add_argument('--objetivo-ms', type=float, default=250.0, help='p95 de lectura aceptable para contar la capacidad.')
+        parser.add_argument('--modos', default=','.join(MODOS))
+
+    def handle(self, *args, **options):
+        niveles = [int(n) for n in options['conexiones'].split(',')]
+        modos = options['modos'].split(',')
+        if set(modos) - set(MODOS):
+            raise CommandError(f'Modos válidos: {", ".join(MODOS)}.')
+        # Con cientos de conexiones casi todo supera el umbral del registro de lentas
+        logging.getLogger('Pagina_Web.metricas').setLevel(logging.ERROR)
+        with base_de_datos_temporal():
+            poblar(pedidos=2000, dias=30, reservas=0, incidentes=200, ocupadas=0.5)
+            self.usuario = User.objects.create_user('bench', password='bench')
+            self.platos = list(Plato.objects.values_list('id', flat=True))
+            self.abiertos = list(Pedido.objects.filter(completado=False).values_list('id', 'mesa_id'))
+            resultados = {}
+            for modo in modos:
+                with rutas(modo == 'asgi'):
+                    for conexiones in niveles:
+                        medidas = self.medir(modo, conexiones, options)
+                        resultados[modo, conexiones] = medidas
+                        self.informar(modo, conexiones, medidas, options['duracion'])
+        self.resumir(resultados, modos, niveles, options['objetivo_ms'])
+
+    def urls_ronda(self, rng):
+        _, mesa = rng.choice(self.abiertos)
+        return [
+            '/api/mesas/', '/api/platos/', '/api/incidentes/?visto=false',
+            f'/api/pedidos/?mesa={mesa}&completado=false&page_size=1',
+        ]
+
+    def medir(self, modo, conexiones, options):
+        medidas = Medidas()
+        fin = time.perf_counter() + options['duracion']
+        if modo == 'wsgi':
+            self.medir_wsgi(conexiones, fin, medidas, options)
+            # Los hilos de este proceso son las conexiones simuladas; el servidor usa los suyos fijos
+            medidas.hilos_max = options['hilos']
+        else:
+            # El inicio de sesión usa el ORM sync: se hace antes de entrar al loop
+            sesion = cliente_autenticado(self.usuario).cookies
+            asyncio.run(self.medir_asgi(conexiones, fin, medidas, sesion, options))
+        return medidas
+
+    def medir_wsgi(self, conexiones, fin, medidas, options):
+        # Cada conexión espera un hilo libre del servidor; esa cola cuenta en la latencia
+        hilos_servidor = threading.Semaphore(options['hilos'])
+
+        def pedir(cliente, lista, metodo, url, **kwargs):
+            inicio = time.perf_counter()
+            with hilos_servidor:
+                respuesta = getattr(cliente, metodo)(url, **kwargs)
+            medidas.anotar(lista, inicio, respuesta)
+
+        def tablero(indice):
+            rng = random.Random(indice)
+            cliente = cliente_autenticado(self.usuario)
+            time.sleep(rng.uniform(0, options['intervalo']))
+            try:
+                while time.perf_counter() < fin:
+                    for url in self.urls_ronda(rng):
+                        pedir(cliente, medidas.lecturas, 'get', url)
+                    time.sleep(options['intervalo'])
+            finally:
+                connection.close()
+
+        def escritor():
+            rng = random.Random(-1)
+            cliente = cliente_autenticado(self.usuario)
+            try:
+                while time.perf_counter() < fin:
+                    pedido, _ = rng.choice(self.abiertos)
+                    pedir(cliente, medidas.escrituras, 'post', f'/api/pedidos/{pedido}/agregar_plato/',
+                          data={'plato_id': rng.choice(self.platos)}, content_type='application/json')
+                    time.sleep(1 / options['escrituras'])
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=tablero, args=(i,)) for i in range(conexiones)]
+        if options['escrituras'] > 0:
+            hilos.append(threading.Thread(target=escritor))
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+    async def medir_asgi(self, conexiones, fin, medidas, sesion, options):
+        def cliente():
+            nuevo = AsyncClient()
+            nuevo.cookies = sesion
+            return nuevo
+
+        async def pedir(cliente, lista, metodo, url, **kwargs):
+            inicio = time.perf_counter()
+            respuesta = await getattr(cliente, metodo)(url, **kwargs)
+            medidas.anotar(lista, inicio, respuesta)
+
+        async def tablero(indice):
+            rng = random.Random(indice)
+            propio = cliente()
+            await asyncio.sleep(rng.uniform(0, options['intervalo']))
+            while time.perf_counter() < fin:
+                for url in self.urls_ronda(rng):
+                    await pedir(propio, medidas.lecturas, 'get', url)
+                await asyncio.sleep(options['intervalo'])
+
+        async def escritor():
+            rng = random.Random(-1)
+            propio = cliente()
+            while time.perf_counter() < fin:
+                pedido, _ = rng.choice(self.abiertos)
+                await pedir(propio, medidas.escrituras, 'post', f'/api/pedidos/{pedido}/agregar_plato/',
+                            data={'plato_id': rng.choice(self.platos)}, content_type='application/json')
+                await asyncio.sleep(1 / options['escrituras'])
+
+        tareas = [tablero(i) for i in range(conexiones)]
+        if options['escrituras'] > 0:
+            tareas.append(escritor())
+        await asyncio.gather(*tareas)
+
+    def informar(self, modo, conexiones, medidas, duracion):
+        lecturas, escrituras = medidas.lecturas, medidas.escrituras
+        self.stdout.write(
+            f'{modo:>4} {conexiones:>4} conexiones: {len(lecturas) / duracion:7.1f} lecturas/s '
+            f'p50={percentil(lecturas, 50):.1f} p95={percentil(lecturas, 95):.1f} p99={percentil(lecturas, 99):.1f} ms | '
+            f'escritura p95={percentil(escrituras, 95):.1f} ms | hilos del servidor={medidas.hilos_max} '
+            f'errores={len(medidas.errores)} {sorted(set(medidas.errores))[:5]}'
+        )
+
+    def resumir(self, resultados, modos, niveles, objetivo):
+        for modo in modos:
+            aceptables = [
+                conexiones for conexiones in niveles
+                if not resultados[modo, conexiones].errores
+                and percentil(resultados[modo, conexiones].lecturas, 95) <= objetivo
+            ]
+            capacidad = max(aceptables, default=0)
+            self.stdout.write(f'Capacidad {modo}: {capacidad} conexiones con lectura p95 <= {objetivo:.0f} ms')
+        if any(resultados[clave].errores for clave in resultados):
+            raise CommandError('Hubo respuestas con error durante la prueba.')
@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from Pagina_Web import busqueda
+from Pagina_Web.models import Incidente
+from Pagina_Web.views import IncidenteViewSet
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+
+VOCABULARIO = (
+    'comida mesa mozo servicio cuenta demora plato frío caliente sabor postre bebida café vino '
+    'cerveza pan sal ruido música baño limpieza reserva espera atención amable lento rápido precio '
+    'carta menú vegano vegetariano alergia gluten lactosa niño silla terraza aire calefacción luz '
+    'propina tarjeta efectivo boleta factura estacionamiento entrada salida ventana olor humo'
+).split()
+# Palabras que casi no aparecen, para las búsquedas selectivas
+RARAS = ['ceviche', 'sommelier', 'cumpleaños', 'mascota', 'accesibilidad', 'enchufe']
+BUSQUEDAS = {
+    'frecuente': ['comida', 'servicio', 'mesa'],
+    'rara': RARAS[:3],
+    'dos palabras': ['café frío', 'demora cuenta', 'baño limpieza'],
+    'prefijo': ['veget', 'calef', 'estac'],
+    'sin resultados': ['helicóptero', 'astronauta', 'submarino'],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la búsqueda en un registro grande de incidentes con LIKE (mensaje__icontains) '
+        'contra el índice FTS5 de busqueda.py (con la ventana de IncidenteViewSet), y mide '
+        '/api/incidentes/?search= de punta a punta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incidentes', type=int, default=200000)
+        parser.add_argument('--repeticiones', type=int, default=20, help='Veces que se repite cada búsqueda.')
+        parser.add_argument('--limite', type=int, default=50, help='Resultados por búsqueda, como ?limite=.')
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self.cargar(options['incidentes'])
+            self.comparar(options['repeticiones'], options['limite'])
+
+    def cargar(self, total):
+        rng = random.Random(1)
+        inicio = time.perf_counter()
+        lote = []
+        for _ in range(total):
+            palabras = rng.choices(VOCABULARIO, weights=[1 / (n + 1) for n in range(len(VOCABULARIO))], k=rng.randint(6, 25))
+            if rng.random() < 0.002:
+                palabras.insert(rng.randrange(len(palabras)), rng.choice(RARAS))
+            lote.append(Incidente(
+                tipo=rng.choice(['Queja', 'Sugerencia']), mensaje=' '.join(palabras).capitalize() + '.',
+                visto=True,
+            ))
+            if len(lote) == 5000:
+                Incidente.objects.bulk_create(lote)
+                lote = []
+        Incidente.objects.bulk_create(lote)
+        self.stdout.write(f'{total} incidentes cargados e indexados (por los triggers) en {time.perf_counter() - inicio:.1f} s.')
+        inicio = time.perf_counter()
+        busqueda.reconstruir(Incidente)
+        self.stdout.write(f'Reconstrucción completa del índice: {time.perf_counter() - inicio:.1f} s.')
+
+    def medir(self, repeticiones, funcion):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return tiempos, resultado
+
+    def comparar(self, repeticiones, limite):
+        cliente = cliente_autenticado(User.objects.create_user('bench', password='bench'))
+        self.stdout.write(f'{"búsqueda":<28} {"LIKE p50/p95 ms":>18} {"FTS5 p50/p95 ms":>18} {"API p50/p95 ms":>18} {"coincidencias LIKE/FTS5":>24}')
+        for tipo, textos in BUSQUEDAS.items():
+            for texto in textos:
+                # LIKE: todas las palabras como subcadenas
+                like = Incidente.objects.all()
+                for palabra in texto.split():
+                    like = like.filter(mensaje__icontains=palabra)
+                fts = busqueda.buscar(Incidente.objects.all(), texto, ventana=IncidenteViewSet.busqueda_ventana)
+                fts = fts.order_by('-relevancia', 'pk')
+                t_like, _ = self.medir(repeticiones, lambda: list(like[:limite]))
+                t_fts, _ = self.medir(repeticiones, lambda: list(fts[:limite]))
+                t_api, respuesta = self.medir(repeticiones, lambda: cliente.get(
+                    '/api/incidentes/', {'search': texto, 'fragmento': 1, 'limite': limite}))
+                assert respuesta.status_code == 200, respuesta.content
+                self.stdout.write(
+                    f'{tipo + ": " + texto:<28} '
+                    f'{percentil(t_like, 50):>8.2f}/{percentil(t_like, 95):<9.2f} '
+                    f'{percentil(t_fts, 50):>8.2f}/{percentil(t_fts, 95):<9.2f} '
+                    f'{percentil(t_api, 50):>8.2f}/{percentil(t_api, 95):<9.2f} '
+                    f'{like.count():>11}/{fts.count():<12}'
+                )
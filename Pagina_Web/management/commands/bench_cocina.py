@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Pagina_Web.cocina import ESTACION_POR_CATEGORIA
+from Pagina_Web.models import Mesa, Pedido, Piso, Plato, TicketCocina
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Mozos agregan platos a un ritmo fijo mientras cada estación de cocina recibe sus tickets por '
+        'long-poll y los marca listos; informa la latencia desde la creación del ticket hasta su entrega.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--por-minuto', type=int, default=600, help='Tickets por minuto a generar.')
+        parser.add_argument('--duracion', type=float, default=20.0)
+        parser.add_argument('--mozos', type=int, default=4)
+        parser.add_argument('--mesas', type=int, default=30)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self.ejecutar(options['por_minuto'], options['duracion'], options['mozos'], options['mesas'])
+
+    def ejecutar(self, por_minuto, duracion, cantidad_mozos, cantidad_mesas):
+        usuario = User.objects.create_user('bench', password='bench')
+        piso = Piso.objects.create(nombre='Piso 1', numero=1)
+        pedidos = [
+            Pedido.objects.create(mesa=Mesa.objects.create(nombre=f'Mesa {i}', piso=piso, estado='Ocupada'))
+            for i in range(cantidad_mesas)
+        ]
+        platos = [
+            Plato.objects.create(nombre=f'{categoria} {i}', precio=1000, categoria=categoria)
+            for categoria in ESTACION_POR_CATEGORIA for i in range(5)
+        ]
+        estaciones = sorted(set(ESTACION_POR_CATEGORIA.values()))
+
+        latencias, consultas_listo, errores = [], [], []
+        recibidos = set()
+        lock = threading.Lock()
+        fin = time.perf_counter() + duracion
+        # Cada mozo genera su parte del ritmo total, con llegadas de Poisson
+        intervalo = 60 / (por_minuto / cantidad_mozos)
+        barrera = threading.Barrier(cantidad_mozos + len(estaciones))
+
+        def mozo(indice):
+            rng = random.Random(indice)
+            cliente = cliente_autenticado(usuario)
+            barrera.wait()
+            try:
+                proximo = time.perf_counter()
+                while proximo < fin:
+                    time.sleep(max(0.0, proximo - time.perf_counter()))
+                    pedido = rng.choice(pedidos)
+                    respuesta = cliente.post(
+                        f'/api/pedidos/{pedido.id}/agregar_plato/', {'plato_id': rng.choice(platos).id},
+                        content_type='application/json',
+                    )
+                    if respuesta.status_code != 200:
+                        errores.append(respuesta.status_code)
+                    proximo += rng.expovariate(1 / intervalo)
+            except Exception as exc:
+                errores.append(repr(exc))
+            finally:
+                connection.close()
+
+        def estacion(nombre):
+            cliente = cliente_autenticado(usuario)
+            cursor = 0
+            barrera.wait()
+            try:
+                while time.perf_counter() < fin + 2:
+                    respuesta = cliente.get(f'/api/cocina/esperar/?estacion={nombre}&desde={cursor}&espera=2')
+                    recibido = time.time()
+                    datos = respuesta.json()
+                    cursor = datos['cursor']
+                    for ticket in datos['tickets']:
+                        creado = TicketCocina._meta.get_field('fecha_creacion').to_python(ticket['fecha_creacion'])
+                        with lock:
+                            latencias.append((recibido - creado.timestamp()) * 1000)
+                            recibidos.add(ticket['id'])
+                        sentencias = []
+                        # CaptureQueriesContext no es seguro entre hilos; se cuenta con un envoltorio propio
+                        with connection.execute_wrapper(lambda ejecutar, sql, *args: sentencias.append(sql) or ejecutar(sql, *args)):
+                            bump = cliente.post(f'/api/cocina/{ticket["id"]}/listo/')
+                        if bump.status_code != 200:
+                            errores.append(bump.status_code)
+                        consultas_listo.append(sum(1 for sql in sentencias if sql.startswith('UPDATE "Pagina_Web_ticketcocina"')))
+            except Exception as exc:
+                errores.append(repr(exc))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=mozo, args=(i,)) for i in range(cantidad_mozos)]
+        hilos += [threading.Thread(target=estacion, args=(nombre,)) for nombre in estaciones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        creados = TicketCocina.objects.count()
+        pendientes = TicketCocina.objects.filter(listo=False).count()
+        self.stdout.write(f'Tickets creados: {creados} ({creados / duracion * 60:.0f}/min), entregados: {len(recibidos)}, pendientes: {pendientes}')
+        self.stdout.write(
+            f'Latencia de entrega (ms): p50={percentil(latencias, 50):.1f} p95={percentil(latencias, 95):.1f} '
+            f'p99={percentil(latencias, 99):.1f} max={max(latencias, default=0):.1f}'
+        )
+        self.stdout.write(f'UPDATE por ticket marcado listo: {max(consultas_listo, default=0)}')
+        self.stdout.write(f'Errores: {len(errores)} {sorted(set(map(str, errores)))[:5]}')
+        if errores or len(recibidos) != creados or pendientes:
+            raise CommandError('Hubo tickets sin entregar o errores.')
+        self.stdout.write(self.style.SUCCESS('Todos los tickets se entregaron y se marcaron listos.'))
@@ -0,0 +1,64 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Pagina_Web.models import Mesa, Piso, Reserva
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de /api/reservas/disponibilidad/ con muchas reservas cargadas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reservas', type=int, default=50000)
+        parser.add_argument('--mesas', type=int, default=120)
+        parser.add_argument('--consultas', type=int, default=200)
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self.ejecutar(options['reservas'], options['mesas'], options['consultas'])
+
+    def ejecutar(self, total_reservas, total_mesas, consultas):
+        random.seed(1)
+        usuario = User.objects.create_user('bench', password='bench', is_staff=True)
+        pisos = [Piso.objects.create(nombre=f'Piso {n}', numero=n) for n in range(1, 4)]
+        Mesa.objects.bulk_create([
+            Mesa(nombre=f'Mesa {i}', capacidad=random.choice([2, 4, 6, 8]), piso=pisos[i % len(pisos)])
+            for i in range(total_mesas)
+        ])
+        mesas = list(Mesa.objects.values_list('id', flat=True))
+
+        # Reservas repartidas en un año, de 1 a 3 horas
+        inicio = timezone.now().replace(minute=0, second=0, microsecond=0)
+        lote = []
+        for _ in range(total_reservas):
+            fecha = inicio + timedelta(hours=random.randrange(365 * 24))
+            lote.append(Reserva(
+                mesa_id=random.choice(mesas), nombre_cliente='Cliente', cantidad_personas=2,
+                fecha_hora=fecha, fecha_hora_fin=fecha + timedelta(hours=random.randint(1, 3)),
+            ))
+        Reserva.objects.bulk_create(lote, batch_size=2000)
+        self.stdout.write(f'{total_reservas} reservas sobre {total_mesas} mesas cargadas.')
+
+        cliente = cliente_autenticado(usuario)
+        latencias, consultas_sql = [], []
+        for _ in range(consultas):
+            desde = inicio + timedelta(hours=random.randrange(365 * 24))
+            url = f'/api/reservas/disponibilidad/?personas={random.randint(1, 8)}&desde={desde.isoformat().replace("+", "%2B")}'
+            with CaptureQueriesContext(connection) as capturadas:
+                t0 = time.perf_counter()
+                respuesta = cliente.get(url)
+                latencias.append((time.perf_counter() - t0) * 1000)
+            assert respuesta.status_code == 200, respuesta.content
+            consultas_sql.append(len(capturadas))
+
+        self.stdout.write(
+            f'Latencia (ms): p50={percentil(latencias, 50):.2f} p95={percentil(latencias, 95):.2f} '
+            f'p99={percentil(latencias, 99):.2f} | consultas SQL por petición: {max(consultas_sql)}'
+        )
@@ -0,0 +1,119 @@
+import os
+import re
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from Pagina_Web import estaticos
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+
+PAGINAS = {
+    'mozo': ['/dashboard/'],
+    'admin': ['/admin_dashboard/', '/historial/', '/restaurante/', '/carta/'],
+}
+REFERENCIAS = re.compile(r'(?:src|href)="(/static/[^"]+)"')
+
+
+class Command(BaseCommand):
+    help = (
+        'Corre collectstatic con AlmacenEstaticos en un directorio temporal, muestra cuánto pesan '
+        'los JS y CSS de los tableros (fuente, minificado, gzip y brotli) y simula tablets que '
+        'navegan entre las páginas: peticiones y bytes de estáticos en la primera visita y con '
+        'la caché del navegador ya llena.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--navegaciones', type=int, default=20, help='Páginas que recorre cada tablet con la caché llena.')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='estaticos_') as raiz, override_settings(
+            DEBUG=False, STATIC_ROOT=raiz, ESTATICOS_COMPRIMIDOS=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'Pagina_Web.estaticos.AlmacenEstaticos'},
+            },
+        ):
+            inicio = time.perf_counter()
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.stdout.write(f'collectstatic: {time.perf_counter() - inicio:.1f} s.')
+            self.tamanos(raiz)
+            with base_de_datos_temporal():
+                self.navegar(options['navegaciones'])
+
+    def tamanos(self, raiz):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        self.stdout.write(f'{"archivo":<28} {"fuente":>8} {"minif.":>8} {"gzip":>8} {"brotli":>8}')
+        for nombre, con_hash in sorted(staticfiles_storage.hashed_files.items()):
+            if not nombre.startswith(estaticos.MINIFICAR):
+                continue
+            ruta = os.path.join(raiz, con_hash)
+            variantes = [
+                os.path.getsize(ruta + extension) if os.path.exists(ruta + extension) else None
+                for extension in ('.gz', '.br')
+            ]
+            self.stdout.write(
+                f'{nombre:<28} {os.path.getsize(finders.find(nombre)):>8} {os.path.getsize(ruta):>8} '
+                + ' '.join(f'{"-" if tamano is None else tamano:>8}' for tamano in variantes)
+            )
+        if estaticos.brotli is None:
+            self.stdout.write('(sin el paquete brotli no se generan variantes .br)')
+
+    def navegar(self, navegaciones):
+        usuarios = {
+            'mozo': User.objects.create_user('mozo', password='bench'),
+            'admin': User.objects.create_user('admin', password='bench', is_staff=True),
+        }
+        tiempos = []
+        for perfil, paginas in PAGINAS.items():
+            cliente = cliente_autenticado(usuarios[perfil])
+            cache = {}  # url -> (inmutable, etag), como la caché HTTP del navegador
+            antes = {'peticiones': 0, 'bytes': 0}
+            fria = {'peticiones': 0, 'bytes': 0}
+            caliente = {'peticiones': 0, 'bytes': 0}
+            for visita in range(navegaciones + 1):
+                pagina = paginas[visita % len(paginas)]
+                respuesta = cliente.get(pagina)
+                if respuesta.status_code != 200:
+                    raise CommandError(f'{pagina} respondió {respuesta.status_code}.')
+                cuenta = fria if visita == 0 else caliente
+                for url in REFERENCIAS.findall(respuesta.content.decode()):
+                    # Antes: sin hash ni Cache-Control, el archivo fuente completo la primera vez y
+                    # una revalidación en cada navegación siguiente
+                    if visita == 0:
+                        antes['bytes'] += os.path.getsize(finders.find(nombre_original(url)))
+                    else:
+                        antes['peticiones'] += 1
+                    inmutable, etag = cache.get(url, (False, None))
+                    if inmutable:
+                        continue
+                    cabeceras = {'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br'}
+                    if etag:
+                        cabeceras['HTTP_IF_NONE_MATCH'] = etag
+                    inicio = time.perf_counter()
+                    estatico = cliente.get(url, **cabeceras)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    if estatico.status_code not in (200, 304):
+                        raise CommandError(f'{url} respondió {estatico.status_code}.')
+                    cuenta['peticiones'] += 1
+                    cuenta['bytes'] += len(estatico.content)
+                    cache[url] = ('immutable' in estatico['Cache-Control'], estatico.get('ETag'))
+            self.stdout.write(
+                f'{perfil}: primera visita {fria["peticiones"]} peticiones, {fria["bytes"]} bytes '
+                f'(sin comprimir {antes["bytes"]}); siguientes {navegaciones} navegaciones '
+                f'{caliente["peticiones"]} peticiones, {caliente["bytes"]} bytes '
+                f'(sin hash ni caché: {antes["peticiones"]} revalidaciones)'
+            )
+        self.stdout.write(f'Servir un estático: p50 {percentil(tiempos, 50):.2f} ms, p95 {percentil(tiempos, 95):.2f} ms.')
+
+
+def nombre_original(url):
+    """El nombre original (sin hash) de una URL de STATIC_URL."""
+    from django.contrib.staticfiles.storage import staticfiles_storage
+    relativa = url.removeprefix('/static/')
+    originales = {con_hash: nombre for nombre, con_hash in staticfiles_storage.hashed_files.items()}
+    return originales.get(relativa, relativa)
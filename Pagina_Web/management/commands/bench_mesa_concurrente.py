@@ -0,0 +1,107 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Pagina_Web.models import Mesa, Pedido, Piso
+from ._benchmark import base_de_datos_temporal, cliente_autenticado
+
+
+class Command(BaseCommand):
+    help = (
+        'Muchos mozos abren la misma mesa libre a la vez y se verifica que exactamente uno gane: '
+        'por la API (iniciar_pedido) y llamando a MesaQuerySet.transicion directo, sin el lock de '
+        'escritura del proceso, después de que todos leyeron la mesa.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--rondas', type=int, default=20, help='Veces que se libera la mesa y se vuelve a disputar.')
+
+    def handle(self, *args, **options):
+        # Los 409 esperados se registrarían uno por uno como advertencias
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with base_de_datos_temporal():
+            self.usuario = User.objects.create_user('bench', password='bench')
+            piso = Piso.objects.create(nombre='Piso 1', numero=1)
+            self.mesa = Mesa.objects.create(nombre='Mesa 1', piso=piso)
+            fallas = self.por_api(options['hilos'], options['rondas'])
+            fallas += self.directo(options['hilos'], options['rondas'])
+        if fallas:
+            raise CommandError(f'{fallas} rondas sin exactamente un ganador.')
+        self.stdout.write(self.style.SUCCESS('Cada ronda tuvo exactamente un ganador.'))
+
+    def liberar(self):
+        Pedido.objects.filter(mesa=self.mesa).delete()
+        Mesa.objects.filter(pk=self.mesa.pk).update(estado='Libre')
+
+    def disputar(self, hilos, intento):
+        # Cada hilo corre 'intento(indice, barrera)' y devuelve lo que obtuvo; se cuentan los resultados
+        resultados = Counter()
+        lock = threading.Lock()
+        barrera = threading.Barrier(hilos)
+
+        def hilo(indice):
+            try:
+                resultado = intento(indice, barrera)
+            except Exception as exc:
+                resultado = repr(exc)
+            finally:
+                connection.close()
+            with lock:
+                resultados[resultado] += 1
+
+        trabajadores = [threading.Thread(target=hilo, args=(i,)) for i in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        return resultados
+
+    def informar(self, nombre, rondas, totales, fallas, duracion):
+        self.stdout.write(
+            f'{nombre}: {rondas} rondas en {duracion:.2f} s, resultados {dict(totales)}, '
+            f'rondas sin exactamente un ganador: {fallas}'
+        )
+
+    def por_api(self, hilos, rondas):
+        url = f'/api/mesas/{self.mesa.pk}/iniciar_pedido/'
+        clientes = [cliente_autenticado(self.usuario) for _ in range(hilos)]
+
+        def intento(indice, barrera):
+            barrera.wait()
+            return clientes[indice].post(url).status_code
+
+        totales, fallas = Counter(), 0
+        inicio = time.perf_counter()
+        for _ in range(rondas):
+            self.liberar()
+            resultados = self.disputar(hilos, intento)
+            totales.update(resultados)
+            pedidos = Pedido.objects.filter(mesa=self.mesa).count()
+            if resultados != Counter({201: 1, 409: hilos - 1}) or pedidos != 1:
+                fallas += 1
+        self.informar('API', rondas, totales, fallas, time.perf_counter() - inicio)
+        return fallas
+
+    def directo(self, hilos, rondas):
+        def intento(indice, barrera):
+            # Todos leen la mesa libre antes de que cualquiera escriba
+            mesa = Mesa.objects.get(pk=self.mesa.pk)
+            barrera.wait()
+            return Mesa.objects.transicion(mesa, ('Libre',), 'Ocupada')
+
+        totales, fallas = Counter(), 0
+        inicio = time.perf_counter()
+        for _ in range(rondas):
+            self.liberar()
+            resultados = self.disputar(hilos, intento)
+            totales.update(resultados)
+            if resultados != Counter({True: 1, False: hilos - 1}):
+                fallas += 1
+        self.informar('Directo', rondas, totales, fallas, time.perf_counter() - inicio)
+        return fallas
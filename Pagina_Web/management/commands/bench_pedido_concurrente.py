@@ -0,0 +1,67 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from Pagina_Web.models import DetallePedido, Mesa, Pedido, Piso, Plato
+from ._benchmark import base_de_datos_temporal, cliente_autenticado
+
+
+class Command(BaseCommand):
+    help = 'Muchos mozos agregan el mismo plato a un pedido a la vez y se verifica que no se pierdan incrementos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16)
+        parser.add_argument('--peticiones', type=int, default=50, help='Peticiones por hilo.')
+        parser.add_argument('--cantidad', type=int, default=1, help='Cantidad enviada en cada petición.')
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            self.ejecutar(options['hilos'], options['peticiones'], options['cantidad'])
+
+    def ejecutar(self, hilos, peticiones, cantidad):
+        usuario = User.objects.create_user('bench', password='bench')
+        piso = Piso.objects.create(nombre='Piso 1', numero=1)
+        pedido = Pedido.objects.create(mesa=Mesa.objects.create(nombre='Mesa 1', piso=piso, estado='Ocupada'))
+        plato = Plato.objects.create(nombre='Cerveza', precio=3500, categoria='Bebida')
+        url = f'/api/pedidos/{pedido.id}/agregar_plato/'
+
+        errores = []
+        barrera = threading.Barrier(hilos)
+
+        def mozo():
+            cliente = cliente_autenticado(usuario)
+            barrera.wait()
+            try:
+                for _ in range(peticiones):
+                    respuesta = cliente.post(url, {'plato_id': plato.id, 'cantidad': cantidad}, content_type='application/json')
+                    if respuesta.status_code != 200:
+                        errores.append(respuesta.status_code)
+            except Exception as exc:
+                errores.append(repr(exc))
+            finally:
+                connection.close()
+
+        trabajadores = [threading.Thread(target=mozo) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        duracion = time.perf_counter() - inicio
+
+        lineas = DetallePedido.objects.filter(pedido=pedido, plato=plato)
+        esperado = (hilos * peticiones - len(errores)) * cantidad
+        obtenido = sum(lineas.values_list('cantidad', flat=True))
+        total_peticiones = hilos * peticiones
+
+        self.stdout.write(f'Peticiones: {total_peticiones} ({hilos} hilos x {peticiones})')
+        self.stdout.write(f'Errores: {len(errores)} {sorted(set(map(str, errores)))[:5]}')
+        self.stdout.write(f'Líneas del plato: {lineas.count()}')
+        self.stdout.write(f'Cantidad esperada: {esperado} / obtenida: {obtenido}')
+        self.stdout.write(f'Rendimiento: {total_peticiones / duracion:.1f} peticiones/s en {duracion:.2f} s')
+        if obtenido != esperado or lineas.count() != 1:
+            raise CommandError('Se perdieron o duplicaron incrementos.')
+        self.stdout.write(self.style.SUCCESS('Sin incrementos perdidos.'))
@@ -0,0 +1,96 @@
+import threading
+import time
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from Pagina_Web.db import escritura
+from Pagina_Web.models import DetallePedido, Mesa, Pedido, Piso, Plato
+from ._benchmark import base_de_datos_temporal
+
+# Configuración anterior: journal por defecto (DELETE), transacciones DEFERRED, timeout de 5 s
+OPCIONES_ANTES = {}
+
+
+class Command(BaseCommand):
+    help = 'Compara lecturas y escrituras concurrentes con la configuración SQLite anterior y la actual.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=8)
+        parser.add_argument('--escritores', type=int, default=8)
+        parser.add_argument('--segundos', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        modos = [
+            ('antes', OPCIONES_ANTES, False),
+            ('despues', settings.DATABASES['default']['OPTIONS'], True),
+        ]
+        for nombre, opciones, serializar in modos:
+            with base_de_datos_temporal(opciones):
+                resultado = self.medir(options['lectores'], options['escritores'], options['segundos'], serializar)
+            self.stdout.write(
+                f"{nombre:8} journal={resultado['journal']:<7} "
+                f"lecturas/s={resultado['lecturas'] / options['segundos']:8.1f} "
+                f"escrituras/s={resultado['escrituras'] / options['segundos']:8.1f} "
+                f"errores_lectura={resultado['errores_lectura']} errores_escritura={resultado['errores_escritura']}"
+            )
+
+    def medir(self, lectores, escritores, segundos, serializar):
+        piso = Piso.objects.create(nombre='Piso 1', numero=1)
+        platos = [Plato.objects.create(nombre=f'Plato {i}', precio=1000 + i, categoria='Fondo') for i in range(10)]
+        pedidos = []
+        for i in range(escritores):
+            mesa = Mesa.objects.create(nombre=f'Mesa {i}', piso=piso, estado='Ocupada')
+            pedidos.append(Pedido.objects.create(mesa=mesa))
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal = cursor.fetchone()[0]
+
+        contadores = {'lecturas': 0, 'escrituras': 0, 'errores_lectura': 0, 'errores_escritura': 0}
+        lock = threading.Lock()
+        fin = time.perf_counter() + segundos
+        barrera = threading.Barrier(lectores + escritores)
+
+        def sumar(clave):
+            with lock:
+                contadores[clave] += 1
+
+        def lector():
+            barrera.wait()
+            try:
+                while time.perf_counter() < fin:
+                    try:
+                        list(Pedido.objects.con_totales().filter(completado=False))
+                        sumar('lecturas')
+                    except OperationalError:
+                        sumar('errores_lectura')
+            finally:
+                connection.close()
+
+        def escritor(pedido):
+            barrera.wait()
+            i = 0
+            try:
+                while time.perf_counter() < fin:
+                    i += 1
+                    try:
+                        # Lee y luego escribe en la misma transacción, como agregar_plato + finalizar
+                        with escritura() if serializar else nullcontext(), transaction.atomic():
+                            Mesa.objects.get(pk=pedido.mesa_id)
+                            DetallePedido.objects.sumar(pedido, platos[i % len(platos)])
+                            Mesa.objects.filter(pk=pedido.mesa_id).update(estado='Ocupada')
+                        sumar('escrituras')
+                    except OperationalError:
+                        sumar('errores_escritura')
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=lector) for _ in range(lectores)]
+        hilos += [threading.Thread(target=escritor, args=(pedido,)) for pedido in pedidos]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return {'journal': journal, **contadores}
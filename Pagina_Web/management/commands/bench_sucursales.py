@@ -0,0 +1,149 @@
+import logging
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import override_settings
+from django.utils import timezone
+
+from Pagina_Web import sucursales
+from Pagina_Web.db import escritura
+from Pagina_Web.models import Incidente, Perfil, Piso, ResumenVentas
+from ._benchmark import base_de_datos_temporal, cliente_autenticado
+
+SUCURSALES = {'norte': 'norte.bench', 'sur': 'sur.bench', 'costa': 'costa.bench'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea sucursales temporales con crear_sucursal y verifica que sus datos no se mezclan, '
+        'que cada petición llega a la sucursal correcta (encabezado, host y Perfil.sucursal), el '
+        'reporte consolidado, y compara escrituras concurrentes en una sola base contra repartidas '
+        'entre sucursales.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--escrituras', type=int, default=200, help='Escrituras por hilo.')
+
+    def handle(self, *args, **options):
+        # Los 400 y 403 esperados se registrarían como advertencias
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with tempfile.TemporaryDirectory(prefix='sucursales_') as directorio, override_settings(
+            SUCURSALES={}, SUCURSALES_ARCHIVO=Path(directorio) / 'sucursales.json',
+            SUCURSALES_DIRECTORIO=Path(directorio),
+        ), base_de_datos_temporal():
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, *SUCURSALES.values()]
+            try:
+                for alias, host in SUCURSALES.items():
+                    call_command('crear_sucursal', alias, nombre=alias.capitalize(), host=[host], stdout=self.stdout)
+                fallas = self.aislamiento() + self.eleccion() + self.reporte()
+                self.escrituras(options['hilos'], options['escrituras'])
+            finally:
+                connections.close_all()
+                for alias in SUCURSALES:
+                    settings.DATABASES.pop(alias, None)
+                    connections.settings.pop(alias, None)
+        if fallas:
+            raise CommandError(f'{fallas} verificaciones fallaron.')
+        self.stdout.write(self.style.SUCCESS('Todas las verificaciones pasaron.'))
+
+    def verificar(self, descripcion, obtenido, esperado):
+        correcto = obtenido == esperado
+        self.stdout.write(f'[{"ok" if correcto else "FALLA"}] {descripcion}: {obtenido!r}' + ('' if correcto else f' (se esperaba {esperado!r})'))
+        return 0 if correcto else 1
+
+    def aislamiento(self):
+        fallas = 0
+        for alias in SUCURSALES:
+            with sucursales.en_sucursal(alias):
+                piso = Piso.objects.create(nombre=f'Salón {alias}', numero=1)
+                piso.mesas.create(nombre=f'Mesa {alias}')
+        for alias in sucursales.todas():
+            with sucursales.en_sucursal(alias):
+                fallas += self.verificar(f'pisos en {alias}', list(Piso.objects.values_list('nombre', flat=True)),
+                                         [] if alias == 'default' else [f'Salón {alias}'])
+        # Los ids se repiten entre sucursales: cada una tiene sus propias secuencias
+        with sucursales.en_sucursal('norte'):
+            id_norte = Piso.objects.get().pk
+        with sucursales.en_sucursal('sur'):
+            fallas += self.verificar('mismo id en norte y sur', Piso.objects.get().pk, id_norte)
+        return fallas
+
+    def eleccion(self):
+        fallas = 0
+        admin = cliente_autenticado(User.objects.create_user('admin', password='bench', is_staff=True))
+        mozo = User.objects.create_user('mozo', password='bench')
+        Perfil.objects.create(user=mozo, sucursal='sur')
+        mozo = cliente_autenticado(mozo)
+
+        def mesas(cliente, **cabeceras):
+            respuesta = cliente.get('/api/mesas/', **cabeceras)
+            if respuesta.status_code != 200:
+                return respuesta.status_code
+            return [mesa['nombre'] for mesa in respuesta.json()]
+
+        fallas += self.verificar('admin sin elegir', mesas(admin), [])
+        fallas += self.verificar('admin con X-Sucursal: norte', mesas(admin, HTTP_X_SUCURSAL='norte'), ['Mesa norte'])
+        fallas += self.verificar('admin por host costa.bench', mesas(admin, HTTP_HOST='costa.bench'), ['Mesa costa'])
+        fallas += self.verificar('mozo de sur sin elegir', mesas(mozo), ['Mesa sur'])
+        fallas += self.verificar('mozo de sur con X-Sucursal: norte', mesas(mozo, HTTP_X_SUCURSAL='norte'), 403)
+        fallas += self.verificar('mozo de sur por host norte.bench', mesas(mozo, HTTP_HOST='norte.bench'), 403)
+        fallas += self.verificar('sucursal inexistente', mesas(admin, HTTP_X_SUCURSAL='luna'), 400)
+        # La caché de Perfil.sucursal se invalida al cambiar el perfil
+        perfil = Perfil.objects.get(user__username='mozo')
+        perfil.sucursal = 'norte'
+        perfil.save()
+        fallas += self.verificar('mozo reasignado a norte', mesas(mozo), ['Mesa norte'])
+        return fallas
+
+    def reporte(self):
+        hoy = timezone.localdate()
+        esperado = 0
+        for indice, alias in enumerate(sucursales.todas(), start=1):
+            with sucursales.en_sucursal(alias):
+                ResumenVentas.objects.create(fecha=hoy, dimension='total', ingresos=indice * 10000, pedidos=indice, unidades=indice * 3)
+                ResumenVentas.objects.create(fecha=hoy, dimension='categoria', clave='Fondo', ingresos=indice * 10000, pedidos=indice, unidades=indice * 3)
+            esperado += indice * 10000
+        admin = cliente_autenticado(User.objects.get(username='admin'))
+        inicio = time.perf_counter()
+        respuesta = admin.get('/api/reportes/sucursales/', {'periodo': 'semana'})
+        duracion = (time.perf_counter() - inicio) * 1000
+        if respuesta.status_code != 200:
+            return self.verificar('reporte consolidado', respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.stdout.write(f'Reporte de {len(datos["sucursales"])} sucursales en {duracion:.1f} ms.')
+        fallas = self.verificar('ingresos consolidados', datos['totales']['ingresos'], esperado)
+        fallas += self.verificar('por sucursal', {s['sucursal']: s['totales']['ingresos'] for s in datos['sucursales']},
+                                 {alias: i * 10000 for i, alias in enumerate(sucursales.todas(), start=1)})
+        elegidas = admin.get('/api/reportes/sucursales/', {'periodo': 'semana', 'sucursales': 'norte,sur'}).json()
+        fallas += self.verificar('solo norte y sur', elegidas['totales']['ingresos'], 50000)
+        return fallas
+
+    def escrituras(self, hilos, por_hilo):
+        # Cada escritura toma el lock de su base: con una sola base los mozos de todo el
+        # restaurante se turnan; con sucursales solo los de la misma sucursal
+        for nombre, destinos in (('una base', ['default']), (f'{len(sucursales.todas())} sucursales', sucursales.todas())):
+            def hilo(indice):
+                try:
+                    with sucursales.en_sucursal(destinos[indice % len(destinos)]):
+                        for numero in range(por_hilo):
+                            with escritura():
+                                Incidente.objects.create(tipo='Queja', mensaje=f'Hilo {indice}, queja {numero}.')
+                finally:
+                    connections.close_all()
+
+            trabajadores = [threading.Thread(target=hilo, args=(i,)) for i in range(hilos)]
+            inicio = time.perf_counter()
+            for trabajador in trabajadores:
+                trabajador.start()
+            for trabajador in trabajadores:
+                trabajador.join()
+            duracion = time.perf_counter() - inicio
+            self.stdout.write(f'{hilos} hilos, {hilos * por_hilo} escrituras en {nombre}: {duracion:.2f} s ({hilos * por_hilo / duracion:.0f}/s).')
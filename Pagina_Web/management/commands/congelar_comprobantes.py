@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Pagina_Web import comprobantes, reportes
+from Pagina_Web.models import Pedido
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = (
+        'Genera por lotes los comprobantes de los pedidos completados que aún no tienen uno. '
+        'Como no hay otros guardados, se usan los precios y nombres actuales de los platos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=comprobantes.LOTE, help='Pedidos por transacción.')
+        parser.add_argument('--sin-reportes', action='store_true', help='No recalcular los acumulados de ventas al terminar.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1.')
+        pendientes = Pedido.objects.filter(completado=True, comprobante__isnull=True).count()
+        self.stdout.write(f'{pendientes} pedidos completados sin comprobante.')
+        creados = comprobantes.congelar_pendientes(
+            options['lote'], progreso=lambda n: self.stdout.write(f'  {n}/{pendientes}'),
+        )
+        if creados and not options['sin_reportes']:
+            # Los acumulados pasan a calcularse desde los comprobantes
+            self.stdout.write(f'{reportes.reconstruir()} filas de resumen recalculadas.')
+        self.stdout.write(self.style.SUCCESS(f'{creados} comprobantes creados.'))
@@ -0,0 +1,62 @@
+import re
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from Pagina_Web import sucursales
+from Pagina_Web.models import Plato
+
+ALIAS = re.compile(r'^[a-z][a-z0-9_]{0,49}$')
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea una sucursal con su propia base SQLite (migrada y vacía), la anota en '
+        'settings.SUCURSALES_ARCHIVO y opcionalmente copia la carta de otra sucursal. Los procesos '
+        'que ya estaban corriendo la ven al reiniciarse.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('alias', help='Identificador de la sucursal (minúsculas, dígitos y _); es el valor de X-Sucursal.')
+        parser.add_argument('--nombre', help='Nombre para mostrar; por defecto el alias.')
+        parser.add_argument('--host', action='append', default=[], help='Host que atiende esta sucursal (se puede repetir).')
+        parser.add_argument('--archivo', help='Ruta de la base; por defecto SUCURSALES_DIRECTORIO/<alias>.sqlite3.')
+        parser.add_argument('--copiar-carta', metavar='SUCURSAL', help='Copia los platos de otra sucursal.')
+
+    def handle(self, *args, **options):
+        alias = options['alias']
+        if not ALIAS.match(alias):
+            raise CommandError('El alias solo puede tener minúsculas, dígitos y _, y empezar con una letra.')
+        if alias in sucursales.todas():
+            raise CommandError(f'La sucursal {alias} ya existe.')
+        origen = options['copiar_carta']
+        if origen and origen not in sucursales.todas():
+            raise CommandError(f'Sucursal desconocida: {origen}')
+        hosts = [host.lower() for host in options['host']]
+        for host in hosts:
+            if sucursales.por_host(host):
+                raise CommandError(f'El host {host} ya es de la sucursal {sucursales.por_host(host)}.')
+
+        if options['archivo']:
+            archivo = options['archivo']
+        else:
+            settings.SUCURSALES_DIRECTORIO.mkdir(parents=True, exist_ok=True)
+            archivo = str(settings.SUCURSALES_DIRECTORIO / f'{alias}.sqlite3')
+        sucursales.registrar(alias, {'nombre': options['nombre'] or alias, 'hosts': hosts, 'archivo': archivo})
+        call_command('migrate', database=alias, interactive=False, verbosity=0)
+        # Se anota recién con la base migrada: un error a medio camino no deja una sucursal rota
+        sucursales.guardar_registro()
+        self.stdout.write(self.style.SUCCESS(f'Sucursal {alias} creada en {archivo}.'))
+
+        if origen:
+            with sucursales.en_sucursal(origen):
+                platos = [
+                    Plato(**{campo: valor for campo, valor in fila.items() if campo != 'id'})
+                    for fila in Plato.objects.values()
+                ]
+            # Las imágenes y sus variantes son archivos de MEDIA_ROOT: las dos cartas los comparten
+            with sucursales.en_sucursal(alias), transaction.atomic(using=alias):
+                Plato.objects.bulk_create(platos)
+            self.stdout.write(f'{len(platos)} platos copiados desde {sucursales.nombre(origen)}.')
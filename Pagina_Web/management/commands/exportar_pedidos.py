@@ -0,0 +1,29 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from Pagina_Web import exportacion
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Exporta los pedidos completados con sus líneas en CSV o NDJSON, escribiendo a medida que los lee.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=list(exportacion.FORMATOS), default='csv')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha local inicial, inclusive (AAAA-MM-DD).')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha local final, inclusive (AAAA-MM-DD).')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida en gzip.')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar).')
+
+    def handle(self, *args, **options):
+        trozos = exportacion.generar(options['formato'], options['desde'], options['hasta'], options['gzip'])
+        if options['salida']:
+            with open(options['salida'], 'wb') as archivo:
+                for trozo in trozos:
+                    archivo.write(trozo)
+            return
+        for trozo in trozos:
+            sys.stdout.buffer.write(trozo)
+        sys.stdout.buffer.flush()
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from Pagina_Web import plano
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Exporta pisos y mesas en JSON o CSV, en el formato que acepta importar_plano.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=plano.FORMATOS, default='json')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar).')
+
+    def handle(self, *args, **options):
+        datos = plano.exportar(options['formato'])
+        texto = json.dumps(datos, indent=2, ensure_ascii=False) + '\n' if options['formato'] == 'json' else datos
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                archivo.write(texto)
+        else:
+            self.stdout.write(texto, ending='')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from Pagina_Web.imagenes import generar_variantes, necesita_variantes
+from Pagina_Web.models import Plato
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Genera las variantes redimensionadas de las imágenes de los platos que aún no las tienen.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Regenera todas las variantes aunque ya existan.')
+
+    def handle(self, *args, **options):
+        generados = 0
+        for plato in Plato.objects.exclude(imagen='').exclude(imagen__isnull=True).iterator():
+            if options['forzar'] or necesita_variantes(plato):
+                generar_variantes(plato.pk, forzar=options['forzar'])
+                generados += 1
+                self.stdout.write(f'  {plato.nombre}')
+        self.stdout.write(self.style.SUCCESS(f'Variantes generadas para {generados} plato(s).'))
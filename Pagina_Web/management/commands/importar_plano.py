@@ -0,0 +1,30 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from Pagina_Web import plano
+from Pagina_Web.db import escritura
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Importa pisos y mesas desde un archivo JSON o CSV (crea o actualiza; repetirlo no cambia nada).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=plano.FORMATOS, help='Por defecto se deduce de la extensión.')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or options['archivo'].rsplit('.', 1)[-1].lower()
+        if formato not in plano.FORMATOS:
+            raise CommandError('No se pudo deducir el formato; use --formato json|csv.')
+        with open(options['archivo'], encoding='utf-8-sig') as archivo:
+            contenido = archivo.read()
+        try:
+            with escritura():
+                resumen = plano.importar(plano.leer(contenido, formato))
+        except (ValidationError, ValueError) as exc:
+            raise CommandError('\n'.join(getattr(exc, 'messages', [str(exc)])))
+        except IntegrityError:
+            raise CommandError('El plano cambió durante la importación; vuelva a intentarlo.')
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{clave}: {valor}' for clave, valor in resumen.items())))
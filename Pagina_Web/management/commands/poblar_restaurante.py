@@ -0,0 +1,155 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import router, transaction
+from django.utils import timezone
+
+from Pagina_Web import comprobantes, reportes
+from Pagina_Web.models import (
+    Comprobante, DetallePedido, Incidente, Mesa, Pedido, Piso, Plato, Reserva, VersionSincronizacion,
+)
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+LOTE = 2000
+# Horarios de servicio (almuerzo y cena) en los que caen los pedidos históricos
+SERVICIOS = [(time(12, 30), 3 * 60), (time(19, 30), 4 * 60)]
+
+
+def _momento(dia, rng):
+    inicio, minutos = rng.choice(SERVICIOS)
+    local = datetime.combine(dia, inicio) + timedelta(minutes=rng.randrange(minutos))
+    return timezone.make_aware(local)
+
+
+def poblar(pisos=3, mesas=60, platos=80, pedidos=20000, dias=90, reservas=2000, incidentes=500,
+           mozos=0, ocupadas=0.0, clave_mozos='mozo123', semilla=1):
+    """
+    Carga un restaurante completo con inserciones masivas. Devuelve la cantidad de filas por modelo.
+    Los pedidos históricos quedan completados y repartidos en los últimos 'dias' días.
+    """
+    rng = random.Random(semilla)
+    hoy = timezone.localdate()
+    with transaction.atomic(using=router.db_for_write(Piso)):
+        version = VersionSincronizacion.siguiente()
+
+        objetos_pisos = Piso.objects.bulk_create([
+            Piso(nombre=f'Piso {n}', numero=n, version=version) for n in range(1, pisos + 1)
+        ])
+        objetos_mesas = Mesa.objects.bulk_create([
+            Mesa(
+                nombre=f'Mesa {i + 1}', capacidad=rng.choice([2, 4, 4, 6, 8]),
+                piso=objetos_pisos[i % pisos], version=version,
+            )
+            for i in range(mesas)
+        ], batch_size=LOTE)
+
+        categorias = [clave for clave, _ in Plato.CATEGORIA_CHOICES]
+        objetos_platos = Plato.objects.bulk_create([
+            Plato(
+                nombre=f'{categorias[i % len(categorias)]} {i // len(categorias) + 1}',
+                precio=rng.randrange(2000, 16000, 100), categoria=categorias[i % len(categorias)],
+            )
+            for i in range(platos)
+        ], batch_size=LOTE)
+
+        # Pedidos históricos: fecha_creacion es auto_now_add, así que se corrige con bulk_update
+        historicos = [Pedido(mesa=rng.choice(objetos_mesas), completado=True) for _ in range(pedidos)]
+        Pedido.objects.bulk_create(historicos, batch_size=LOTE)
+        for pedido in historicos:
+            pedido.fecha_creacion = _momento(hoy - timedelta(days=rng.randrange(1, dias + 1)), rng)
+        Pedido.objects.bulk_update(historicos, ['fecha_creacion'], batch_size=LOTE)
+
+        # Mesas ocupadas ahora mismo, cada una con su pedido abierto
+        abiertas = rng.sample(objetos_mesas, int(len(objetos_mesas) * ocupadas))
+        for mesa in abiertas:
+            mesa.estado = 'Ocupada'
+        Mesa.objects.bulk_update(abiertas, ['estado'], batch_size=LOTE)
+        abiertos = Pedido.objects.bulk_create([Pedido(mesa=mesa) for mesa in abiertas], batch_size=LOTE)
+
+        lineas = []
+        for pedido in historicos + abiertos:
+            for plato in rng.sample(objetos_platos, min(len(objetos_platos), rng.randint(1, 5))):
+                lineas.append(DetallePedido(pedido=pedido, plato=plato, cantidad=rng.randint(1, 3)))
+        DetallePedido.objects.bulk_create(lineas, batch_size=LOTE)
+
+        # Reservas futuras sin cruces: a lo más una por mesa, día y turno de dos horas
+        turnos = set()
+        inicio_reservas = timezone.localtime().replace(minute=0, second=0, microsecond=0)
+        while len(turnos) < min(reservas, mesas * 30 * 4):
+            turnos.add((rng.randrange(mesas), rng.randrange(1, 31), rng.choice([13, 19, 21, 23])))
+        objetos_reservas = []
+        for indice_mesa, dia, hora in turnos:
+            mesa = objetos_mesas[indice_mesa]
+            fecha_hora = (inicio_reservas + timedelta(days=dia)).replace(hour=hora)
+            objetos_reservas.append(Reserva(
+                mesa=mesa, nombre_cliente=f'Cliente {len(objetos_reservas) + 1}',
+                fecha_hora=fecha_hora, fecha_hora_fin=fecha_hora + timedelta(hours=2),
+                cantidad_personas=rng.randint(1, mesa.capacidad), version=version,
+            ))
+        Reserva.objects.bulk_create(objetos_reservas, batch_size=LOTE)
+
+        objetos_incidentes = Incidente.objects.bulk_create([
+            Incidente(
+                tipo=rng.choice(['Queja', 'Sugerencia']), mensaje=f'Comentario {i + 1}',
+                visto=i >= 10,
+            )
+            for i in range(incidentes)
+        ], batch_size=LOTE)
+        for i, incidente in enumerate(objetos_incidentes):
+            # Los diez más recientes quedan sin ver
+            incidente.fecha_creacion = timezone.now() - timedelta(hours=i * 6)
+        Incidente.objects.bulk_update(objetos_incidentes, ['fecha_creacion'], batch_size=LOTE)
+
+        # La clave se deriva una sola vez: hacerlo por usuario dominaría el tiempo de carga
+        clave = make_password(clave_mozos)
+        User.objects.bulk_create([User(username=f'mozo{i + 1}', password=clave) for i in range(mozos)])
+
+        cantidad_comprobantes = comprobantes.congelar_pendientes()
+        # El cierre queda en la hora de la carga; se corrige a un turno de 30 a 120 minutos
+        cerrados = list(Comprobante.objects.only('pk', 'fecha_creacion'))
+        for comprobante in cerrados:
+            comprobante.fecha_cierre = comprobante.fecha_creacion + timedelta(minutes=rng.randint(30, 120))
+        Comprobante.objects.bulk_update(cerrados, ['fecha_cierre'], batch_size=LOTE)
+        filas_resumen = reportes.reconstruir()
+
+    return {
+        'pisos': len(objetos_pisos), 'mesas': len(objetos_mesas), 'platos': len(objetos_platos),
+        'pedidos': len(historicos) + len(abiertos), 'detalles': len(lineas),
+        'reservas': len(objetos_reservas), 'incidentes': len(objetos_incidentes),
+        'mozos': mozos, 'comprobantes': cantidad_comprobantes, 'resumenes': filas_resumen,
+    }
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Carga un restaurante de prueba (pisos, mesas, carta, historial, reservas e incidentes) con inserciones masivas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pisos', type=int, default=3)
+        parser.add_argument('--mesas', type=int, default=60)
+        parser.add_argument('--platos', type=int, default=80)
+        parser.add_argument('--pedidos', type=int, default=20000, help='Pedidos históricos completados.')
+        parser.add_argument('--dias', type=int, default=90, help='Días hacia atrás en que se reparten los pedidos.')
+        parser.add_argument('--reservas', type=int, default=2000)
+        parser.add_argument('--incidentes', type=int, default=500)
+        parser.add_argument('--mozos', type=int, default=0, help='Usuarios mozo1..N a crear.')
+        parser.add_argument('--clave-mozos', default='mozo123')
+        parser.add_argument('--ocupadas', type=float, default=0.3, help='Fracción de mesas con un pedido abierto.')
+        parser.add_argument('--semilla', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if Piso.objects.exists() or Plato.objects.exists():
+            raise CommandError('La base ya tiene pisos o platos; use una base vacía.')
+        if options['pisos'] < 1 or options['mesas'] < 1 or options['platos'] < 1:
+            raise CommandError('Se necesita al menos un piso, una mesa y un plato.')
+        if User.objects.filter(username__in=[f'mozo{i + 1}' for i in range(options['mozos'])]).exists():
+            raise CommandError('Ya existen usuarios mozoN.')
+        totales = poblar(
+            pisos=options['pisos'], mesas=options['mesas'], platos=options['platos'],
+            pedidos=options['pedidos'], dias=options['dias'], reservas=options['reservas'],
+            incidentes=options['incidentes'], mozos=options['mozos'], ocupadas=options['ocupadas'],
+            clave_mozos=options['clave_mozos'], semilla=options['semilla'],
+        )
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{modelo}: {n}' for modelo, n in totales.items())))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Pagina_Web import tokens
+from Pagina_Web.db import escritura
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra los tokens de dispositivo vencidos (sin uso durante TOKENS_VIGENCIA) y los revocados '
+        'hace más de ese tiempo. Pensado para correr a diario desde cron.'
+    )
+
+    def handle(self, *args, **options):
+        # Los tokens viven en 'default' (ver sucursales.SucursalRouter)
+        with escritura('default'):
+            borrados = tokens.purgar()
+        self.stdout.write(self.style.SUCCESS(f'{borrados} tokens borrados.'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from Pagina_Web import busqueda
+from Pagina_Web.db import escritura
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = (
+        'Regenera desde cero los índices de búsqueda FTS5 de incidentes y platos (por ejemplo, '
+        'tras restaurar una copia o cargar datos por fuera de Django) y verifica que coincidan con sus tablas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo-verificar', action='store_true', help='Solo comprueba los índices, sin regenerarlos.')
+
+    def handle(self, *args, **options):
+        for modelo in busqueda.INDICES:
+            nombre = modelo._meta.verbose_name_plural
+            try:
+                if not options['solo_verificar']:
+                    with escritura():
+                        filas = busqueda.reconstruir(modelo)
+                    self.stdout.write(f'{nombre}: {filas} filas indexadas.')
+                busqueda.verificar(modelo)
+            except DatabaseError as exc:
+                raise CommandError(f'El índice de {nombre} no coincide con su tabla: {exc}')
+            self.stdout.write(self.style.SUCCESS(f'{nombre}: índice verificado.'))
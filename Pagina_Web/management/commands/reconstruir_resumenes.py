@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from Pagina_Web import reportes
+from Pagina_Web.sucursales import SucursalComandoMixin
+
+
+class Command(SucursalComandoMixin, BaseCommand):
+    help = 'Recalcula los acumulados diarios de ventas (ResumenVentas) desde los comprobantes de los pedidos completados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día a recalcular (AAAA-MM-DD).')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion in ('desde', 'hasta'):
+            if options[opcion]:
+                fechas[opcion] = parse_date(options[opcion])
+                if fechas[opcion] is None:
+                    raise CommandError(f'--{opcion} debe tener el formato AAAA-MM-DD.')
+        filas = reportes.reconstruir(**fechas)
+        self.stdout.write(self.style.SUCCESS(f'{filas} filas de resumen generadas.'))
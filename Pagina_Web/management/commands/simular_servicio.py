@@ -0,0 +1,230 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import resolve
+from django.utils import timezone
+
+from Pagina_Web.models import Mesa, Plato
+from ._benchmark import base_de_datos_temporal, cliente_autenticado, percentil
+from .poblar_restaurante import poblar
+
+
+class Registro:
+    # Latencia, consultas SQL y estado de cada petición, agrupadas por endpoint (método + nombre de ruta)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.muestras = defaultdict(list)
+
+    def agregar(self, endpoint, milisegundos, consultas, correcta):
+        with self.lock:
+            self.muestras[endpoint].append((milisegundos, consultas, correcta))
+
+    def resumen(self, duracion):
+        endpoints = {}
+        for endpoint, muestras in sorted(self.muestras.items()):
+            latencias = [m[0] for m in muestras]
+            consultas = [m[1] for m in muestras]
+            endpoints[endpoint] = {
+                'peticiones': len(muestras),
+                'errores': sum(1 for m in muestras if not m[2]),
+                'rps': round(len(muestras) / duracion, 2),
+                'p50_ms': round(percentil(latencias, 50), 2),
+                'p95_ms': round(percentil(latencias, 95), 2),
+                'p99_ms': round(percentil(latencias, 99), 2),
+                'max_ms': round(max(latencias), 2),
+                'consultas_promedio': round(sum(consultas) / len(consultas), 2),
+                'consultas_max': max(consultas),
+            }
+        return endpoints
+
+
+class Mozo:
+    """Cliente de un mozo: cada petición pasa por las rutas reales y queda registrada."""
+
+    def __init__(self, usuario, registro):
+        self.cliente = cliente_autenticado(usuario)
+        self.registro = registro
+        self.consultas = 0
+
+    def contar(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+    def pedir(self, metodo, url, datos=None):
+        ruta = url.split('?')[0]
+        endpoint = f'{metodo.upper()} {resolve(ruta).url_name}'
+        self.consultas = 0
+        inicio = time.perf_counter()
+        if metodo == 'get':
+            respuesta = self.cliente.get(url)
+        else:
+            respuesta = getattr(self.cliente, metodo)(url, datos or {}, content_type='application/json')
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        self.registro.agregar(endpoint, milisegundos, self.consultas, respuesta.status_code < 400)
+        return respuesta
+
+
+class Command(BaseCommand):
+    help = (
+        'Simula un servicio de cena: muchos mozos atienden mesas a la vez contra las rutas reales '
+        'y se informa latencia (p50/p95/p99), rendimiento y consultas SQL por endpoint en JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mozos', type=int, default=12, help='Mozos concurrentes (un hilo cada uno).')
+        parser.add_argument('--duracion', type=float, default=20.0, help='Segundos de servicio simulado.')
+        parser.add_argument('--pisos', type=int, default=3)
+        parser.add_argument('--mesas', type=int, default=60)
+        parser.add_argument('--platos', type=int, default=80)
+        parser.add_argument('--pedidos', type=int, default=20000, help='Pedidos históricos precargados.')
+        parser.add_argument('--reservas', type=int, default=2000)
+        parser.add_argument('--incidentes', type=int, default=500)
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', help='Archivo donde escribir el informe JSON (por defecto, la salida estándar).')
+        parser.add_argument('--base', help='Informe JSON anterior contra el que comparar; falla si hay regresiones.')
+        parser.add_argument('--tolerancia', type=float, default=0.25, help='Aumento relativo aceptado del p95 frente a --base.')
+
+    def handle(self, *args, **options):
+        base = None
+        if options['base']:
+            with open(options['base'], encoding='utf-8') as archivo:
+                base = json.load(archivo)
+
+        with base_de_datos_temporal():
+            totales = poblar(
+                pisos=options['pisos'], mesas=options['mesas'], platos=options['platos'],
+                pedidos=options['pedidos'], reservas=options['reservas'], incidentes=options['incidentes'],
+                mozos=options['mozos'], semilla=options['semilla'],
+            )
+            self.stderr.write(f'Restaurante cargado: {totales}')
+            informe = self.simular(options['mozos'], options['duracion'], options['semilla'])
+        informe['configuracion'] = {
+            clave: options[clave]
+            for clave in ('mozos', 'duracion', 'pisos', 'mesas', 'platos', 'pedidos', 'reservas', 'incidentes', 'semilla')
+        }
+
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        else:
+            self.stdout.write(texto)
+
+        if informe['errores']:
+            raise CommandError(f"{informe['errores']} peticiones fallaron durante la simulación.")
+        if base:
+            regresiones = self.regresiones(base, informe, options['tolerancia'])
+            if regresiones:
+                raise CommandError('Regresiones frente a la base:\n' + '\n'.join(regresiones))
+
+    def simular(self, cantidad_mozos, duracion, semilla):
+        registro = Registro()
+        usuarios = list(User.objects.filter(username__startswith='mozo').order_by('id'))
+        admin = User.objects.create_user('admin_simulacion', password='x', is_staff=True)
+        platos = list(Plato.objects.values_list('id', flat=True))
+        # Cada mozo toma una mesa libre del salón y la devuelve al cerrar la cuenta
+        libres = list(Mesa.objects.filter(estado='Libre').values_list('id', flat=True))
+        lock_mesas = threading.Lock()
+        errores = []
+        fin = time.perf_counter() + duracion
+        barrera = threading.Barrier(cantidad_mozos + 1)
+
+        def atender(usuario, indice):
+            rng = random.Random(semilla * 1000 + indice)
+            mozo = Mozo(usuario, registro)
+            try:
+                with connection.execute_wrapper(mozo.contar):
+                    barrera.wait()
+                    mozo.pedir('get', '/api/bootstrap/dashboard/')
+                    while time.perf_counter() < fin:
+                        with lock_mesas:
+                            mesa_id = libres.pop(rng.randrange(len(libres))) if libres else None
+                        if mesa_id is None:
+                            mozo.pedir('get', '/api/mesas/')
+                            continue
+                        try:
+                            self.atender_mesa(mozo, mesa_id, platos, rng)
+                        finally:
+                            with lock_mesas:
+                                libres.append(mesa_id)
+            except Exception as exc:
+                errores.append(repr(exc))
+            finally:
+                connection.close()
+
+        def administrar():
+            # El administrador revisa historial, reportes y disponibilidad mientras tanto
+            rng = random.Random(semilla)
+            mozo = Mozo(admin, registro)
+            try:
+                with connection.execute_wrapper(mozo.contar):
+                    barrera.wait()
+                    while time.perf_counter() < fin:
+                        desde = timezone.localtime() + timedelta(days=rng.randint(1, 30), hours=rng.randint(0, 6))
+                        desde = desde.replace(minute=0, second=0, microsecond=0).isoformat().replace('+', '%2B')
+                        mozo.pedir('get', '/api/comprobantes/')
+                        mozo.pedir('get', '/api/reportes/?periodo=mes')
+                        mozo.pedir('get', f'/api/reservas/disponibilidad/?personas={rng.randint(1, 6)}&desde={desde}')
+                        mozo.pedir('get', '/api/bootstrap/admin/')
+                        time.sleep(0.2)
+            except Exception as exc:
+                errores.append(repr(exc))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=atender, args=(usuario, i)) for i, usuario in enumerate(usuarios[:cantidad_mozos])]
+        hilos.append(threading.Thread(target=administrar))
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        transcurrido = time.perf_counter() - inicio
+
+        endpoints = registro.resumen(transcurrido)
+        total = sum(e['peticiones'] for e in endpoints.values())
+        return {
+            'duracion_s': round(transcurrido, 2),
+            'peticiones': total,
+            'rps': round(total / transcurrido, 2),
+            'errores': sum(e['errores'] for e in endpoints.values()) + len(errores),
+            'excepciones': errores[:10],
+            'endpoints': endpoints,
+        }
+
+    def atender_mesa(self, mozo, mesa_id, platos, rng):
+        # Abrir la mesa, tomar el pedido en varias rondas, revisarlo y cerrar la cuenta
+        respuesta = mozo.pedir('post', f'/api/mesas/{mesa_id}/iniciar_pedido/')
+        if respuesta.status_code != 201:
+            return
+        pedido_id = respuesta.json()['id']
+        mozo.pedir('get', '/api/platos/')
+        for _ in range(rng.randint(2, 6)):
+            plato_id = rng.choice(platos)
+            mozo.pedir('post', f'/api/pedidos/{pedido_id}/agregar_plato/', {'plato_id': plato_id, 'cantidad': rng.randint(1, 3)})
+            if rng.random() < 0.1:
+                mozo.pedir('post', f'/api/pedidos/{pedido_id}/remover_plato/', {'plato_id': plato_id})
+        mozo.pedir('get', f'/api/pedidos/?mesa={mesa_id}&completado=false')
+        if rng.random() < 0.5:
+            mozo.pedir('get', '/api/mesas/')
+            mozo.pedir('get', '/api/incidentes/?visto=false')
+        mozo.pedir('post', f'/api/pedidos/{pedido_id}/finalizar/')
+
+    def regresiones(self, base, informe, tolerancia):
+        encontradas = []
+        for endpoint, actual in informe['endpoints'].items():
+            anterior = base.get('endpoints', {}).get(endpoint)
+            if not anterior:
+                continue
+            if actual['consultas_max'] > anterior['consultas_max']:
+                encontradas.append(f"{endpoint}: consultas {anterior['consultas_max']} -> {actual['consultas_max']}")
+            if actual['p95_ms'] > anterior['p95_ms'] * (1 + tolerancia):
+                encontradas.append(f"{endpoint}: p95 {anterior['p95_ms']} ms -> {actual['p95_ms']} ms")
+        return encontradas
@@ -0,0 +1,104 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from Pagina_Web import comprobantes
+from Pagina_Web.models import DetallePedido, Incidente, Mesa, Pedido, Piso, Plato, Reserva
+from ._benchmark import base_de_datos_temporal, cliente_autenticado
+
+# Recorridos aceptados a propósito, con el motivo. Todo lo demás que aparezca como
+# "SCAN tabla" sin índice o "USE TEMP B-TREE" hace fallar la verificación.
+PERMITIDOS = {
+    'SCAN Pagina_Web_plato': 'la carta completa se devuelve entera y se sirve desde caché',
+    'SCAN Pagina_Web_detallepedido': '/api/detalles/ lista todas las líneas sin filtro',
+    'SCAN auth_user': 'lista de empleados; la tabla de usuarios es chica',
+}
+
+
+def casos(mesa, pedido):
+    # (usuario, url, recorridos extra permitidos solo para ese caso)
+    return [
+        ('admin', '/api/pisos/', {}),
+        ('mozo', '/api/mesas/', {}),
+        ('mozo', '/api/mesas/?since=1', {
+            'USE TEMP B-TREE FOR ORDER BY': 'el delta de ?since= trae pocas filas y se ordena en memoria',
+        }),
+        ('mozo', '/api/platos/', {}),
+        ('mozo', f'/api/pedidos/?mesa={mesa.id}&completado=false', {}),
+        ('mozo', '/api/pedidos/?completado=false', {}),
+        ('mozo', '/api/pedidos/?completado=true', {}),
+        ('mozo', '/api/comprobantes/', {}),
+        ('mozo', '/api/comprobantes/?desde=2030-01-01&hasta=2030-01-31', {}),
+        ('mozo', f'/api/pedidos/?mesa={mesa.id}', {}),
+        ('mozo', f'/api/pedidos/{pedido.id}/', {}),
+        ('admin', '/api/detalles/', {}),
+        ('admin', '/api/reservas/', {}),
+        ('admin', '/api/reservas/disponibilidad/?personas=2&desde=2030-01-01T20:00', {}),
+        ('mozo', '/api/incidentes/', {}),
+        ('mozo', '/api/incidentes/?visto=false', {}),
+        ('admin', '/api/empleados/', {}),
+        ('mozo', '/api/bootstrap/dashboard/', {}),
+        ('admin', '/api/bootstrap/admin/', {}),
+        ('mozo', '/api/cocina/?estacion=caliente', {}),
+        ('mozo', '/api/cocina/esperar/?estacion=caliente&desde=0&espera=0', {}),
+        ('admin', '/api/reportes/?periodo=mes', {
+            'USE TEMP B-TREE': 'agrupa los acumulados diarios de un período acotado',
+        }),
+    ]
+
+
+def es_recorrido(detalle):
+    if detalle.startswith('USE TEMP B-TREE'):
+        return True
+    return detalle.startswith('SCAN ') and ' USING ' not in detalle
+
+
+class Command(BaseCommand):
+    help = 'Revisa con EXPLAIN QUERY PLAN las consultas de cada endpoint y falla si alguna recorre una tabla completa.'
+
+    def handle(self, *args, **options):
+        with base_de_datos_temporal():
+            fallas = self.verificar()
+        if fallas:
+            raise CommandError('Consultas sin índice:\n' + '\n'.join(fallas))
+        self.stdout.write(self.style.SUCCESS('Todas las consultas usan índices.'))
+
+    def verificar(self):
+        usuarios = {
+            'admin': User.objects.create_user('admin_planes', password='x', is_staff=True),
+            'mozo': User.objects.create_user('mozo_planes', password='x'),
+        }
+        piso = Piso.objects.create(nombre='Piso 1', numero=1)
+        mesa = Mesa.objects.create(nombre='Mesa 1', piso=piso)
+        plato = Plato.objects.create(nombre='Plato', precio=1000, categoria='Fondo')
+        pedido = Pedido.objects.create(mesa=mesa)
+        DetallePedido.objects.sumar(pedido, plato, 2)
+        cerrado = Pedido.objects.create(mesa=Mesa.objects.create(nombre='Mesa 2', piso=piso), completado=True)
+        DetallePedido.objects.sumar(cerrado, plato, 1)
+        comprobantes.congelar(cerrado)
+        Reserva.objects.create(mesa=mesa, nombre_cliente='Cliente', fecha_hora=timezone.now(), cantidad_personas=2)
+        Incidente.objects.create(tipo='Queja', mensaje='Demora')
+
+        clientes = {nombre: cliente_autenticado(usuario) for nombre, usuario in usuarios.items()}
+        fallas = []
+        for usuario, url, extra in casos(mesa, pedido):
+            with CaptureQueriesContext(connection) as capturadas:
+                respuesta = clientes[usuario].get(url)
+            if respuesta.status_code != 200:
+                fallas.append(f'{url}: respuesta {respuesta.status_code}')
+                continue
+            permitidos = {**PERMITIDOS, **extra}
+            for consulta in capturadas.captured_queries:
+                sql = consulta['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                    plan = [fila[3] for fila in cursor.fetchall()]
+                for detalle in plan:
+                    if es_recorrido(detalle) and not any(detalle.startswith(p) for p in permitidos):
+                        fallas.append(f'{url}: {detalle}\n    {sql[:200]}')
+            self.stdout.write(f'{url}: {len(capturadas)} consultas revisadas')
+        return fallas
@@ -0,0 +1,266 @@
+"""
+Instrumentación por petición: latencia total, consultas SQL y tiempo de serialización,
+agrupados por vista y acción (p. ej. PedidoViewSet.agregar_plato) en histogramas en memoria.
+
+El detalle (SQL y serialización) solo se mide en la fracción METRICAS_MUESTREO de las
+peticiones; la latencia total y el conteo se registran siempre porque cuestan casi nada.
+"""
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_medicion = ContextVar('medicion_metricas', default=None)
+
+
+def muestreo():
+    return getattr(settings, 'METRICAS_MUESTREO', 1.0)
+
+
+def umbral_lento():
+    return getattr(settings, 'METRICAS_UMBRAL_LENTO_MS', 500) / 1000
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Registro:
+    """Métricas en memoria del proceso: histogramas y contadores indexados por etiquetas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histogramas = {}  # (nombre, etiquetas) -> Histograma
+        self._contadores = {}  # (nombre, etiquetas) -> int
+
+    def observar(self, nombre, etiquetas, valor, buckets=BUCKETS_SEGUNDOS):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            histograma = self._histogramas.get(clave)
+            if histograma is None:
+                histograma = self._histogramas[clave] = Histograma(buckets)
+            histograma.observar(valor)
+
+    def incrementar(self, nombre, etiquetas, cantidad=1):
+        clave = (nombre, etiquetas)
+        with self._lock:
+            self._contadores[clave] = self._contadores.get(clave, 0) + cantidad
+
+    def limpiar(self):
+        with self._lock:
+            self._histogramas.clear()
+            self._contadores.clear()
+
+    def copia(self):
+        with self._lock:
+            histogramas = {
+                clave: (h.buckets, list(h.conteos), h.suma, h.total) for clave, h in self._histogramas.items()
+            }
+            return histogramas, dict(self._contadores)
+
+
+registro = Registro()
+
+DESCRIPCIONES = {
+    'http_solicitudes_total': ('counter', 'Peticiones atendidas por vista, método y código de estado.'),
+    'http_solicitud_segundos': ('histogram', 'Latencia total de la petición.'),
+    'http_sql_segundos': ('histogram', 'Tiempo en SQL por petición (muestreado).'),
+    'http_sql_consultas': ('histogram', 'Consultas SQL por petición (muestreado).'),
+    'http_serializacion_segundos': ('histogram', 'Tiempo en serializadores DRF por petición (muestreado).'),
+    'cache_respuestas_total': ('counter', 'Aciertos y fallos de la caché de respuestas por grupo.'),
+}
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(pares):
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{_escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def prometheus():
+    """Métricas en el formato de texto de Prometheus (versión 0.0.4)."""
+    from . import cache
+    histogramas, contadores = registro.copia()
+    for grupo, valores in cache.estadisticas()['grupos'].items():
+        contadores[('cache_respuestas_total', (('grupo', grupo), ('resultado', 'hit')))] = valores['hits']
+        contadores[('cache_respuestas_total', (('grupo', grupo), ('resultado', 'miss')))] = valores['misses']
+
+    lineas = []
+    for nombre, (tipo, ayuda) in DESCRIPCIONES.items():
+        lineas += [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} {tipo}']
+        if tipo == 'counter':
+            for (metrica, etiquetas), valor in sorted(contadores.items()):
+                if metrica == nombre:
+                    lineas.append(f'{nombre}{_etiquetas(etiquetas)} {valor}')
+            continue
+        for (metrica, etiquetas), (buckets, conteos, suma, total) in sorted(histogramas.items()):
+            if metrica != nombre:
+                continue
+            acumulado = 0
+            for limite, conteo in zip((*buckets, '+Inf'), conteos):
+                acumulado += conteo
+                lineas.append(f'{nombre}_bucket{_etiquetas((*etiquetas, ("le", _numero(limite))))} {acumulado}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {total}')
+    return '\n'.join(lineas) + '\n'
+
+
+class Medicion:
+    __slots__ = ('vista', 'consultas', 'sql_segundos', 'sentencias', 'serializacion_segundos', 'profundidad', 'espera_larga')
+
+    def __init__(self):
+        self.vista = None
+        # Las vistas de long-poll lo marcan: tardan a propósito y no van al registro de lentas
+        self.espera_larga = False
+        self.consultas = 0
+        self.sql_segundos = 0.0
+        self.sentencias = []  # (segundos, sql) para el registro de peticiones lentas
+        self.serializacion_segundos = 0.0
+        self.profundidad = 0
+
+
+def registrar_sql(execute, sql, params, many, context):
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.sql_segundos += duracion
+        if len(medicion.sentencias) < getattr(settings, 'METRICAS_SQL_MAXIMO', 200):
+            medicion.sentencias.append((duracion, sql))
+
+
+@receiver(connection_created)
+def instrumentar_conexion(sender, connection, **kwargs):
+    # El envoltorio queda en cada conexión y solo mide cuando la petición actual está muestreada,
+    # así también cubre las consultas que las vistas async hacen en hilos de sync_to_async.
+    if registrar_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(registrar_sql)
+
+
+class SerializacionMedida:
+    """Mixin para serializadores DRF: suma el tiempo de to_representation a la petición actual."""
+
+    def to_representation(self, instance):
+        medicion = _medicion.get()
+        if medicion is None:
+            return super().to_representation(instance)
+        # Solo se mide el serializador más externo; los anidados ya quedan dentro
+        medicion.profundidad += 1
+        inicio = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            medicion.profundidad -= 1
+            if medicion.profundidad == 0:
+                medicion.serializacion_segundos += time.perf_counter() - inicio
+
+
+def nombre_vista(view_func, metodo):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return view_func.__name__
+    acciones = getattr(view_func, 'actions', None)
+    if acciones:
+        return f'{cls.__name__}.{acciones.get(metodo.lower(), metodo.lower())}'
+    # @api_view le pone a la clase el nombre de la función
+    return cls.__name__
+
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        medicion, token, inicio = self.iniciar(request)
+        try:
+            respuesta = self.get_response(request)
+        finally:
+            if token is not None:
+                _medicion.reset(token)
+        self.registrar(request, respuesta, medicion, time.perf_counter() - inicio)
+        return respuesta
+
+    async def __acall__(self, request):
+        medicion, token, inicio = self.iniciar(request)
+        try:
+            respuesta = await self.get_response(request)
+        finally:
+            if token is not None:
+                _medicion.reset(token)
+        self.registrar(request, respuesta, medicion, time.perf_counter() - inicio)
+        return respuesta
+
+    def iniciar(self, request):
+        medicion = Medicion()
+        request.metricas = medicion
+        token = _medicion.set(medicion) if random.random() < muestreo() else None
+        return (medicion if token is not None else None), token, time.perf_counter()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metricas.vista = nombre_vista(view_func, request.method)
+
+    def registrar(self, request, respuesta, medicion, duracion):
+        vista = request.metricas.vista or 'sin_ruta'
+        registro.incrementar('http_solicitudes_total', (('vista', vista), ('metodo', request.method), ('estado', respuesta.status_code)))
+        registro.observar('http_solicitud_segundos', (('vista', vista), ('metodo', request.method)), duracion)
+        if medicion is not None:
+            etiquetas = (('vista', vista),)
+            registro.observar('http_sql_segundos', etiquetas, medicion.sql_segundos)
+            registro.observar('http_sql_consultas', etiquetas, medicion.consultas, BUCKETS_CONSULTAS)
+            registro.observar('http_serializacion_segundos', etiquetas, medicion.serializacion_segundos)
+        if duracion >= umbral_lento() and not request.metricas.espera_larga:
+            self.registrar_lenta(request, vista, medicion, duracion)
+
+    def registrar_lenta(self, request, vista, medicion, duracion):
+        if medicion is None:
+            logger.warning('Petición lenta %s %s (%s): %.0f ms (sin muestreo de SQL)', request.method, request.path, vista, duracion * 1000)
+            return
+        lentas = sorted(medicion.sentencias, key=lambda s: s[0], reverse=True)[:5]
+        logger.warning(
+            'Petición lenta %s %s (%s): %.0f ms, %d consultas en %.0f ms, serialización %.0f ms\n%s',
+            request.method, request.path, vista, duracion * 1000, medicion.consultas,
+            medicion.sql_segundos * 1000, medicion.serializacion_segundos * 1000,
+            '\n'.join(f'  {segundos * 1000:.1f} ms  {sql}' for segundos, sql in lentas),
+        )
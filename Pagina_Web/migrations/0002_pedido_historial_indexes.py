@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('completado', True)), fields=['-fecha_creacion', '-id'], name='pedido_historial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['mesa', '-fecha_creacion', '-id'], name='pedido_mesa_historial_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:14
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fusionar_lineas_duplicadas(apps, schema_editor):
+    # Antes de la restricción única, las carreras en agregar_plato podían duplicar líneas
+    DetallePedido = apps.get_model('Pagina_Web', 'DetallePedido')
+    detalles = DetallePedido.objects.using(schema_editor.connection.alias)
+    duplicados = (
+        detalles.values('pedido_id', 'plato_id')
+        .annotate(lineas=Count('id'), total=Sum('cantidad'))
+        .filter(lineas__gt=1)
+    )
+    for grupo in duplicados:
+        lineas = detalles.filter(pedido_id=grupo['pedido_id'], plato_id=grupo['plato_id']).order_by('id')
+        primera = lineas.first()
+        lineas.exclude(pk=primera.pk).delete()
+        detalles.filter(pk=primera.pk).update(cantidad=grupo['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0002_pedido_historial_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_lineas_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='detallepedido',
+            constraint=models.UniqueConstraint(fields=('pedido', 'plato'), name='detallepedido_pedido_plato_unico'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0004_versiones_sincronizacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plato',
+            name='imagen_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
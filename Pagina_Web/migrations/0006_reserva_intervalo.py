@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def completar_fin(apps, schema_editor):
+    # Las reservas existentes no tenían duración: se asume la duración por defecto (2 horas)
+    Reserva = apps.get_model('Pagina_Web', 'Reserva')
+    Reserva.objects.using(schema_editor.connection.alias).filter(fecha_hora_fin__isnull=True).update(fecha_hora_fin=F('fecha_hora') + timedelta(hours=2))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0005_plato_imagen_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reserva',
+            name='fecha_hora_fin',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(completar_fin, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reserva',
+            name='fecha_hora_fin',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['mesa', 'fecha_hora', 'fecha_hora_fin'], name='reserva_mesa_intervalo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reserva',
+            index=models.Index(fields=['fecha_hora', 'fecha_hora_fin'], name='reserva_intervalo_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0006_reserva_intervalo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('dimension', models.CharField(choices=[('total', 'Total'), ('plato', 'Plato'), ('categoria', 'Categoría'), ('piso', 'Piso')], max_length=10)),
+                ('clave', models.CharField(blank=True, max_length=50)),
+                ('ingresos', models.BigIntegerField(default=0)),
+                ('pedidos', models.PositiveIntegerField(default=0)),
+                ('unidades', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['fecha', 'dimension', 'clave'],
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'dimension', 'clave'), name='resumenventas_fecha_dimension_clave_unico')],
+            },
+        ),
+    ]
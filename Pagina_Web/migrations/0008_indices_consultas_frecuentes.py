@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0007_resumen_ventas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='incidente',
+            index=models.Index(fields=['-fecha_creacion'], name='incidente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='incidente',
+            index=models.Index(condition=models.Q(('visto', False)), fields=['-fecha_creacion'], name='incidente_no_visto_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('completado', False)), fields=['-fecha_creacion', '-id'], name='pedido_abiertos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('completado', False)), fields=['mesa', '-fecha_creacion', '-id'], name='pedido_mesa_abiertos_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0008_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketCocina',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('tipo', models.CharField(choices=[('Agregar', 'Agregar'), ('Quitar', 'Quitar')], default='Agregar', max_length=10)),
+                ('estacion', models.CharField(choices=[('barra', 'Barra'), ('fria', 'Cocina fría'), ('caliente', 'Cocina caliente')], max_length=10)),
+                ('listo', models.BooleanField(default=False)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_listo', models.DateTimeField(blank=True, null=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Pagina_Web.pedido')),
+                ('plato', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='Pagina_Web.plato')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('listo', False)), fields=['estacion', 'id'], name='ticket_cola_idx')],
+            },
+        ),
+    ]
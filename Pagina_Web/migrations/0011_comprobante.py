@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0010_token_dispositivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comprobante',
+            fields=[
+                ('pedido', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='comprobante', serialize=False, to='Pagina_Web.pedido')),
+                ('fecha_creacion', models.DateTimeField()),
+                ('fecha_cierre', models.DateTimeField(auto_now_add=True)),
+                ('mesa_nombre', models.CharField(max_length=100)),
+                ('piso_id', models.BigIntegerField()),
+                ('piso_nombre', models.CharField(max_length=100)),
+                ('total', models.BigIntegerField()),
+                ('unidades', models.PositiveIntegerField()),
+                ('lineas', models.JSONField(default=list)),
+            ],
+            options={
+                'ordering': ['-fecha_creacion', '-pedido_id'],
+                'indexes': [models.Index(fields=['-fecha_creacion', '-pedido'], name='comprobante_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0011_comprobante'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Espera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_cliente', models.CharField(max_length=100)),
+                ('cantidad_personas', models.PositiveIntegerField()),
+                ('estado', models.CharField(choices=[('Esperando', 'Esperando'), ('Sentado', 'Sentado'), ('Cancelado', 'Cancelado')], default='Esperando', max_length=10)),
+                ('fecha_llegada', models.DateTimeField(auto_now_add=True)),
+                ('fecha_asignacion', models.DateTimeField(blank=True, null=True)),
+                ('mesa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Pagina_Web.mesa')),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Pagina_Web.pedido')),
+                ('piso', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='Pagina_Web.piso')),
+            ],
+            options={
+                'ordering': ['fecha_llegada', 'id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'Esperando')), fields=['fecha_llegada', 'id'], name='espera_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def indice_fts(tabla, columnas):
+    # Índice FTS5 de contenido externo sobre 'tabla' y los triggers que lo mantienen al día.
+    # Devuelve (sentencias, sentencias para deshacerlo).
+    fts = f'{tabla}_fts'
+    lista = ', '.join(columnas)
+    nuevos = ', '.join(f'new.{columna}' for columna in columnas)
+    viejos = ', '.join(f'old.{columna}' for columna in columnas)
+    cambiaron = ' OR '.join(f'old.{columna} IS NOT new.{columna}' for columna in columnas)
+    sentencias = [
+        f"CREATE VIRTUAL TABLE \"{fts}\" USING fts5({lista}, content='{tabla}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2')",
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{tabla}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, {lista}) VALUES (new.id, {nuevos}); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{tabla}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, {lista}) VALUES (\'delete\', old.id, {viejos}); END',
+        # save() reescribe todas las columnas: solo se reindexa si cambió el texto
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE ON "{tabla}" WHEN {cambiaron} BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, {lista}) VALUES (\'delete\', old.id, {viejos}); '
+        f'INSERT INTO "{fts}"(rowid, {lista}) VALUES (new.id, {nuevos}); END',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    ]
+    deshacer = [f'DROP TRIGGER "{fts}_{sufijo}"' for sufijo in ('ai', 'ad', 'au')] + [f'DROP TABLE "{fts}"']
+    return sentencias, deshacer
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0012_espera'),
+    ]
+
+    operations = [
+        migrations.RunSQL(*indice_fts('Pagina_Web_incidente', ['mensaje'])),
+        migrations.RunSQL(*indice_fts('Pagina_Web_plato', ['nombre', 'descripcion'])),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0013_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='sucursal',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def copiar_nombres(apps, schema_editor):
+    # Los acumulados existentes toman el nombre del último comprobante de su día
+    alias = schema_editor.connection.alias
+    Comprobante = apps.get_model('Pagina_Web', 'Comprobante')
+    ResumenVentas = apps.get_model('Pagina_Web', 'ResumenVentas')
+    nombres = {}
+    comprobantes = Comprobante.objects.using(alias).order_by('fecha_creacion', 'pedido_id')
+    for comprobante in comprobantes.values('fecha_creacion', 'piso_id', 'piso_nombre', 'lineas').iterator(chunk_size=2000):
+        fecha = timezone.localdate(comprobante['fecha_creacion'])
+        nombres[fecha, 'piso', str(comprobante['piso_id'])] = comprobante['piso_nombre']
+        for linea in comprobante['lineas']:
+            nombres[fecha, 'plato', str(linea['plato_id'])] = linea['nombre']
+    filas = list(ResumenVentas.objects.using(alias).filter(dimension__in=('plato', 'piso')))
+    for fila in filas:
+        fila.nombre = nombres.get((fila.fecha, fila.dimension, fila.clave), '')
+    ResumenVentas.objects.using(alias).bulk_update(filas, ['nombre'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Pagina_Web', '0014_perfil_sucursal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumenventas',
+            name='nombre',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(copiar_nombres, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,71 @@
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, models, router, transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class VersionSincronizacion(models.Model):
+    # Contador global y monótono de cambios sobre los modelos versionados (fila única)
+    valor = models.PositiveBigIntegerField(default=0)
+
+    @classmethod
+    def siguiente(cls, using=None):
+        # Cada sucursal tiene su propio contador (ver sucursales.py)
+        using = using or router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            contador = cls.objects.using(using)
+            if not contador.filter(pk=1).update(valor=F('valor') + 1):
+                contador.get_or_create(pk=1)
+                contador.filter(pk=1).update(valor=F('valor') + 1)
+            return contador.values_list('valor', flat=True).get(pk=1)
+
+class Eliminacion(models.Model):
+    # Lápida de una fila versionada eliminada, para la sincronización con ?since=
+    modelo = models.CharField(max_length=50)
+    objeto_id = models.BigIntegerField()
+    version = models.PositiveBigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['modelo', 'version'], name='eliminacion_modelo_version_idx')]
+
+class VersionadoQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # Toda actualización masiva también avanza la versión de las filas afectadas
+        from .signals import filas_actualizadas
+        # La versión se asigna en la misma transacción que la escritura (ver Versionado.save)
+        with transaction.atomic(using=self.db):
+            # Solo se pide una versión si el llamador no trae la suya (transicion ya la asignó)
+            if 'version' not in kwargs:
+                kwargs['version'] = VersionSincronizacion.siguiente(self.db)
+            version = kwargs['version']
+            actualizadas = super().update(**kwargs)
+        if actualizadas:
+            # Todas las filas tocadas comparten la versión nueva, así se identifican después
+            filas_actualizadas.send(sender=self.model, queryset=self.model.objects.using(self.db).filter(version=version))
+        return actualizadas
+
+class Versionado(models.Model):
+    version = models.PositiveBigIntegerField(default=0, db_index=True, editable=False)
 
-class Piso(models.Model):
+    objects = VersionadoQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # Contador y fila en una sola transacción: si el contador se confirmara antes, un
+        # ?since= podría ver la versión nueva sin la fila y saltársela para siempre
+        with transaction.atomic(using=using):
+            self.version = VersionSincronizacion.siguiente(using)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+            super().save(*args, **kwargs)
+
+class Piso(Versionado):
     nombre = models.CharField(max_length=100, unique=True)
     numero = models.PositiveIntegerField(unique=True, help_text="Número para ordenar los pisos. Ej: 1, 2, 3...")
 
@@ -17,11 +81,27 @@ class Perfil(models.Model):
     rut = models.CharField(max_length=12, blank=True)
     fecha_nacimiento = models.DateField(null=True, blank=True)
     nacionalidad = models.CharField(max_length=50, blank=True)
+    # Alias de la sucursal donde trabaja (ver sucursales.py); vacío: cualquiera
+    sucursal = models.CharField(max_length=50, blank=True, default='')
 
     def __str__(self):
         return f'Perfil de {self.user.username}'
 
-class Mesa(models.Model):
+class MesaQuerySet(VersionadoQuerySet):
+    def transicion(self, mesa, desde, hacia):
+        """
+        Pasa la mesa a 'hacia' con un solo UPDATE condicionado a que siga en uno de los estados
+        'desde' y con la versión con que se leyó. Devuelve False si otra petición la cambió
+        entre la lectura y la escritura; si no, actualiza también 'mesa' en memoria.
+        """
+        with transaction.atomic(using=self.db):
+            version = VersionSincronizacion.siguiente(self.db)
+            if not self.filter(pk=mesa.pk, estado__in=desde, version=mesa.version).update(estado=hacia, version=version):
+                return False
+        mesa.estado, mesa.version = hacia, version
+        return True
+
+class Mesa(Versionado):
     ESTADO_CHOICES = [
         ('Libre', 'Libre'),
         ('Ocupada', 'Ocupada'),
@@ -33,6 +113,8 @@ class Mesa(models.Model):
     estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='Libre')
     piso = models.ForeignKey(Piso, on_delete=models.CASCADE, related_name='mesas')
 
+    objects = MesaQuerySet.as_manager()
+
     class Meta:
         # Nombre único dentro de cada piso
         unique_together = ('piso', 'nombre')
@@ -53,17 +135,98 @@ class Plato(models.Model):
     precio = models.IntegerField()
     categoria = models.CharField(max_length=20, choices=CATEGORIA_CHOICES)
     imagen = models.ImageField(upload_to='platos/', null=True, blank=True)
+    # Variantes redimensionadas de la imagen, generadas en segundo plano (ver imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.nombre} - ${self.precio:,.0f} CLP".replace(",",".")
 
+    def _srcset(self, extension):
+        anchos = self.imagen_variantes.get('formatos', {}).get(extension, {})
+        return ', '.join(f'{self.imagen.storage.url(nombre)} {ancho}w' for ancho, nombre in anchos.items())
+
+    @property
+    def srcset_webp(self):
+        return self._srcset('webp')
+
+    @property
+    def srcset_jpg(self):
+        return self._srcset('jpg')
+
+class DetallePedidoQuerySet(models.QuerySet):
+    def con_subtotales(self):
+        # El subtotal se calcula en la base de datos junto con el plato
+        return self.select_related('plato').annotate(
+            subtotal_anotado=F('plato__precio') * F('cantidad')
+        )
+
+    def sumar(self, pedido, plato, cantidad=1):
+        # Incremento en la base de datos (UPDATE ... SET cantidad = cantidad + n) o INSERT si
+        # la línea no existe; si otro mozo la insertó primero, la restricción única lo detecta.
+        from .signals import filas_actualizadas, linea_modificada
+        lineas = self.filter(pedido=pedido, plato=plato)
+        with transaction.atomic(using=self.db):
+            if not lineas.update(cantidad=F('cantidad') + cantidad):
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(pedido=pedido, plato=plato, cantidad=cantidad)
+                    linea_modificada.send(sender=DetallePedido, pedido_id=pedido.pk, plato=plato, cantidad=cantidad)
+                    return
+                except IntegrityError:
+                    lineas.update(cantidad=F('cantidad') + cantidad)
+            filas_actualizadas.send(sender=DetallePedido, queryset=lineas)
+            linea_modificada.send(sender=DetallePedido, pedido_id=pedido.pk, plato=plato, cantidad=cantidad)
+
+    def restar(self, pedido, plato_id, cantidad=1):
+        # Devuelve False si el plato no estaba en el pedido; la línea se elimina al llegar a cero
+        from .signals import filas_actualizadas, linea_modificada
+        lineas = self.filter(pedido=pedido, plato_id=plato_id)
+        with transaction.atomic(using=self.db):
+            if lineas.filter(cantidad__gt=cantidad).update(cantidad=F('cantidad') - cantidad):
+                filas_actualizadas.send(sender=DetallePedido, queryset=lineas)
+                linea_modificada.send(sender=DetallePedido, pedido_id=pedido.pk, plato=plato_id, cantidad=-cantidad)
+                return True
+            restantes = list(lineas.values_list('cantidad', flat=True))
+            eliminadas, _ = lineas.delete()
+            if eliminadas:
+                linea_modificada.send(sender=DetallePedido, pedido_id=pedido.pk, plato=plato_id, cantidad=-sum(restantes))
+            return eliminadas > 0
+
+class PedidoQuerySet(models.QuerySet):
+    def con_totales(self):
+        # Un solo SELECT con el total como subconsulta, más un prefetch de las líneas
+        total = DetallePedido.objects.filter(pedido=OuterRef('pk')).values('pedido').annotate(
+            suma=Sum(F('plato__precio') * F('cantidad'))
+        ).values('suma')
+        return self.select_related('mesa').annotate(
+            total_anotado=Coalesce(Subquery(total), Value(0))
+        ).prefetch_related(
+            models.Prefetch('detallepedido_set', queryset=DetallePedido.objects.con_subtotales().order_by('id'))
+        )
+
 class Pedido(models.Model):
     mesa = models.ForeignKey(Mesa, on_delete=models.CASCADE)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     completado = models.BooleanField(default=False)
+
+    objects = PedidoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Historial paginado por (fecha_creacion, id), con y sin filtro por mesa.
+            # Es parcial porque en SQLite "completado" se filtra como columna booleana
+            # sin comparación, y solo así el planificador puede usar el índice.
+            models.Index(fields=['-fecha_creacion', '-id'], condition=models.Q(completado=True), name='pedido_historial_idx'),
+            models.Index(fields=['mesa', '-fecha_creacion', '-id'], name='pedido_mesa_historial_idx'),
+            # Pedidos abiertos (tablero de mozos), en general y por mesa
+            models.Index(fields=['-fecha_creacion', '-id'], condition=models.Q(completado=False), name='pedido_abiertos_idx'),
+            models.Index(fields=['mesa', '-fecha_creacion', '-id'], condition=models.Q(completado=False), name='pedido_mesa_abiertos_idx'),
+        ]
     
     @property
     def total(self):
+        if hasattr(self, 'total_anotado'):
+            return self.total_anotado
         detalles = self.detallepedido_set.all()
         total_pedido = sum([item.subtotal for item in detalles])
         return total_pedido
@@ -72,26 +235,99 @@ class Pedido(models.Model):
         return f"Pedido de {self.mesa.nombre} - {'Completado' if self.completado else 'Abierto'}"
 
 class DetallePedido(models.Model):
+    # Tope de unidades por pedido a la API: más que eso es un error de tipeo (y un número
+    # enorme desborda el entero de SQLite)
+    CANTIDAD_MAXIMA = 100
+
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE)
     plato = models.ForeignKey(Plato, on_delete=models.CASCADE)
     cantidad = models.PositiveIntegerField(default=1)
 
+    objects = DetallePedidoQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pedido', 'plato'], name='detallepedido_pedido_plato_unico'),
+        ]
+
     @property
     def subtotal(self):
+        if hasattr(self, 'subtotal_anotado'):
+            return self.subtotal_anotado
         return self.plato.precio * self.cantidad
     
     def __str__(self):
         return f"{self.cantidad}x {self.plato.nombre} en {self.pedido}"
     
-class Reserva(models.Model):
+class Comprobante(models.Model):
+    """
+    Copia de un pedido al cerrarlo: nombres, precios unitarios y cantidades de ese momento,
+    con el total ya calculado. El historial, las exportaciones y los reportes leen de aquí,
+    así un cambio de precio o de nombre posterior no altera lo vendido.
+    """
+    pedido = models.OneToOneField(Pedido, on_delete=models.CASCADE, primary_key=True, related_name='comprobante')
+    fecha_creacion = models.DateTimeField()  # la del pedido: el historial se ordena por ella
+    fecha_cierre = models.DateTimeField(auto_now_add=True)
+    mesa_nombre = models.CharField(max_length=100)
+    # Sin FK: el comprobante no cambia si después se borra o renombra el piso
+    piso_id = models.BigIntegerField()
+    piso_nombre = models.CharField(max_length=100)
+    total = models.BigIntegerField()
+    unidades = models.PositiveIntegerField()
+    # [{"plato_id", "nombre", "categoria", "precio", "cantidad"}, ...] en el orden de las líneas
+    lineas = models.JSONField(default=list)
+
+    class Meta:
+        ordering = ['-fecha_creacion', '-pedido_id']
+        indexes = [
+            models.Index(fields=['-fecha_creacion', '-pedido'], name='comprobante_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"Comprobante del pedido {self.pedido_id} ({self.mesa_nombre}): ${self.total}"
+
+def duracion_reserva_defecto():
+    return getattr(settings, 'RESERVA_DURACION_DEFECTO', timedelta(hours=2))
+
+def duracion_reserva_maxima():
+    return getattr(settings, 'RESERVA_DURACION_MAXIMA', timedelta(hours=6))
+
+class ReservaQuerySet(VersionadoQuerySet):
+    def solapadas(self, desde, hasta):
+        # Reservas que se cruzan con [desde, hasta). Como ninguna dura más que la duración
+        # máxima, basta un rango acotado del índice por fecha_hora en vez de recorrer la tabla.
+        return self.filter(
+            fecha_hora__lt=hasta,
+            fecha_hora__gt=desde - duracion_reserva_maxima(),
+            fecha_hora_fin__gt=desde,
+        )
+
+    def activas(self):
+        # Las que todavía no terminaron
+        return self.filter(fecha_hora_fin__gt=timezone.now())
+
+class Reserva(Versionado):
     mesa = models.ForeignKey(Mesa, on_delete=models.SET_NULL, null=True)
     nombre_cliente = models.CharField(max_length=100)
     fecha_hora = models.DateTimeField()
+    fecha_hora_fin = models.DateTimeField()
     cantidad_personas = models.PositiveIntegerField()
     notas = models.TextField(blank=True, null=True)
+
+    objects = ReservaQuerySet.as_manager()
     
     class Meta:
         ordering = ['fecha_hora']
+        indexes = [
+            # Índice de intervalos por mesa (conflictos) y global (disponibilidad)
+            models.Index(fields=['mesa', 'fecha_hora', 'fecha_hora_fin'], name='reserva_mesa_intervalo_idx'),
+            models.Index(fields=['fecha_hora', 'fecha_hora_fin'], name='reserva_intervalo_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.fecha_hora_fin is None:
+            self.fecha_hora_fin = self.fecha_hora + duracion_reserva_defecto()
+        super().save(*args, **kwargs)
 
     def __str__(self):
         try:
@@ -100,6 +336,33 @@ class Reserva(models.Model):
             nombre_mesa = "Mesa eliminada"
         return f"Reserva de {self.nombre_cliente} para la {nombre_mesa} el {self.fecha_hora.strftime('%d/%m/%Y %H:%M')}"
 
+class Espera(models.Model):
+    """Grupo sin reserva en la lista de espera; espera.py le busca la mesa que mejor le calza."""
+    ESTADO_CHOICES = [
+        ('Esperando', 'Esperando'),
+        ('Sentado', 'Sentado'),
+        ('Cancelado', 'Cancelado'),
+    ]
+    nombre_cliente = models.CharField(max_length=100)
+    cantidad_personas = models.PositiveIntegerField()
+    # Piso preferido; sin él se busca en todo el restaurante
+    piso = models.ForeignKey(Piso, on_delete=models.SET_NULL, null=True, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='Esperando')
+    mesa = models.ForeignKey(Mesa, on_delete=models.SET_NULL, null=True, blank=True)
+    pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True)
+    fecha_llegada = models.DateTimeField(auto_now_add=True)
+    fecha_asignacion = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['fecha_llegada', 'id']
+        indexes = [
+            # La fila de espera en orden de llegada
+            models.Index(fields=['fecha_llegada', 'id'], condition=models.Q(estado='Esperando'), name='espera_fila_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre_cliente} ({self.cantidad_personas} personas) - {self.estado}"
+
 class Incidente(models.Model):
     TIPO_CHOICES = [
         ('Queja', 'Queja'),
@@ -111,8 +374,87 @@ class Incidente(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     visto = models.BooleanField(default=False)
 
+    class Meta:
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['-fecha_creacion'], name='incidente_fecha_idx'),
+            # Incidentes sin ver (tablero de mozos)
+            models.Index(fields=['-fecha_creacion'], condition=models.Q(visto=False), name='incidente_no_visto_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} - {self.fecha_creacion.strftime('%d/%m/%Y')}"
+
+class ResumenVentas(models.Model):
+    """Acumulado diario de ventas por dimensión; lo mantiene reportes.py al finalizar pedidos."""
+    DIMENSION_CHOICES = [
+        ('total', 'Total'),
+        ('plato', 'Plato'),
+        ('categoria', 'Categoría'),
+        ('piso', 'Piso'),
+    ]
+    fecha = models.DateField()
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    # Id del plato o del piso, nombre de la categoría, o vacío para el total del día
+    clave = models.CharField(max_length=50, blank=True)
+    # Nombre del plato o del piso según el último comprobante del día
+    nombre = models.CharField(max_length=100, blank=True, default='')
+    ingresos = models.BigIntegerField(default=0)
+    pedidos = models.PositiveIntegerField(default=0)
+    unidades = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['fecha', 'dimension', 'clave']
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'dimension', 'clave'], name='resumenventas_fecha_dimension_clave_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.dimension} {self.clave}: ${self.ingresos}"
+
+class TicketCocina(models.Model):
+    """Cada cambio en una línea de pedido, enviado a la estación de cocina que prepara el plato."""
+    ESTACION_CHOICES = [
+        ('barra', 'Barra'),
+        ('fria', 'Cocina fría'),
+        ('caliente', 'Cocina caliente'),
+    ]
+    TIPO_CHOICES = [
+        ('Agregar', 'Agregar'),
+        ('Quitar', 'Quitar'),
+    ]
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE)
+    plato = models.ForeignKey(Plato, on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, default='Agregar')
+    estacion = models.CharField(max_length=10, choices=ESTACION_CHOICES)
+    listo = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_listo = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # Cola de cada estación en orden de llegada (el id crece con la llegada)
+            models.Index(fields=['estacion', 'id'], condition=models.Q(listo=False), name='ticket_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} {self.cantidad}x {self.plato.nombre} ({self.get_estacion_display()})"
+
+class TokenDispositivo(models.Model):
+    """Token de API de un dispositivo del personal (tablet de un mozo). Solo se guarda su hash."""
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tokens')
+    clave = models.CharField(max_length=64, unique=True)  # SHA-256 del token
+    prefijo = models.CharField(max_length=8)  # primeros caracteres, para reconocerlo en la lista
+    dispositivo = models.CharField(max_length=100, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultimo_uso = models.DateTimeField(null=True, blank=True)
+    revocado = models.BooleanField(default=False)
+    fecha_revocacion = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         ordering = ['-fecha_creacion']
 
     def __str__(self):
-        return f"{self.tipo} - {self.fecha_creacion.strftime('%d/%m/%Y')}"
\ No newline at end of file
+        return f"{self.prefijo}… de {self.usuario.username} ({self.dispositivo or 'sin nombre'})"
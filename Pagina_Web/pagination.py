@@ -0,0 +1,85 @@
+import base64
+import binascii
+from urllib.parse import urlencode
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class FechaCursorPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (fecha_creacion, pk), de más nuevo a más antiguo.
+    Cada página es una búsqueda por rango en el índice, sin OFFSET ni COUNT,
+    por lo que cuesta lo mismo en la primera página que en la milésima.
+    """
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-fecha_creacion', '-pk')
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            fecha, pk = cursor
+            # El primer término acota el rango del índice; el segundo desempata por id
+            queryset = queryset.filter(
+                Q(fecha_creacion__lte=fecha) & (Q(fecha_creacion__lt=fecha) | Q(pk__lt=pk))
+            )
+
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.last = page[-1] if page else None
+        return page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            fecha, pk = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            fecha, pk = parse_datetime(fecha), int(pk)
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if fecha is None:
+            raise NotFound(self.invalid_cursor_message)
+        return fecha, pk
+
+    def encode_cursor(self, fila):
+        raw = f'{fila.fecha_creacion.isoformat()}|{fila.pk}'
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        params = self.request.query_params.copy()
+        params[self.cursor_query_param] = self.encode_cursor(self.last)
+        return self.request.build_absolute_uri(self.request.path) + '?' + urlencode(params)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,195 @@
+"""
+Importación y exportación masiva del plano del local (pisos y sus mesas) en JSON o CSV.
+
+JSON: {"pisos": [{"numero": 1, "nombre": "Terraza", "mesas": [{"nombre": "T1", "capacidad": 4}]}]}
+CSV:  piso_numero,piso_nombre,mesa,capacidad  (una fila por mesa; 'mesa' vacía = piso sin mesas)
+
+Los pisos se identifican por número y las mesas por (piso, nombre), así que importar dos veces
+el mismo archivo no cambia nada. El estado de las mesas no forma parte del plano.
+"""
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import router, transaction
+
+from .models import Mesa, Piso, VersionSincronizacion
+from .signals import filas_actualizadas
+
+FORMATOS = ('json', 'csv')
+COLUMNAS = ['piso_numero', 'piso_nombre', 'mesa', 'capacidad']
+LOTE = 500
+LARGO_NOMBRE = 100
+
+
+def exportar(formato='json'):
+    pisos = Piso.objects.prefetch_related('mesas').order_by('numero')
+    if formato == 'json':
+        return {'pisos': [
+            {
+                'numero': piso.numero, 'nombre': piso.nombre,
+                'mesas': [{'nombre': m.nombre, 'capacidad': m.capacidad} for m in sorted(piso.mesas.all(), key=lambda m: m.nombre)],
+            }
+            for piso in pisos
+        ]}
+    salida = io.StringIO()
+    escritor = csv.writer(salida)
+    escritor.writerow(COLUMNAS)
+    for piso in pisos:
+        mesas = sorted(piso.mesas.all(), key=lambda m: m.nombre)
+        if not mesas:
+            escritor.writerow([piso.numero, piso.nombre, '', ''])
+        for mesa in mesas:
+            escritor.writerow([piso.numero, piso.nombre, mesa.nombre, mesa.capacidad])
+    return salida.getvalue()
+
+
+def leer(contenido, formato):
+    """Convierte el archivo (texto, o ya decodificado si es JSON) a una lista de pisos con sus mesas."""
+    if formato == 'json':
+        datos = json.loads(contenido) if isinstance(contenido, (str, bytes)) else contenido
+        pisos = datos.get('pisos') if isinstance(datos, dict) else datos
+        if not isinstance(pisos, list):
+            raise ValidationError('Se esperaba una lista de pisos o un objeto con la clave "pisos".')
+        for piso in pisos:
+            if not isinstance(piso, dict) or not isinstance(piso.get('mesas', []), list):
+                raise ValidationError('Cada piso debe ser un objeto y sus mesas una lista.')
+        return [
+            {'numero': p.get('numero'), 'nombre': p.get('nombre'), 'mesas': list(p.get('mesas', []))}
+            for p in pisos
+        ]
+
+    lector = csv.DictReader(io.StringIO(contenido))
+    faltantes = set(COLUMNAS[:3]) - set(lector.fieldnames or [])
+    if faltantes:
+        raise ValidationError(f'Faltan columnas en el CSV: {", ".join(sorted(faltantes))}.')
+    pisos = {}
+    errores = []
+    for linea, fila in enumerate(lector, start=2):
+        numero = fila['piso_numero']
+        piso = pisos.setdefault(numero, {'numero': numero, 'nombre': fila['piso_nombre'], 'mesas': []})
+        if piso['nombre'] != fila['piso_nombre']:
+            errores.append(f'Línea {linea}: el piso {numero} aparece con dos nombres distintos.')
+        if fila['mesa']:
+            piso['mesas'].append({'nombre': fila['mesa'], 'capacidad': fila.get('capacidad') or None})
+    if errores:
+        raise ValidationError(errores)
+    return list(pisos.values())
+
+
+def _entero_positivo(valor):
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return None
+    return numero if numero > 0 else None
+
+
+def validar(pisos):
+    """
+    Revisa el plano completo antes de escribir nada y normaliza los valores.
+    Junta todos los errores (datos inválidos, números o nombres repetidos, mesas repetidas
+    dentro de un piso) en una sola ValidationError.
+    """
+    errores = []
+    numeros, nombres = set(), {}
+    for i, piso in enumerate(pisos, start=1):
+        numero = _entero_positivo(piso['numero'])
+        nombre = str(piso['nombre'] or '').strip()
+        if numero is None:
+            errores.append(f'Piso #{i}: el número debe ser un entero positivo.')
+        elif numero in numeros:
+            errores.append(f'Piso {numero}: número repetido en el archivo.')
+        if not nombre or len(nombre) > LARGO_NOMBRE:
+            errores.append(f'Piso #{i}: el nombre es obligatorio (máximo {LARGO_NOMBRE} caracteres).')
+        elif nombre in nombres and nombres[nombre] != numero:
+            errores.append(f'Piso "{nombre}": nombre repetido en el archivo.')
+        numeros.add(numero)
+        nombres[nombre] = numero
+        piso['numero'], piso['nombre'] = numero, nombre
+
+        vistas = set()
+        for mesa in piso['mesas']:
+            mesa['nombre'] = str(mesa.get('nombre') or '').strip()
+            capacidad = mesa.get('capacidad')
+            mesa['capacidad'] = 4 if capacidad in (None, '') else _entero_positivo(capacidad)
+            if not mesa['nombre'] or len(mesa['nombre']) > LARGO_NOMBRE:
+                errores.append(f'Piso {numero}: hay una mesa sin nombre o con más de {LARGO_NOMBRE} caracteres.')
+            elif mesa['nombre'] in vistas:
+                errores.append(f'Piso {numero}: la mesa "{mesa["nombre"]}" está repetida.')
+            if mesa['capacidad'] is None:
+                errores.append(f'Piso {numero}, mesa "{mesa["nombre"]}": la capacidad debe ser un entero positivo.')
+            vistas.add(mesa['nombre'])
+
+    # Nombres de piso que ya usa otro piso (con otro número) en la base
+    ocupados = Piso.objects.filter(nombre__in=list(nombres)).exclude(numero__in=list(numeros))
+    for nombre, numero in ocupados.values_list('nombre', 'numero'):
+        errores.append(f'Piso "{nombre}": el nombre ya lo usa el piso {numero}.')
+    if errores:
+        raise ValidationError(errores)
+
+
+def importar(pisos):
+    """
+    Crea o actualiza pisos y mesas en una sola transacción, con inserciones y actualizaciones
+    por lotes. No elimina lo que no venga en el archivo. Devuelve cuántas filas cambiaron.
+    """
+    validar(pisos)
+    resumen = {'pisos_creados': 0, 'pisos_actualizados': 0, 'mesas_creadas': 0, 'mesas_actualizadas': 0}
+    with transaction.atomic(using=router.db_for_write(Piso)):
+        version = VersionSincronizacion.siguiente()
+        existentes = {p.numero: p for p in Piso.objects.filter(numero__in=[p['numero'] for p in pisos])}
+        nombres_actuales = {p.nombre for p in existentes.values()}
+        nuevos, renombrados = [], []
+        for datos in pisos:
+            piso = existentes.get(datos['numero'])
+            if piso is None:
+                nuevos.append(Piso(numero=datos['numero'], nombre=datos['nombre'], version=version))
+            elif piso.nombre != datos['nombre']:
+                piso.nombre = datos['nombre']
+                renombrados.append(piso)
+        if any(piso.nombre in nombres_actuales for piso in renombrados):
+            # Un intercambio de nombres (1: A -> B y 2: B -> A) choca con la restricción única a
+            # mitad del UPDATE: primero todos los renombrados pasan por un nombre provisorio
+            finales = [piso.nombre for piso in renombrados]
+            for piso in renombrados:
+                piso.nombre = f'~{version}~{piso.pk}'
+            Piso.objects.bulk_update(renombrados, ['nombre'], batch_size=LOTE)
+            for piso, nombre in zip(renombrados, finales):
+                piso.nombre = nombre
+        # bulk_update pasa por VersionadoQuerySet.update: avanza la versión y avisa con filas_actualizadas.
+        # Va antes de bulk_create porque un piso nuevo puede tomar el nombre que deja uno renombrado
+        Piso.objects.bulk_update(renombrados, ['nombre'], batch_size=LOTE)
+        Piso.objects.bulk_create(nuevos, batch_size=LOTE)
+        por_numero = {**existentes, **{p.numero: p for p in nuevos}}
+
+        mesas_existentes = {
+            (m.piso_id, m.nombre): m for m in Mesa.objects.filter(piso__in=list(por_numero.values()))
+        }
+        mesas_nuevas, mesas_cambiadas = [], []
+        for datos in pisos:
+            piso = por_numero[datos['numero']]
+            for datos_mesa in datos['mesas']:
+                mesa = mesas_existentes.get((piso.pk, datos_mesa['nombre']))
+                if mesa is None:
+                    mesas_nuevas.append(Mesa(
+                        piso=piso, nombre=datos_mesa['nombre'], capacidad=datos_mesa['capacidad'], version=version,
+                    ))
+                elif mesa.capacidad != datos_mesa['capacidad']:
+                    mesa.capacidad = datos_mesa['capacidad']
+                    mesas_cambiadas.append(mesa)
+        Mesa.objects.bulk_create(mesas_nuevas, batch_size=LOTE)
+        Mesa.objects.bulk_update(mesas_cambiadas, ['capacidad'], batch_size=LOTE)
+
+        # bulk_create no dispara post_save: se avisa igual que en las actualizaciones masivas
+        if nuevos:
+            filas_actualizadas.send(sender=Piso, queryset=Piso.objects.filter(version=version))
+        if mesas_nuevas:
+            filas_actualizadas.send(sender=Mesa, queryset=Mesa.objects.filter(version=version))
+
+    resumen.update(
+        pisos_creados=len(nuevos), pisos_actualizados=len(renombrados),
+        mesas_creadas=len(mesas_nuevas), mesas_actualizadas=len(mesas_cambiadas),
+    )
+    return resumen
@@ -0,0 +1,190 @@
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import sucursales
+from .db import escritura
+from .filters import inicio_del_dia
+from .models import Comprobante, ResumenVentas
+
+PERIODOS = ('semana', 'mes', 'anio')
+
+
+def _sumar_fila(fecha, dimension, clave, ingresos, pedidos, unidades, nombre=''):
+    filas = ResumenVentas.objects.filter(fecha=fecha, dimension=dimension, clave=clave)
+    incrementos = {
+        'ingresos': F('ingresos') + ingresos,
+        'pedidos': F('pedidos') + pedidos,
+        'unidades': F('unidades') + unidades,
+        # El nombre del último comprobante del día: un renombre posterior no lo cambia
+        'nombre': nombre,
+    }
+    if filas.update(**incrementos):
+        return
+    try:
+        with transaction.atomic(using=filas.db):
+            ResumenVentas.objects.create(
+                fecha=fecha, dimension=dimension, clave=clave, nombre=nombre,
+                ingresos=ingresos, pedidos=pedidos, unidades=unidades,
+            )
+    except IntegrityError:
+        filas.update(**incrementos)
+
+
+def _acumulados(comprobante):
+    """
+    (dimension, clave) -> [ingresos, unidades, nombre] de un comprobante, para cada fila de
+    resumen que toca. Platos y pisos llevan el nombre copiado en el comprobante.
+    """
+    acumulados = defaultdict(lambda: [0, 0, ''])
+    for linea in comprobante['lineas']:
+        ingresos, unidades = linea['precio'] * linea['cantidad'], linea['cantidad']
+        acumulados[('plato', str(linea['plato_id']))][2] = linea['nombre']
+        for clave in (('plato', str(linea['plato_id'])), ('categoria', linea['categoria'])):
+            acumulados[clave][0] += ingresos
+            acumulados[clave][1] += unidades
+    acumulados[('total', '')] = [comprobante['total'], comprobante['unidades'], '']
+    acumulados[('piso', str(comprobante['piso_id']))] = [comprobante['total'], comprobante['unidades'], comprobante['piso_nombre']]
+    return acumulados
+
+
+CAMPOS_COMPROBANTE = ('fecha_creacion', 'piso_id', 'piso_nombre', 'total', 'unidades', 'lineas')
+
+
+def acumular_pedido(comprobante):
+    """Suma un pedido recién finalizado (su comprobante) a los acumulados de su día."""
+    fecha = timezone.localdate(comprobante.fecha_creacion)
+    acumulados = _acumulados({campo: getattr(comprobante, campo) for campo in CAMPOS_COMPROBANTE})
+    with transaction.atomic(using=comprobante._state.db):
+        for (dimension, clave), (ingresos, unidades, nombre) in acumulados.items():
+            _sumar_fila(fecha, dimension, clave, ingresos, 1, unidades, nombre)
+
+
+def reconstruir(desde=None, hasta=None):
+    """
+    Recalcula los acumulados desde los comprobantes (para cargas iniciales o correcciones).
+    Lee y reemplaza en una sola escritura: un pedido que se finalice mientras tanto espera su
+    turno y suma sobre las filas nuevas, en vez de perderse entre la lectura y el borrado.
+    """
+    comprobantes = Comprobante.objects.all()
+    existentes = ResumenVentas.objects.all()
+    if desde:
+        comprobantes = comprobantes.filter(fecha_creacion__gte=inicio_del_dia(desde))
+        existentes = existentes.filter(fecha__gte=desde)
+    if hasta:
+        comprobantes = comprobantes.filter(fecha_creacion__lt=inicio_del_dia(hasta + timedelta(days=1)))
+        existentes = existentes.filter(fecha__lte=hasta)
+
+    with escritura(existentes.db):
+        # (fecha, dimension, clave) -> [ingresos, pedidos, unidades, nombre]
+        totales = defaultdict(lambda: [0, 0, 0, ''])
+        # En orden de creación, así cada fila queda con el nombre del último comprobante del día
+        comprobantes = comprobantes.values(*CAMPOS_COMPROBANTE).order_by('fecha_creacion', 'pedido_id')
+        for comprobante in comprobantes.iterator(chunk_size=2000):
+            fecha = timezone.localdate(comprobante['fecha_creacion'])
+            for (dimension, clave), (ingresos, unidades, nombre) in _acumulados(comprobante).items():
+                fila = totales[fecha, dimension, clave]
+                fila[0] += ingresos
+                fila[1] += 1
+                fila[2] += unidades
+                fila[3] = nombre
+        filas = [
+            ResumenVentas(
+                fecha=fecha, dimension=dimension, clave=clave, nombre=nombre,
+                ingresos=ingresos, pedidos=pedidos, unidades=unidades,
+            )
+            for (fecha, dimension, clave), (ingresos, pedidos, unidades, nombre) in totales.items()
+        ]
+        existentes.delete()
+        ResumenVentas.objects.bulk_create(filas, batch_size=1000)
+    return len(filas)
+
+
+def rango_periodo(periodo, fecha):
+    if periodo == 'semana':
+        inicio = fecha - timedelta(days=fecha.weekday())
+        return inicio, inicio + timedelta(days=6)
+    if periodo == 'mes':
+        inicio = fecha.replace(day=1)
+        siguiente = (inicio + timedelta(days=32)).replace(day=1)
+        return inicio, siguiente - timedelta(days=1)
+    return date(fecha.year, 1, 1), date(fecha.year, 12, 31)
+
+
+def resumen_periodo(periodo, fecha):
+    desde, hasta = rango_periodo(periodo, fecha)
+    filas = ResumenVentas.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+    metricas = {'ingresos': Sum('ingresos'), 'pedidos': Sum('pedidos'), 'unidades': Sum('unidades')}
+
+    totales = filas.filter(dimension='total').aggregate(**metricas)
+    # Semana y mes se desglosan por día; el año, por mes
+    if periodo == 'anio':
+        serie = defaultdict(lambda: {'ingresos': 0, 'pedidos': 0, 'unidades': 0})
+        for fila in filas.filter(dimension='total').values('fecha', 'ingresos', 'pedidos', 'unidades'):
+            mes = serie[fila['fecha'].strftime('%Y-%m')]
+            for metrica in ('ingresos', 'pedidos', 'unidades'):
+                mes[metrica] += fila[metrica]
+        serie = [{'mes': mes, **valores} for mes, valores in sorted(serie.items())]
+    else:
+        serie = list(filas.filter(dimension='total').values('fecha', 'ingresos', 'pedidos', 'unidades'))
+
+    por_dimension = {}
+    for dimension in ('plato', 'categoria', 'piso'):
+        por_dimension[dimension] = list(
+            filas.filter(dimension=dimension).values('clave').annotate(**metricas).order_by('-ingresos')
+        )
+    # Nombres copiados de los comprobantes (el del día más reciente del período), no los de la
+    # carta actual: un plato o piso renombrado o borrado después se muestra como se vendió
+    nombres = {
+        (dimension, clave): nombre
+        for dimension, clave, nombre in filas.filter(dimension__in=('plato', 'piso')).exclude(nombre='')
+        .order_by('fecha').values_list('dimension', 'clave', 'nombre')
+    }
+    for dimension in ('plato', 'piso'):
+        for fila in por_dimension[dimension]:
+            fila['nombre'] = nombres.get((dimension, fila['clave']), f"{dimension.capitalize()} {fila['clave']}")
+
+    return {
+        'periodo': periodo,
+        'desde': desde,
+        'hasta': hasta,
+        'totales': {k: v or 0 for k, v in totales.items()},
+        'serie': serie,
+        'platos': por_dimension['plato'],
+        'categorias': por_dimension['categoria'],
+        'pisos': por_dimension['piso'],
+    }
+
+
+def resumen_sucursales(periodo, fecha, elegidas=None):
+    """
+    resumen_periodo de cada sucursal, leídas en paralelo, más los totales y las categorías
+    sumados. Platos y pisos no se suman: sus ids son propios de cada sucursal.
+    """
+    resumenes = sucursales.en_todas(lambda: resumen_periodo(periodo, fecha), elegidas)
+    totales = {'ingresos': 0, 'pedidos': 0, 'unidades': 0}
+    categorias = defaultdict(lambda: {'ingresos': 0, 'pedidos': 0, 'unidades': 0})
+    for resumen in resumenes.values():
+        for metrica in totales:
+            totales[metrica] += resumen['totales'][metrica]
+        for fila in resumen['categorias']:
+            for metrica in totales:
+                categorias[fila['clave']][metrica] += fila[metrica] or 0
+    desde, hasta = rango_periodo(periodo, fecha)
+    return {
+        'periodo': periodo,
+        'desde': desde,
+        'hasta': hasta,
+        'totales': totales,
+        'categorias': sorted(
+            ({'clave': clave, **valores} for clave, valores in categorias.items()),
+            key=lambda fila: -fila['ingresos'],
+        ),
+        'sucursales': [
+            {'sucursal': alias, 'nombre': sucursales.nombre(alias), **resumen}
+            for alias, resumen in resumenes.items()
+        ],
+    }
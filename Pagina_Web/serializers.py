@@ -1,31 +1,74 @@
 from rest_framework import serializers
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
-from .models import Mesa, Plato, Pedido, DetallePedido, Perfil, Reserva, Incidente, Piso
+from .models import (
+    Mesa, Plato, Pedido, DetallePedido, Perfil, Reserva, Incidente, Piso, TicketCocina, TokenDispositivo,
+    Comprobante, Espera,
+    duracion_reserva_defecto, duracion_reserva_maxima,
+)
+from . import sucursales
+from .busqueda import resaltar
+from .metricas import SerializacionMedida
 
-class MesaSerializer(serializers.ModelSerializer):
+class BusquedaSerializerMixin:
+    # Con ?search= la vista anota la relevancia de cada resultado y, con ?fragmento=1, el fragmento
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if hasattr(instance, 'relevancia'):
+            data['relevancia'] = round(instance.relevancia, 4)
+        if hasattr(instance, 'fragmento'):
+            data['fragmento'] = resaltar(instance.fragmento)
+        return data
+
+class MesaSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Mesa
         fields = ['id', 'nombre', 'capacidad', 'estado', 'piso']
+        # El estado solo cambia por las acciones de la API (ver MesaQuerySet.transicion)
+        read_only_fields = ['estado']
+
+    def update(self, instance, validated_data):
+        # Se guardan solo los campos recibidos: un guardado completo pisaría un cambio de
+        # estado hecho por otra petición entre la lectura y la escritura
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
-class PisoSerializer(serializers.ModelSerializer):
+class PisoSerializer(SerializacionMedida, serializers.ModelSerializer):
     mesas = MesaSerializer(many=True, read_only=True) # Incluye las mesas de cada piso
 
     class Meta:
         model = Piso
         fields = ['id', 'nombre', 'numero', 'mesas']
 
-class PlatoSerializer(serializers.ModelSerializer):
+class PlatoSerializer(SerializacionMedida, BusquedaSerializerMixin, serializers.ModelSerializer):
+    # URLs de las variantes redimensionadas: {'webp': {'320': url, ...}, 'jpg': {...}}
+    imagenes = serializers.SerializerMethodField()
+
     class Meta:
         model = Plato
-        fields = ['id', 'nombre', 'descripcion', 'precio', 'categoria', 'imagen']
+        fields = ['id', 'nombre', 'descripcion', 'precio', 'categoria', 'imagen', 'imagenes']
 
-class DetallePedidoSerializer(serializers.ModelSerializer):
+    def get_imagenes(self, obj):
+        request = self.context.get('request')
+        almacen = obj.imagen.storage
+        formatos = {}
+        for extension, anchos in obj.imagen_variantes.get('formatos', {}).items():
+            formatos[extension] = {}
+            for ancho, nombre in anchos.items():
+                url = almacen.url(nombre)
+                formatos[extension][ancho] = request.build_absolute_uri(url) if request else url
+        return formatos
+
+class DetallePedidoSerializer(SerializacionMedida, serializers.ModelSerializer):
     plato = PlatoSerializer(read_only=True)
     class Meta:
         model = DetallePedido
         fields = ['id', 'plato', 'cantidad', 'subtotal']
+        extra_kwargs = {'cantidad': {'max_value': DetallePedido.CANTIDAD_MAXIMA}}
 
-class PedidoSerializer(serializers.ModelSerializer):
+class PedidoSerializer(SerializacionMedida, serializers.ModelSerializer):
     mesa = MesaSerializer(read_only=True)
     detalles = DetallePedidoSerializer(source='detallepedido_set', many=True, read_only=True)
     class Meta:
@@ -33,12 +76,25 @@ class PedidoSerializer(serializers.ModelSerializer):
         fields = ['id', 'mesa', 'fecha_creacion', 'completado', 'total', 'detalles']
 
 
-class PerfilSerializer(serializers.ModelSerializer):
+class ComprobanteSerializer(SerializacionMedida, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='pedido_id', read_only=True)
+
+    class Meta:
+        model = Comprobante
+        fields = ['id', 'fecha_creacion', 'fecha_cierre', 'mesa_nombre', 'piso_nombre', 'total', 'unidades', 'lineas']
+
+
+class PerfilSerializer(SerializacionMedida, serializers.ModelSerializer):
     class Meta:
         model = Perfil
-        fields = ['rut', 'fecha_nacimiento', 'nacionalidad']
+        fields = ['rut', 'fecha_nacimiento', 'nacionalidad', 'sucursal']
+
+    def validate_sucursal(self, valor):
+        if valor and valor not in sucursales.todas():
+            raise serializers.ValidationError(f'Sucursal desconocida: {valor}.')
+        return valor
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SerializacionMedida, serializers.ModelSerializer):
     perfil = serializers.SerializerMethodField()
 
     class Meta:
@@ -55,7 +111,7 @@ class UserSerializer(serializers.ModelSerializer):
         except Perfil.DoesNotExist:
             return None
 
-class CreateUserSerializer(serializers.ModelSerializer):
+class CreateUserSerializer(SerializacionMedida, serializers.ModelSerializer):
     perfil = PerfilSerializer(required=True)
     password = serializers.CharField(write_only=True)
 
@@ -63,10 +119,14 @@ class CreateUserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['username', 'password', 'first_name', 'last_name', 'perfil']
     
+    def validate_password(self, value):
+        # El hash (lento a propósito) se calcula al validar, fuera del lock de escritura
+        return make_password(value)
+
     def create(self, validated_data):
         perfil_data = validated_data.pop('perfil')
-        user = User.objects.create_user(
-            username=validated_data['username'],
+        user = User.objects.create(
+            username=User.normalize_username(validated_data['username']),
             password=validated_data['password'],
             first_name=validated_data.get('first_name', ''),
             last_name=validated_data.get('last_name', ''),
@@ -74,16 +134,67 @@ class CreateUserSerializer(serializers.ModelSerializer):
         )
         Perfil.objects.create(user=user, **perfil_data)
         return user
-class ReservaSerializer(serializers.ModelSerializer):
+class ReservaSerializer(SerializacionMedida, serializers.ModelSerializer):
     # Para mostrar el nombre de la mesa en lugar de solo su ID
     mesa_nombre = serializers.CharField(source='mesa.nombre', read_only=True)
 
     class Meta:
         model = Reserva
         # 'mesa' es para escribir (enviar el ID), 'mesa_nombre' es para leer
-        fields = ['id', 'mesa', 'mesa_nombre', 'nombre_cliente', 'fecha_hora', 'cantidad_personas', 'notas']
+        fields = ['id', 'mesa', 'mesa_nombre', 'nombre_cliente', 'fecha_hora', 'fecha_hora_fin', 'cantidad_personas', 'notas']
+        extra_kwargs = {'fecha_hora_fin': {'required': False}}
+
+    def validate(self, attrs):
+        inicio = attrs.get('fecha_hora', getattr(self.instance, 'fecha_hora', None))
+        if 'fecha_hora_fin' not in attrs and 'fecha_hora' in attrs:
+            # Sin fin explícito se conserva la duración actual o se usa la de por defecto
+            duracion = self.instance.fecha_hora_fin - self.instance.fecha_hora if self.instance else duracion_reserva_defecto()
+            attrs['fecha_hora_fin'] = inicio + duracion
+        fin = attrs.get('fecha_hora_fin', getattr(self.instance, 'fecha_hora_fin', None))
+        if fin <= inicio:
+            raise serializers.ValidationError({'fecha_hora_fin': 'Debe ser posterior a fecha_hora.'})
+        if fin - inicio > duracion_reserva_maxima():
+            raise serializers.ValidationError({'fecha_hora_fin': 'La reserva supera la duración máxima permitida.'})
+        return attrs
 
-class IncidenteSerializer(serializers.ModelSerializer):
+class EsperaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    mesa_nombre = serializers.CharField(source='mesa.nombre', read_only=True)
+    # Minutos estimados (ver espera.estimar); la vista los calcula para toda la fila de una vez
+    espera_estimada = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Espera
+        fields = [
+            'id', 'nombre_cliente', 'cantidad_personas', 'piso', 'estado', 'mesa', 'mesa_nombre', 'pedido',
+            'fecha_llegada', 'fecha_asignacion', 'espera_estimada',
+        ]
+        read_only_fields = ['estado', 'mesa', 'pedido', 'fecha_asignacion']
+
+    def validate_cantidad_personas(self, valor):
+        if valor < 1:
+            raise serializers.ValidationError('Debe ser al menos una persona.')
+        return valor
+
+    def get_espera_estimada(self, obj):
+        return self.context.get('estimadas', {}).get(obj.id)
+
+class IncidenteSerializer(SerializacionMedida, BusquedaSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Incidente
-        fields = ['id', 'tipo', 'mensaje', 'fecha_creacion', 'visto']
\ No newline at end of file
+        fields = ['id', 'tipo', 'mensaje', 'fecha_creacion', 'visto']
+
+class TokenDispositivoSerializer(SerializacionMedida, serializers.ModelSerializer):
+    username = serializers.CharField(source='usuario.username', read_only=True)
+
+    class Meta:
+        model = TokenDispositivo
+        fields = ['id', 'usuario', 'username', 'prefijo', 'dispositivo', 'fecha_creacion', 'ultimo_uso', 'revocado', 'fecha_revocacion']
+        read_only_fields = fields
+
+class TicketCocinaSerializer(SerializacionMedida, serializers.ModelSerializer):
+    mesa = serializers.CharField(source='pedido.mesa.nombre', read_only=True)
+    plato_nombre = serializers.CharField(source='plato.nombre', read_only=True)
+
+    class Meta:
+        model = TicketCocina
+        fields = ['id', 'pedido', 'mesa', 'plato', 'plato_nombre', 'cantidad', 'tipo', 'estacion', 'listo', 'fecha_creacion']
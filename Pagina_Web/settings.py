@@ -1,5 +1,9 @@
+from datetime import timedelta
 from pathlib import Path
+import copy
+import json
 import os
+import tempfile
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-o5s8i==d+@6h6snsu#k9-kcwd*&3ytg%rsy$v5ti^-)g5k)$1h'
@@ -19,11 +23,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Sirve STATIC_URL antes que todo lo demás cuando ESTATICOS_COMPRIMIDOS está activo
+    'Pagina_Web.estaticos.EstaticosMiddleware',
+    'Pagina_Web.metricas.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Elige la base de la sucursal de la petición (ver sucursales.py)
+    'Pagina_Web.sucursales.SucursalMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -47,7 +56,68 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'Pagina_Web.wsgi.application'
-DATABASES = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'db.sqlite3'}}
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexiones reutilizadas entre peticiones (una por hilo)
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Segundos que una escritura espera el lock de SQLite antes de fallar
+            'timeout': 20,
+            # Las transacciones toman el lock de escritura al empezar, así esperan en cola
+            # en vez de fallar con "database is locked" al pasar de lectura a escritura
+            'transaction_mode': 'IMMEDIATE',
+            # WAL: las lecturas no bloquean a la escritura ni al revés
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=134217728;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    }
+}
+# Sucursales: la principal usa 'default' y cada una de las demás su propia base SQLite, con
+# las mismas opciones. El archivo lo mantiene el comando crear_sucursal:
+# {"centro": {"nombre": "Centro", "hosts": ["centro.example.com"], "archivo": "..."}}
+SUCURSAL_PRINCIPAL = os.environ.get('SUCURSAL_PRINCIPAL', 'Principal')
+SUCURSALES_ARCHIVO = Path(os.environ.get('SUCURSALES_ARCHIVO', BASE_DIR / 'sucursales.json'))
+SUCURSALES_DIRECTORIO = BASE_DIR / 'sucursales'
+SUCURSALES = json.loads(SUCURSALES_ARCHIVO.read_text()) if SUCURSALES_ARCHIVO.exists() else {}
+for _alias, _sucursal in SUCURSALES.items():
+    DATABASES[_alias] = {**copy.deepcopy(DATABASES['default']), 'NAME': _sucursal['archivo']}
+DATABASE_ROUTERS = ['Pagina_Web.sucursales.SucursalRouter']
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    # Respuestas JSON pre-renderizadas de los catálogos (ver Pagina_Web/cache.py)
+    'respuestas': {
+        'BACKEND': 'Pagina_Web.cache.LRUCache',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {'MAX_BYTES': 32 * 1024 * 1024},
+    },
+    # Generaciones de esas respuestas, en archivos compartidos por todos los procesos: una
+    # escritura de otro worker o de un comando (importar_plano, generar_variantes,
+    # poblar_restaurante) invalida los cuerpos guardados en cada proceso. Con SQLite todos
+    # corren en la misma máquina. Perder un archivo (MAX_ENTRIES) solo causa un MISS.
+    'generaciones': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_GENERACIONES', os.path.join(tempfile.gettempdir(), 'Pagina_Web', 'generaciones')),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # Tokens de dispositivo ya validados (ver Pagina_Web/tokens.py); el TIMEOUT acota cuánto
+    # tarda otro proceso en notar una revocación
+    'tokens': {
+        'BACKEND': 'Pagina_Web.cache.LRUCache',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_BYTES': 4 * 1024 * 1024},
+    },
+}
+# Un token de dispositivo que no se usa en este tiempo deja de valer
+TOKENS_VIGENCIA = timedelta(days=int(os.environ.get('TOKENS_VIGENCIA_DIAS', '30')))
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -60,18 +130,45 @@ USE_I18N = True
 USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'Pagina_Web', 'static')]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+# Estáticos con hash en el nombre, minificados y precomprimidos, servidos por la aplicación
+# con caché inmutable (ver estaticos.py). Requiere correr collectstatic antes de arrancar; las
+# variantes .br necesitan el paquete brotli de requirements.txt (sin él se sirve solo gzip).
+ESTATICOS_COMPRIMIDOS = os.environ.get('ESTATICOS_COMPRIMIDOS', '0') == '1'
+if ESTATICOS_COMPRIMIDOS:
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'Pagina_Web.estaticos.AlmacenEstaticos'},
+    }
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/'
 LOGIN_URL = '/login/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
+RESERVA_DURACION_DEFECTO = timedelta(hours=2)
+RESERVA_DURACION_MAXIMA = timedelta(hours=6)  # acota la búsqueda de reservas que se cruzan
+# Hilos que generan las variantes de Plato.imagen; con 0 se generan en el hilo que guardó el
+# plato, al confirmar. IMAGENES_VARIANTES=0 no las genera al guardar (queda generar_variantes).
+IMAGENES_WORKERS = int(os.environ.get('IMAGENES_WORKERS', '2'))
+IMAGENES_VARIANTES = os.environ.get('IMAGENES_VARIANTES', '1') == '1'
+METRICAS_MUESTREO = 0.1  # fracción de peticiones con detalle de SQL y serialización
+METRICAS_UMBRAL_LENTO_MS = 500  # peticiones más lentas se registran con su SQL
+COCINA_AGRUPAR_MS = 50  # espera tras un ticket nuevo para entregar la ráfaga completa
+COCINA_REVISION_SEGUNDOS = 2  # relectura de la cola por si el ticket llegó desde otro proceso
+# Lecturas de los tableros con vistas async (ver lecturas.py); asgi.py lo activa
+LECTURAS_ASYNC = os.environ.get('LECTURAS_ASYNC', '0') == '1'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'Pagina_Web.tokens.TokenDispositivoAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
-    ]
+    ],
+    # POST /api/tokens/ comprueba contraseñas sin sesión: se limita por IP
+    'DEFAULT_THROTTLE_RATES': {
+        'tokens': os.environ.get('TOKENS_LIMITE', '10/min'),
+    },
 }
@@ -0,0 +1,136 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from django.contrib.auth.models import User
+
+from . import cache, cocina, eventos, imagenes, sucursales, tokens
+from .models import DetallePedido, Eliminacion, Mesa, Pedido, Perfil, Piso, Plato, Reserva, TokenDispositivo, VersionSincronizacion
+
+# Se emite cuando se modifican filas con queryset.update(), que no dispara post_save.
+# Argumentos: sender (la clase del modelo) y queryset (las filas afectadas).
+filas_actualizadas = Signal()
+
+# Se emite cuando cambia la cantidad pedida de un plato (DetallePedido.objects.sumar/restar).
+# Argumentos: pedido_id, plato (instancia o id) y cantidad (negativa si se quitó).
+linea_modificada = Signal()
+
+DIFFS = {Mesa: eventos.diff_mesa, Pedido: eventos.diff_pedido, DetallePedido: eventos.diff_detalle}
+
+
+@receiver(post_save, sender=Mesa)
+@receiver(post_save, sender=Pedido)
+@receiver(post_save, sender=DetallePedido)
+def publicar_guardado(sender, instance, using, **kwargs):
+    # Se publica solo si la transacción se confirma, y solo a los tableros de esa sucursal
+    transaction.on_commit(partial(eventos.publicar, DIFFS[sender](instance), using), using=using)
+
+
+@receiver(post_delete, sender=Mesa)
+@receiver(post_delete, sender=Pedido)
+@receiver(post_delete, sender=DetallePedido)
+def publicar_eliminado(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(eventos.publicar, DIFFS[sender](instance, 'eliminado'), using), using=using)
+
+
+@receiver(filas_actualizadas)
+def publicar_actualizadas(sender, queryset, **kwargs):
+    if sender not in DIFFS:
+        return
+
+    def publicar():
+        filas = queryset.select_related('plato') if sender is DetallePedido else queryset
+        for instancia in filas:
+            eventos.publicar(DIFFS[sender](instancia), queryset.db)
+
+    transaction.on_commit(publicar, using=queryset.db)
+
+
+# --- Versiones para la sincronización incremental (?since=) ---
+
+@receiver(post_delete, sender=Piso)
+@receiver(post_delete, sender=Mesa)
+@receiver(post_delete, sender=Reserva)
+def registrar_eliminacion(sender, instance, using, **kwargs):
+    Eliminacion.objects.using(using).create(
+        modelo=sender._meta.model_name,
+        objeto_id=instance.pk,
+        version=VersionSincronizacion.siguiente(using),
+    )
+
+
+@receiver(pre_delete, sender=Mesa)
+def versionar_reservas_de_mesa(sender, instance, using, **kwargs):
+    # SET_NULL deja las reservas sin mesa sin pasar por save(); se versionan aquí
+    Reserva.objects.using(using).filter(mesa=instance).update(version=VersionSincronizacion.siguiente(using))
+
+
+# --- Invalidación de la caché de respuestas (cache.RespuestaCacheMixin) ---
+
+@receiver(post_save, sender=Plato)
+@receiver(post_delete, sender=Plato)
+def invalidar_cache_plato(sender, instance, using, **kwargs):
+    transaction.on_commit(partial(cache.invalidar_grupo, 'plato', using), using=using)
+    transaction.on_commit(partial(cache.invalidar_detalle, 'plato', instance.pk, using), using=using)
+
+
+@receiver(post_save, sender=Piso)
+@receiver(post_delete, sender=Piso)
+@receiver(post_save, sender=Mesa)
+@receiver(post_delete, sender=Mesa)
+def invalidar_cache_piso(sender, instance, using, **kwargs):
+    # Los pisos se sirven con sus mesas anidadas
+    transaction.on_commit(partial(cache.invalidar_grupo, 'piso', using), using=using)
+
+
+@receiver(filas_actualizadas)
+def invalidar_cache_actualizadas(sender, queryset, **kwargs):
+    using = queryset.db
+    if sender is Plato:
+        transaction.on_commit(partial(cache.invalidar_grupo, 'plato', using), using=using)
+        for pk in queryset.values_list('pk', flat=True):
+            transaction.on_commit(partial(cache.invalidar_detalle, 'plato', pk, using), using=using)
+    elif sender in (Piso, Mesa):
+        transaction.on_commit(partial(cache.invalidar_grupo, 'piso', using), using=using)
+
+
+@receiver(post_save, sender=Plato)
+def encolar_variantes_imagen(sender, instance, using, **kwargs):
+    if imagenes.necesita_variantes(instance):
+        imagenes.encolar(instance.pk, using)
+
+
+# --- Tickets de cocina ---
+
+@receiver(linea_modificada)
+def crear_ticket_cocina(sender, pedido_id, plato, cantidad, **kwargs):
+    cocina.crear_ticket(pedido_id, plato, cantidad)
+
+
+# --- Caché de tokens de dispositivo ---
+
+@receiver(post_save, sender=User)
+def olvidar_tokens_usuario(sender, instance, update_fields=None, **kwargs):
+    # La caché guarda el usuario cargado: cualquier cambio (is_active, is_staff) la invalida.
+    # El inicio de sesión solo actualiza last_login y no afecta a los permisos.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    tokens.olvidar_usuario(instance)
+
+
+@receiver(post_save, sender=TokenDispositivo)
+@receiver(post_delete, sender=TokenDispositivo)
+def olvidar_token_eliminado(sender, instance, created=False, **kwargs):
+    # Un token guardado fuera de tokens.revocar (el admin, la shell) no sigue valiendo desde la caché
+    if not created:
+        tokens.olvidar([instance.clave])
+
+
+# --- Sucursal asignada a cada usuario (sucursales.py la guarda en caché) ---
+
+@receiver(post_save, sender=Perfil)
+@receiver(post_delete, sender=Perfil)
+def olvidar_sucursal_usuario(sender, instance, **kwargs):
+    sucursales.olvidar_usuario(instance.user_id)
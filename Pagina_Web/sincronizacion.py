@@ -0,0 +1,78 @@
+import hashlib
+
+from django.db.models import Max
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import Eliminacion
+
+
+def version_actual(modelos):
+    # Cada MAX(version) se resuelve con el índice de la columna, sin recorrer la tabla
+    versiones = [modelo.objects.aggregate(v=Max('version'))['v'] or 0 for modelo in modelos]
+    nombres = [modelo._meta.model_name for modelo in modelos]
+    versiones.append(Eliminacion.objects.filter(modelo__in=nombres).aggregate(v=Max('version'))['v'] or 0)
+    return max(versiones)
+
+
+async def aversion_actual(modelos):
+    versiones = [(await modelo.objects.aaggregate(v=Max('version')))['v'] or 0 for modelo in modelos]
+    nombres = [modelo._meta.model_name for modelo in modelos]
+    versiones.append((await Eliminacion.objects.filter(modelo__in=nombres).aaggregate(v=Max('version')))['v'] or 0)
+    return max(versiones)
+
+
+def etag_listado(basename, request, version):
+    consulta = hashlib.sha1(request.get_full_path().encode()).hexdigest()[:12]
+    return f'"{basename}-{version}-{consulta}"'
+
+
+def etag_vigente(request, etag):
+    return etag in [e.strip() for e in request.headers.get('If-None-Match', '').split(',')]
+
+
+class VersionadoListMixin:
+    """
+    Agrega a list() un ETag basado en la versión de los modelos de los que depende la
+    respuesta (un If-None-Match vigente devuelve 304 sin serializar nada) y el modo
+    ?since=<version>, que devuelve solo las filas cambiadas y los ids eliminados.
+    """
+    # Modelos cuyas versiones afectan a la respuesta de este listado
+    modelos_version = ()
+
+    def filtrar_cambios(self, queryset, since):
+        return queryset.filter(version__gt=since)
+
+    def list(self, request, *args, **kwargs):
+        version = version_actual(self.modelos_version)
+        etag = etag_listado(self.basename, request, version)
+        cabeceras = {'ETag': etag, 'X-Version': str(version), 'Cache-Control': 'private, no-cache'}
+
+        if etag_vigente(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=cabeceras)
+
+        since = request.query_params.get('since')
+        if since is None:
+            response = super().list(request, *args, **kwargs)
+            for nombre, valor in cabeceras.items():
+                response[nombre] = valor
+            return response
+
+        try:
+            since = int(since)
+        except ValueError:
+            raise ValidationError({'since': 'Debe ser un número de versión.'})
+        cambios = self.filtrar_cambios(self.filter_queryset(self.get_queryset()), since).distinct()
+        eliminados = {}
+        for modelo in self.modelos_version:
+            nombre = modelo._meta.model_name
+            eliminados[nombre] = list(
+                Eliminacion.objects.filter(modelo=nombre, version__gt=since).values_list('objeto_id', flat=True)
+            )
+        data = {
+            'version': version,
+            'cambios': self.get_serializer(cambios, many=True).data,
+            'eliminados': eliminados,
+        }
+        return Response(data, headers=cabeceras)
@@ -39,12 +39,11 @@ document.addEventListener('DOMContentLoaded', () => {
     const floorsTabsContainer = document.getElementById('floors-tabs-container');
     let allFloors = [];
     let activeFloorId = null;
-    let allTablesForReservations = [];
 
     // --- LÓGICA DE PISOS Y MESAS ---
-    async function fetchFloorsAndRenderAll() {
+    async function fetchFloorsAndRenderAll(preloadedFloors = null) {
         try {
-            allFloors = await apiFetch('/api/pisos/');
+            allFloors = preloadedFloors || await apiFetch('/api/pisos/');
             floorsTabsContainer.innerHTML = '';
 
             if (!allFloors || allFloors.length === 0) {
@@ -192,10 +191,9 @@ document.addEventListener('DOMContentLoaded', () => {
     const reservationForm = document.getElementById('reservationForm');
     const reservationTableSelect = document.getElementById('reservationTable');
     
-    async function fetchAndRenderReservations() {
+    async function fetchAndRenderReservations(preloadedReservations = null) {
         try {
-            allTablesForReservations = await apiFetch('/api/mesas/');
-            const reservations = await apiFetch('/api/reservas/');
+            const reservations = preloadedReservations || await apiFetch('/api/reservas/');
             reservationTableBody.innerHTML = '';
             if (!reservations || reservations.length === 0) {
                 reservationTableBody.innerHTML = '<tr><td colspan="5">No hay reservas programadas.</td></tr>';
@@ -219,17 +217,34 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
     
-    function populateTableSelect() {
+    // Ofrece las mesas sin reservas que se crucen con el horario elegido y con capacidad suficiente
+    async function populateTableSelect() {
         reservationTableSelect.innerHTML = '<option value="">Seleccione una mesa...</option>';
-        const availableTables = allTablesForReservations.filter(t => t.estado === 'Libre');
-        availableTables.forEach(table => {
-            const option = document.createElement('option');
-            option.value = table.id;
-            option.textContent = `${table.nombre} (${table.piso_nombre} - Cap: ${table.capacidad})`;
-            reservationTableSelect.appendChild(option);
-        });
+        const dateTime = document.getElementById('reservationDateTime').value;
+        const guests = document.getElementById('reservationGuests').value || 1;
+        if (!dateTime) {
+            reservationTableSelect.innerHTML = '<option value="">Elija primero fecha y hora...</option>';
+            return;
+        }
+        try {
+            const params = new URLSearchParams({ personas: guests, desde: new Date(dateTime).toISOString() });
+            const availability = await apiFetch(`/api/reservas/disponibilidad/?${params.toString()}`);
+            availability.pisos.forEach(floor => {
+                floor.mesas.forEach(table => {
+                    const option = document.createElement('option');
+                    option.value = table.id;
+                    option.textContent = `${table.nombre} (${floor.nombre} - Cap: ${table.capacidad})`;
+                    reservationTableSelect.appendChild(option);
+                });
+            });
+        } catch (error) {
+            console.error('Error al consultar la disponibilidad:', error);
+        }
     }
 
+    document.getElementById('reservationDateTime').addEventListener('change', populateTableSelect);
+    document.getElementById('reservationGuests').addEventListener('change', populateTableSelect);
+
     function openReservationModal() {
         reservationForm.reset();
         populateTableSelect();
@@ -255,7 +270,7 @@ document.addEventListener('DOMContentLoaded', () => {
         const reservationData = {
             mesa: document.getElementById('reservationTable').value,
             nombre_cliente: document.getElementById('reservationClient').value,
-            fecha_hora: document.getElementById('reservationDateTime').value,
+            fecha_hora: new Date(document.getElementById('reservationDateTime').value).toISOString(),
             cantidad_personas: document.getElementById('reservationGuests').value,
             notas: document.getElementById('reservationNotes').value,
         };
@@ -344,6 +359,32 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    async function importFloorPlan() {
+        const file = document.getElementById('floorPlanFile').files[0];
+        if (!file) {
+            alert('Selecciona un archivo .json o .csv.');
+            return;
+        }
+        // Se envía como multipart, sin el Content-Type JSON de apiFetch
+        const formData = new FormData();
+        formData.append('archivo', file);
+        try {
+            const response = await fetch('/api/pisos/importar/', {
+                method: 'POST', headers: { 'X-CSRFToken': csrftoken }, body: formData,
+            });
+            const data = await response.json();
+            if (!response.ok) {
+                const errors = data.plano || data.formato || data.detail || 'Error en la petición';
+                throw new Error(Array.isArray(errors) ? errors.join('\n') : errors);
+            }
+            alert(`Pisos creados: ${data.pisos_creados}, actualizados: ${data.pisos_actualizados}\nMesas creadas: ${data.mesas_creadas}, actualizadas: ${data.mesas_actualizadas}`);
+            await fetchFloorsAndRenderAll();
+            closeManageFloorsModal();
+        } catch (error) {
+            alert(`Error al importar el plano:\n${error.message}`);
+        }
+    }
+
     // --- EVENT LISTENERS ---
     document.getElementById('main-create-table-btn').addEventListener('click', openCreateTableModal);
     document.getElementById('cancel-create-table-btn').addEventListener('click', closeCreateTableModal);
@@ -358,8 +399,20 @@ document.addEventListener('DOMContentLoaded', () => {
     document.getElementById('cancel-manage-floors-btn').addEventListener('click', closeManageFloorsModal);
     document.getElementById('add-new-floor-btn').addEventListener('click', addNewFloor);
     document.getElementById('delete-last-floor-btn').addEventListener('click', deleteLastFloor);
+    document.getElementById('import-floor-plan-btn').addEventListener('click', importFloorPlan);
+
+    // --- CARGA INICIAL (una sola petición) ---
+    async function bootstrap() {
+        try {
+            const data = await apiFetch('/api/bootstrap/admin/');
+            fetchFloorsAndRenderAll(data.pisos);
+            fetchAndRenderReservations(data.reservas);
+        } catch (error) {
+            console.error('Error en la carga inicial:', error);
+            fetchFloorsAndRenderAll();
+            fetchAndRenderReservations();
+        }
+    }
 
-    // --- CARGA INICIAL ---
-    fetchFloorsAndRenderAll();
-    fetchAndRenderReservations();
+    bootstrap();
 });
\ No newline at end of file
@@ -15,20 +15,40 @@ function getCookie(name) {
 }
 const csrftoken = getCookie('csrftoken');
 
+// Texto escrito por clientes o mozos antes de insertarlo en innerHTML
+function escaparHtml(texto) {
+    return String(texto ?? '').replace(/[&<>"']/g, c => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;',
+    })[c]);
+}
+// Token de dispositivo emitido con esta página: la API lo valida sin leer la sesión
+let tokenDispositivo = document.querySelector('meta[name="token-dispositivo"]')?.content;
+
 async function apiFetch(url, options = {}) {
+    const encabezados = options.headers || {};
+    if (options.body && typeof options.body !== 'string') {
+        options.body = JSON.stringify(options.body);
+    }
+    const token = tokenDispositivo;
     options.headers = {
         'Content-Type': 'application/json',
         'X-CSRFToken': csrftoken,
-        ...options.headers,
+        ...(token ? { 'Authorization': `Token ${token}` } : {}),
+        ...encabezados,
     };
-    if (options.body && typeof options.body !== 'string') {
-        options.body = JSON.stringify(options.body);
+    let response = await fetch(url, options);
+    if (token && (response.status === 401 || response.status === 403)) {
+        // Otra pestaña rotó el token o venció: se sigue con la sesión
+        tokenDispositivo = null;
+        options.headers = { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken, ...encabezados };
+        response = await fetch(url, options);
     }
-    const response = await fetch(url, options);
     if (response.status === 204) return null;
     const data = await response.json();
     if (!response.ok) {
-        throw new Error(data.detail || data.error || 'Error en la petición');
+        const error = new Error(data.detail || data.error || 'Error en la petición');
+        error.status = response.status;
+        throw error;
     }
     return data;
 }
@@ -44,25 +64,33 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let activeTableId = null;
     let activePedido = null;
+    let liveUpdates = false; // true mientras el canal de eventos del servidor esté conectado
+    const tablesById = new Map();
 
-    async function fetchAndRenderTables() {
+    function renderTableCard(table) {
+        const tableCard = document.createElement('div');
+        tableCard.classList.add('table-card');
+        if (table.id === activeTableId) tableCard.classList.add('active');
+
+        const statusClass = `status-${table.estado.replace(/\s/g, '')}`;
+        tableCard.innerHTML = `<h3>${table.nombre}</h3><p>Capacidad: ${table.capacidad}</p><span class="table-status ${statusClass}">${table.estado}</span>`;
+        tableCard.dataset.tableId = table.id;
+        tableCard.addEventListener('click', () => select_table(table.id));
+        return tableCard;
+    }
+
+    async function fetchAndRenderTables(preloadedTables = null) {
         try {
-            const tablesData = await apiFetch('/api/mesas/');
+            const tablesData = preloadedTables || await apiFetch('/api/mesas/');
             tablesGrid.innerHTML = '';
+            tablesById.clear();
             if (!tablesData || tablesData.length === 0) {
                 tablesGrid.innerHTML = '<p>No hay mesas disponibles.</p>';
                 select_table(null);
             } else {
                 tablesData.forEach(table => {
-                    const tableCard = document.createElement('div');
-                    tableCard.classList.add('table-card');
-                    if (table.id === activeTableId) tableCard.classList.add('active');
-                    
-                    const statusClass = `status-${table.estado.replace(/\s/g, '')}`;
-                    tableCard.innerHTML = `<h3>${table.nombre}</h3><p>Capacidad: ${table.capacidad}</p><span class="table-status ${statusClass}">${table.estado}</span>`;
-                    tableCard.dataset.tableId = table.id;
-                    tableCard.addEventListener('click', () => select_table(table.id));
-                    tablesGrid.appendChild(tableCard);
+                    tablesById.set(table.id, table);
+                    tablesGrid.appendChild(renderTableCard(table));
                 });
                 
                 if (activeTableId === null || !tablesData.some(t => t.id === activeTableId)) {
@@ -104,9 +132,9 @@ document.addEventListener('DOMContentLoaded', () => {
                     </div>
                     <button class="create-table-btn" onclick="iniciarPedido(${tableId})">Iniciar Pedido</button>`;
             } else if (selectedTable.estado === 'Ocupada') {
-                const pedidos = await apiFetch(`/api/pedidos/?mesa=${tableId}&completado=false`);
-                if (pedidos && pedidos.length > 0) {
-                    activePedido = pedidos[0];
+                const pedidos = await apiFetch(`/api/pedidos/?mesa=${tableId}&completado=false&page_size=1`);
+                if (pedidos && pedidos.results.length > 0) {
+                    activePedido = pedidos.results[0];
                     renderOrderDetails(activePedido);
                 } else {
                     orderDetailsContent.innerHTML = `<p>Error: La mesa está ocupada pero no se encontró un pedido activo.</p>`;
@@ -149,9 +177,12 @@ document.addEventListener('DOMContentLoaded', () => {
     window.iniciarPedido = async function(tableId) {
         try {
             await apiFetch(`/api/mesas/${tableId}/iniciar_pedido/`, { method: 'POST' });
-            await fetchAndRenderTables();
+            // Con el canal de eventos activo, el cambio de la mesa llega como diff
+            if (!liveUpdates) await fetchAndRenderTables();
         } catch (error) {
             alert(`Error al iniciar el pedido: ${error.message}`);
+            // 409: otro mozo cambió la mesa antes; se muestra su estado actual
+            if (error.status === 409) await fetchAndRenderTables();
         }
     }
 
@@ -159,9 +190,10 @@ document.addEventListener('DOMContentLoaded', () => {
         if (confirm('¿Estás seguro de que quieres finalizar y cobrar este pedido?')) {
             try {
                 await apiFetch(`/api/pedidos/${pedidoId}/finalizar/`, { method: 'POST' });
-                await fetchAndRenderTables();
+                if (!liveUpdates) await fetchAndRenderTables();
             } catch (error) {
                 alert(`Error al finalizar el pedido: ${error.message}`);
+                if (error.status === 409) await fetchAndRenderTables();
             }
         }
     }
@@ -180,10 +212,27 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     closeMenuModalBtn.addEventListener('click', closeMenuModal);
+
+    // Espera a que el usuario deje de escribir antes de llamar a la API
+    function debounce(fn, ms = 250) {
+        let timer;
+        return (...args) => {
+            clearTimeout(timer);
+            timer = setTimeout(() => fn(...args), ms);
+        };
+    }
+
+    document.getElementById('menuSearch').addEventListener('input', debounce(async (event) => {
+        const texto = event.target.value.trim();
+        if (!texto) return loadMenu();
+        try {
+            loadMenu(await apiFetch(`/api/platos/?search=${encodeURIComponent(texto)}`));
+        } catch (error) { console.error('Error buscando platos:', error); }
+    }));
     
-    async function loadMenu() {
+    async function loadMenu(preloadedPlatos = null) {
         try {
-            const platos = await apiFetch('/api/platos/');
+            const platos = preloadedPlatos || await apiFetch('/api/platos/');
             menuItemsContainer.innerHTML = '';
             
             if (!platos || platos.length === 0) {
@@ -203,8 +252,12 @@ document.addEventListener('DOMContentLoaded', () => {
             categorias.forEach(cat => {
                 menuHTML += `<div class="menu-category" data-category="${cat}">`;
                 platos.filter(p => p.categoria === cat).forEach(plato => {
+                    // Miniatura más liviana disponible (las variantes se generan en el servidor)
+                    const thumbnail = plato.imagenes && (plato.imagenes.webp || plato.imagenes.jpg);
+                    const thumbnailHTML = thumbnail ? `<img src="${thumbnail['320']}" alt="" width="64" height="64" loading="lazy" decoding="async" style="object-fit: cover;">` : '';
                     menuHTML += `
                         <div class="menu-item">
+                            ${thumbnailHTML}
                             <div class="menu-item-info">
                                 <h4>${plato.nombre}</h4>
                                 <p>${plato.descripcion || ''}</p>
@@ -267,12 +320,16 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     
     // --- LÓGICA PARA CARGAR INCIDENTES ---
-    async function fetchAndRenderIncidents() {
+    async function fetchAndRenderIncidents(preloadedIncidents = null) {
         const incidentsList = document.getElementById('incidents-list');
         if (!incidentsList) return; 
 
         try {
-            const incidents = await apiFetch('/api/incidentes/?visto=false');
+            // Con texto en el buscador se busca en todo el registro, vistos incluidos
+            const texto = document.getElementById('incidentSearch').value.trim();
+            const incidents = texto
+                ? await apiFetch(`/api/incidentes/?search=${encodeURIComponent(texto)}&fragmento=1`)
+                : preloadedIncidents || await apiFetch('/api/incidentes/?visto=false');
             incidentsList.innerHTML = '';
 
             if (!incidents || incidents.length === 0) {
@@ -285,8 +342,8 @@ document.addEventListener('DOMContentLoaded', () => {
                 incidentCard.className = `incident-card ${inc.tipo.toLowerCase()}`;
                 incidentCard.innerHTML = `
                     <h4>${inc.tipo}</h4>
-                    <p>${inc.mensaje}</p>
-                    <button data-id="${inc.id}">Marcar como Visto</button>
+                    <p>${inc.fragmento || escaparHtml(inc.mensaje)}</p>
+                    ${inc.visto ? '' : `<button data-id="${inc.id}">Marcar como Visto</button>`}
                 `;
                 incidentsList.appendChild(incidentCard);
             });
@@ -296,6 +353,8 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    document.getElementById('incidentSearch').addEventListener('input', debounce(() => fetchAndRenderIncidents()));
+
     document.addEventListener('click', async (event) => {
         const targetButton = event.target.closest('.incident-card button');
         if (targetButton) {
@@ -309,8 +368,135 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
     
-    // Carga inicial de todo
-    fetchAndRenderTables();
-    loadMenu();
-    fetchAndRenderIncidents();
+    // --- LISTA DE ESPERA ---
+    const waitlistList = document.getElementById('waitlist-list');
+
+    async function fetchAndRenderWaitlist() {
+        if (!waitlistList) return;
+        try {
+            const grupos = await apiFetch('/api/espera/');
+            if (!grupos || grupos.length === 0) {
+                waitlistList.innerHTML = '<p class="empty-state">Nadie esperando.</p>';
+                return;
+            }
+            waitlistList.innerHTML = grupos.map(grupo => {
+                const estimada = grupo.espera_estimada === null ? 'sin mesa que alcance' : `~${grupo.espera_estimada} min`;
+                return `
+                    <div class="waitlist-card">
+                        <span><strong>${escaparHtml(grupo.nombre_cliente)}</strong> (${grupo.cantidad_personas}) · ${estimada}</span>
+                        <span>
+                            <button data-waitlist-action="asignar" data-id="${grupo.id}">Sentar</button>
+                            <button data-waitlist-action="cancelar" data-id="${grupo.id}">&times;</button>
+                        </span>
+                    </div>`;
+            }).join('');
+        } catch (error) {
+            console.error('Error al cargar la lista de espera:', error);
+            waitlistList.innerHTML = '<p style="color: red;">Error al cargar la lista de espera.</p>';
+        }
+    }
+
+    document.getElementById('waitlistForm')?.addEventListener('submit', async (event) => {
+        event.preventDefault();
+        try {
+            await apiFetch('/api/espera/', { method: 'POST', body: {
+                nombre_cliente: document.getElementById('waitlistName').value.trim(),
+                cantidad_personas: parseInt(document.getElementById('waitlistPeople').value),
+            } });
+            event.target.reset();
+            fetchAndRenderWaitlist();
+        } catch (error) { alert(`Error al agregar a la lista: ${error.message}`); }
+    });
+
+    document.getElementById('seatWaitlistBtn')?.addEventListener('click', async () => {
+        try {
+            const sentados = await apiFetch('/api/espera/asignar_fila/', { method: 'POST' });
+            if (sentados.length === 0) alert('Ningún grupo cabe en las mesas libres.');
+            fetchAndRenderWaitlist();
+            if (!liveUpdates) await fetchAndRenderTables();
+        } catch (error) { alert(`Error al sentar la fila: ${error.message}`); }
+    });
+
+    waitlistList?.addEventListener('click', async (event) => {
+        const button = event.target.closest('button[data-waitlist-action]');
+        if (!button) return;
+        try {
+            const grupo = await apiFetch(`/api/espera/${button.dataset.id}/${button.dataset.waitlistAction}/`, { method: 'POST' });
+            if (grupo.mesa_nombre) alert(`${grupo.nombre_cliente}: ${grupo.mesa_nombre}`);
+            if (!liveUpdates) await fetchAndRenderTables();
+        } catch (error) { alert(error.message); }
+        fetchAndRenderWaitlist();
+    });
+
+    // --- ACTUALIZACIONES EN VIVO (Server-Sent Events) ---
+    function applyTableDiff(diff) {
+        const card = tablesGrid.querySelector(`.table-card[data-table-id="${diff.id}"]`);
+        const previous = tablesById.get(diff.id);
+        if (diff.accion === 'eliminado') {
+            tablesById.delete(diff.id);
+            if (card) card.remove();
+            if (diff.id === activeTableId) select_table(null);
+            return;
+        }
+        const table = { id: diff.id, ...diff.datos };
+        tablesById.set(diff.id, table);
+        const newCard = renderTableCard(table);
+        if (card) card.replaceWith(newCard);
+        else tablesGrid.appendChild(newCard);
+        if (diff.id === activeTableId && (!previous || previous.estado !== table.estado)) {
+            select_table(activeTableId);
+        }
+        // Una mesa que se libera u ocupa cambia las esperas estimadas
+        if (previous && previous.estado !== table.estado) fetchAndRenderWaitlist();
+    }
+
+    function applyOrderLineDiff(diff) {
+        if (!activePedido || diff.datos.pedido !== activePedido.id) return;
+        const detalles = activePedido.detalles.filter(d => d.id !== diff.id);
+        if (diff.accion !== 'eliminado') {
+            const plato = diff.datos.plato;
+            const current = activePedido.detalles.find(d => d.id === diff.id);
+            const updated = { ...(current || {}), id: diff.id, plato: { ...(current ? current.plato : {}), ...plato }, cantidad: diff.datos.cantidad, subtotal: plato.precio * diff.datos.cantidad };
+            const index = activePedido.detalles.findIndex(d => d.id === diff.id);
+            if (index === -1) detalles.push(updated);
+            else detalles.splice(index, 0, updated);
+        }
+        activePedido.detalles = detalles;
+        activePedido.total = detalles.reduce((sum, d) => sum + d.subtotal, 0);
+        renderOrderDetails(activePedido);
+    }
+
+    function connectLiveUpdates() {
+        if (!window.EventSource) return;
+        const source = new EventSource('/api/eventos/');
+        source.onopen = () => { liveUpdates = true; };
+        source.onerror = () => { liveUpdates = false; };
+        source.addEventListener('mesa', (event) => applyTableDiff(JSON.parse(event.data)));
+        source.addEventListener('detalle', (event) => applyOrderLineDiff(JSON.parse(event.data)));
+        source.addEventListener('pedido', (event) => {
+            const diff = JSON.parse(event.data);
+            if (activePedido && diff.id === activePedido.id && diff.datos.completado) select_table(activeTableId);
+        });
+        source.addEventListener('resync', () => fetchAndRenderTables());
+    }
+
+    // Carga inicial de todo en una sola petición
+    async function bootstrap() {
+        try {
+            const data = await apiFetch('/api/bootstrap/dashboard/');
+            fetchAndRenderTables(data.mesas);
+            loadMenu(data.platos);
+            fetchAndRenderIncidents(data.incidentes);
+        } catch (error) {
+            console.error('Error en la carga inicial:', error);
+            fetchAndRenderTables();
+            loadMenu();
+            fetchAndRenderIncidents();
+        }
+    }
+
+    connectLiveUpdates();
+    bootstrap();
+    fetchAndRenderWaitlist();
+    setInterval(fetchAndRenderWaitlist, 60000);
 });
\ No newline at end of file
@@ -1,20 +1,49 @@
+let nextPageUrl = null;
+
 document.addEventListener('DOMContentLoaded', () => {
+    document.getElementById('history-filter-form').addEventListener('submit', (event) => {
+        event.preventDefault();
+        fetchAndRenderHistory();
+    });
+    document.getElementById('history-load-more-btn').addEventListener('click', () => {
+        if (nextPageUrl) fetchAndRenderHistory(nextPageUrl);
+    });
     fetchAndRenderHistory();
 });
 
-async function fetchAndRenderHistory() {
+function buildHistoryUrl() {
+    // Los pedidos cerrados se leen de sus comprobantes (precios del momento del cierre)
+    const params = new URLSearchParams();
+    const desde = document.getElementById('history-desde').value;
+    const hasta = document.getElementById('history-hasta').value;
+    if (desde) params.set('desde', desde);
+    if (hasta) params.set('hasta', hasta);
+    return `/api/comprobantes/?${params.toString()}`;
+}
+
+// Sin URL carga la primera página (reemplaza la tabla); con URL agrega la página siguiente
+async function fetchAndRenderHistory(pageUrl = null) {
     const tableBody = document.getElementById('history-table-body');
-    tableBody.innerHTML = '<tr><td colspan="4">Cargando historial...</td></tr>';
+    const loadMoreBtn = document.getElementById('history-load-more-btn');
+    if (!pageUrl) {
+        tableBody.innerHTML = '<tr><td colspan="4">Cargando historial...</td></tr>';
+    }
+    loadMoreBtn.disabled = true;
 
     try {
-        const pedidosCompletados = await fetch('/api/pedidos/?completado=true').then(handleApiResponse);
+        const page = await fetch(pageUrl || buildHistoryUrl()).then(handleApiResponse);
+        const pedidosCompletados = page.results || [];
+        nextPageUrl = page.next;
+        loadMoreBtn.style.display = nextPageUrl ? 'inline-block' : 'none';
 
-        if (!pedidosCompletados || pedidosCompletados.length === 0) {
-            tableBody.innerHTML = '<tr><td colspan="4">No hay pedidos en el historial.</td></tr>';
-            return;
+        if (!pageUrl) {
+            tableBody.innerHTML = '';
+            if (pedidosCompletados.length === 0) {
+                tableBody.innerHTML = '<tr><td colspan="4">No hay pedidos en el historial.</td></tr>';
+                return;
+            }
         }
 
-        tableBody.innerHTML = '';
         pedidosCompletados.forEach(pedido => {
             const row = document.createElement('tr');
             const fecha = new Date(pedido.fecha_creacion);
@@ -22,7 +51,7 @@ async function fetchAndRenderHistory() {
 
             row.innerHTML = `
                 <td>${pedido.id}</td>
-                <td>${pedido.mesa ? pedido.mesa.nombre : 'Mesa eliminada'}</td>
+                <td>${pedido.mesa_nombre}</td>
                 <td>${fechaFormateada}</td>
                 <td>$${pedido.total.toLocaleString('es-CL')}</td>
             `;
@@ -32,6 +61,8 @@ async function fetchAndRenderHistory() {
     } catch (error) {
         console.error('Error al cargar el historial:', error);
         tableBody.innerHTML = '<tr><td colspan="4" style="color: red;">Error al cargar el historial.</td></tr>';
+    } finally {
+        loadMoreBtn.disabled = false;
     }
 }
 
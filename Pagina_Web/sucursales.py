@@ -0,0 +1,265 @@
+"""
+Varias sucursales, cada una con su propia base SQLite.
+
+La base 'default' es la sucursal principal y además guarda lo que es de toda la empresa:
+usuarios, sesiones, el admin, Perfil y TokenDispositivo. El resto de los modelos de
+Pagina_Web (pisos, mesas, pedidos, carta, reservas, incidentes, reportes...) existe en cada
+sucursal, y SucursalRouter manda cada consulta a la base de la sucursal de la petición en
+curso. Así cada sucursal tiene su propio lock de escritura (db.escritura es por base) y sus
+ids, versiones y cachés no se mezclan con los de otra.
+
+SucursalMiddleware elige la sucursal, en este orden, por el encabezado X-Sucursal, por el
+host (settings.SUCURSALES[alias]['hosts']) o por Perfil.sucursal del usuario. Un usuario
+que no es staff y tiene sucursal asignada no puede operar en otra.
+
+Las sucursales se agregan con el comando crear_sucursal, que las anota en
+settings.SUCURSALES_ARCHIVO; los procesos que ya estaban corriendo las ven al reiniciarse.
+"""
+import copy
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import JsonResponse
+
+# Modelos de Pagina_Web que viven solo en 'default' (dependen de auth.User)
+MODELOS_GLOBALES = {'perfil', 'tokendispositivo'}
+ENCABEZADO = 'X-Sucursal'
+CACHE_USUARIO = 5 * 60  # segundos que se recuerda la sucursal asignada a un usuario
+
+_actual = ContextVar('sucursal', default=DEFAULT_DB_ALIAS)
+
+
+def actual():
+    """Alias de la base de la sucursal de la petición (o del bloque en_sucursal) en curso."""
+    return _actual.get()
+
+
+@contextmanager
+def en_sucursal(alias):
+    if alias not in todas():
+        raise KeyError(f'Sucursal desconocida: {alias}')
+    token = _actual.set(alias)
+    try:
+        yield
+    finally:
+        _actual.reset(token)
+
+
+def todas():
+    """Alias de todas las sucursales, la principal primero."""
+    return [DEFAULT_DB_ALIAS, *settings.SUCURSALES]
+
+
+def nombre(alias):
+    if alias == DEFAULT_DB_ALIAS:
+        return settings.SUCURSAL_PRINCIPAL
+    return settings.SUCURSALES[alias].get('nombre', alias)
+
+
+def es_global(modelo):
+    return modelo._meta.app_label != 'Pagina_Web' or modelo._meta.model_name in MODELOS_GLOBALES
+
+
+class SucursalRouter:
+    def db_for_read(self, modelo, **hints):
+        if es_global(modelo):
+            return DEFAULT_DB_ALIAS
+        # Los accesos por relación (pedido.detallepedido_set) siguen en la base de la instancia
+        instancia = hints.get('instance')
+        if instancia is not None and instancia._state.db and not es_global(type(instancia)):
+            return instancia._state.db
+        return actual()
+
+    db_for_write = db_for_read
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label != 'Pagina_Web' or model_name in MODELOS_GLOBALES:
+            return db == DEFAULT_DB_ALIAS
+        return True
+
+
+# --- Alta de sucursales ---
+
+def configuracion_base(alias, archivo):
+    """La entrada de DATABASES de una sucursal: la de 'default' con otro archivo."""
+    configuracion = copy.deepcopy(settings.DATABASES[DEFAULT_DB_ALIAS])
+    configuracion['NAME'] = archivo
+    configuracion.pop('TEST', None)
+    return configuracion
+
+
+def registrar(alias, datos):
+    """Hace visible una sucursal en este proceso sin reiniciarlo."""
+    settings.SUCURSALES[alias] = datos
+    configuracion = configuracion_base(alias, datos['archivo'])
+    settings.DATABASES[alias] = configuracion
+    connections.settings[alias] = configuracion
+    connections.configure_settings({DEFAULT_DB_ALIAS: connections.settings[DEFAULT_DB_ALIAS], alias: configuracion})
+
+
+def guardar_registro():
+    settings.SUCURSALES_ARCHIVO.write_text(json.dumps(settings.SUCURSALES, indent=2, ensure_ascii=False) + '\n')
+
+
+# --- Lecturas entre sucursales ---
+
+def en_todas(funcion, sucursales=None):
+    """
+    Ejecuta funcion() una vez por sucursal, cada una en su hilo y con su base, y devuelve
+    {alias: resultado}. Para reportes que consolidan varias sucursales; solo debe leer.
+    """
+    sucursales = list(sucursales or todas())
+
+    def correr(alias):
+        try:
+            with en_sucursal(alias):
+                return funcion()
+        finally:
+            connections.close_all()
+
+    # Cada hilo parte de una copia del contexto actual (zona horaria, métricas...)
+    with ThreadPoolExecutor(max_workers=len(sucursales), thread_name_prefix='sucursales') as pool:
+        futuros = {alias: pool.submit(copy_context().run, correr, alias) for alias in sucursales}
+        return {alias: futuro.result() for alias, futuro in futuros.items()}
+
+
+# --- Elección de la sucursal de cada petición ---
+
+def _clave_usuario(usuario_id):
+    return f'sucursal:usuario:{usuario_id}'
+
+
+def sucursal_de_usuario(usuario):
+    """Perfil.sucursal del usuario ('' si puede operar en cualquiera), con caché."""
+    from .models import Perfil
+    asignada = cache.get(_clave_usuario(usuario.pk))
+    if asignada is None:
+        asignada = Perfil.objects.filter(user_id=usuario.pk).values_list('sucursal', flat=True).first() or ''
+        cache.set(_clave_usuario(usuario.pk), asignada, CACHE_USUARIO)
+    return asignada
+
+
+def olvidar_usuario(usuario_id):
+    cache.delete(_clave_usuario(usuario_id))
+
+
+def por_host(host):
+    host = host.split(':')[0].lower()
+    for alias, datos in settings.SUCURSALES.items():
+        if host in datos.get('hosts', ()):
+            return alias
+    return None
+
+
+def _en_sucursal_iter(contenido, alias):
+    # El contenido de un StreamingHttpResponse se genera después de salir del middleware
+    iterador = iter(contenido)
+    while True:
+        with en_sucursal(alias):
+            try:
+                parte = next(iterador)
+            except StopIteration:
+                return
+        yield parte
+
+
+async def _en_sucursal_aiter(contenido, alias):
+    iterador = aiter(contenido)
+    while True:
+        with en_sucursal(alias):
+            try:
+                parte = await anext(iterador)
+            except StopAsyncIteration:
+                return
+        yield parte
+
+
+class SucursalMiddleware:
+    """Fija la sucursal de la petición; va después de AuthenticationMiddleware."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        from . import tokens
+        alias, error = self.elegir(request, self.usuario(request, tokens.validar))
+        if error is not None:
+            return error
+        with en_sucursal(alias):
+            respuesta = self.get_response(request)
+        return self.terminar(respuesta, alias)
+
+    async def __acall__(self, request):
+        from . import tokens
+        usuario = await self.ausuario(request, tokens.avalidar)
+        alias, error = await sync_to_async(self.elegir)(request, usuario)
+        if error is not None:
+            return error
+        with en_sucursal(alias):
+            respuesta = await self.get_response(request)
+        return self.terminar(respuesta, alias)
+
+    def usuario(self, request, validar):
+        # El token de las tablets se valida aquí con la misma caché que usa la API
+        from . import tokens
+        token = tokens.token_de(request)
+        if token:
+            encontrado = validar(token)
+            return encontrado[0] if encontrado else None
+        return request.user
+
+    async def ausuario(self, request, avalidar):
+        from . import tokens
+        token = tokens.token_de(request)
+        if token:
+            encontrado = await avalidar(token)
+            return encontrado[0] if encontrado else None
+        return await request.auser()
+
+    def elegir(self, request, usuario):
+        """(alias, None) con la sucursal de la petición, o (None, respuesta de error)."""
+        pedida = request.headers.get(ENCABEZADO)
+        if pedida and pedida not in todas():
+            return None, JsonResponse({'error': f'Sucursal desconocida: {pedida}.'}, status=400)
+        asignada = ''
+        if usuario is not None and usuario.is_authenticated and not usuario.is_staff:
+            asignada = sucursal_de_usuario(usuario)
+        alias = pedida or por_host(request.META.get('HTTP_HOST', '')) or asignada or DEFAULT_DB_ALIAS
+        if asignada and alias != asignada:
+            return None, JsonResponse({'error': f'El usuario pertenece a la sucursal {nombre(asignada)}.'}, status=403)
+        request.sucursal = alias
+        return alias, None
+
+    def terminar(self, respuesta, alias):
+        if respuesta.streaming:
+            if respuesta.is_async:
+                respuesta.streaming_content = _en_sucursal_aiter(respuesta.streaming_content, alias)
+            else:
+                respuesta.streaming_content = _en_sucursal_iter(respuesta.streaming_content, alias)
+        return respuesta
+
+
+class SucursalComandoMixin:
+    """Agrega --sucursal a un comando de gestión y lo ejecuta con esa base."""
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--sucursal', default=DEFAULT_DB_ALIAS, choices=todas(), help='Alias de la sucursal (por defecto la principal).')
+        return parser
+
+    def execute(self, *args, **options):
+        with en_sucursal(options.get('sucursal') or DEFAULT_DB_ALIAS):
+            return super().execute(*args, **options)
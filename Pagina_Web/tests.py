@@ -0,0 +1,730 @@
+import asyncio
+import gzip
+import importlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, connections, router, transaction
+from django.db.models import Max
+from django.contrib.staticfiles import finders
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+from PIL import Image
+
+from . import busqueda, cache, cocina, db, estaticos, reportes, serializers, sucursales, tokens, views
+from .admin import TokenDispositivoAdmin
+from .db import escritura
+from .management.commands import verificar_planes
+from .models import DetallePedido, Incidente, Mesa, Pedido, Perfil, Piso, Plato, Reserva, TicketCocina, TokenDispositivo, VersionSincronizacion
+
+
+# Los platos de las pruebas apuntan a imágenes que no existen: sin variantes al guardarlos,
+# salvo en ImagenesTests
+_sin_variantes = override_settings(IMAGENES_VARIANTES=False)
+
+
+def setUpModule():
+    _sin_variantes.enable()
+
+
+def tearDownModule():
+    _sin_variantes.disable()
+
+
+def lock_libre(alias='default'):
+    # Otro hilo intenta tomar el lock de escritura de la base sin esperar
+    libre = []
+
+    def probar():
+        lock = db._lock(alias)
+        libre.append(lock.acquire(blocking=False))
+        if libre[0]:
+            lock.release()
+
+    hilo = threading.Thread(target=probar)
+    hilo.start()
+    hilo.join()
+    return libre[0]
+
+
+class PedidoConsultasTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('mozo', password='clave'))
+        self.piso = Piso.objects.create(nombre='Salón', numero=1)
+        self.platos = [Plato.objects.create(nombre=f'Plato {n}', precio=1000 * n, categoria='Fondo') for n in range(1, 4)]
+
+    def crear_pedidos(self, cantidad):
+        for n in range(cantidad):
+            mesa = Mesa.objects.create(nombre=f'Mesa {Mesa.objects.count() + 1}', piso=self.piso)
+            pedido = Pedido.objects.create(mesa=mesa, completado=n % 2 == 0)
+            DetallePedido.objects.bulk_create([DetallePedido(pedido=pedido, plato=plato, cantidad=2) for plato in self.platos])
+
+    def consultas_listado(self, pedidos_esperados):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/api/pedidos/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.json()['results']), pedidos_esperados)
+        return len(consultas)
+
+    def test_listado_cuesta_lo_mismo_con_1_y_50_pedidos(self):
+        self.crear_pedidos(1)
+        self.client.get('/api/pedidos/')  # la sesión y las cachés quedan igual para ambas mediciones
+        con_uno = self.consultas_listado(1)
+        self.crear_pedidos(49)
+        with self.assertNumQueries(con_uno):
+            respuesta = self.client.get('/api/pedidos/')
+        self.assertEqual(len(respuesta.json()['results']), 50)
+        self.assertEqual(respuesta.json()['results'][0]['total'], 2 * (1000 + 2000 + 3000))
+
+    def test_cantidad_fuera_de_rango_da_400(self):
+        self.crear_pedidos(1)
+        pedido = Pedido.objects.get()
+        url = f'/api/pedidos/{pedido.pk}/agregar_plato/'
+        for cantidad in (0, DetallePedido.CANTIDAD_MAXIMA + 1, 10 ** 30):
+            respuesta = self.client.post(url, {'plato_id': self.platos[0].pk, 'cantidad': cantidad}, content_type='application/json')
+            self.assertEqual(respuesta.status_code, 400, cantidad)
+        self.assertFalse(TicketCocina.objects.exists())
+        respuesta = self.client.post(url, {'plato_id': self.platos[0].pk, 'cantidad': DetallePedido.CANTIDAD_MAXIMA}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200)
+        detalle = DetallePedido.objects.get(pedido=pedido, plato=self.platos[0])
+        self.assertEqual(detalle.cantidad, 2 + DetallePedido.CANTIDAD_MAXIMA)
+        respuesta = self.client.patch(f'/api/detalles/{detalle.pk}/', {'cantidad': 10 ** 30}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver', 'centro.test', 'norte.test'])
+class CacheRespuestasTests(TestCase):
+    def setUp(self):
+        cache.cache_respuestas().clear()
+        self.client.force_login(User.objects.create_user('mozo', password='clave'))
+        self.plato = Plato.objects.create(nombre='Lomo', precio=9000, categoria='Fondo', imagen='platos/lomo.jpg')
+        self.url = f'/api/platos/{self.plato.pk}/'
+
+    def test_detalle_guardado_tarde_no_se_sirve(self):
+        peticion = self.client.get(self.url).wsgi_request
+        # Una petición que leyó la generación antes del cambio...
+        clave = cache.clave_detalle('plato', str(self.plato.pk), cache.generacion('plato', str(self.plato.pk)), peticion)
+        viejo = self.client.get(self.url).content
+        with self.captureOnCommitCallbacks(execute=True):
+            self.plato.nombre = 'Lomo vetado'
+            self.plato.save()
+        # ...y guarda su cuerpo después de la invalidación
+        cache.cache_respuestas().set(clave, viejo)
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertEqual(respuesta.json()['nombre'], 'Lomo vetado')
+
+    def test_cambio_hecho_en_otro_proceso(self):
+        self.assertEqual(self.client.get('/api/platos/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/platos/')['X-Cache'], 'HIT')
+        # Otro worker o un comando cambia el plato y avanza la generación en los archivos
+        # compartidos; en este proceso no se dispara ninguna señal
+        Plato.objects.filter(pk=self.plato.pk).update(nombre='Lomo vetado')
+        otro_proceso = caches.create_connection('generaciones')
+        otro_proceso.set(cache.clave_generacion('plato'), time.time_ns(), timeout=None)
+        respuesta = self.client.get('/api/platos/')
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertEqual(respuesta.json()[0]['nombre'], 'Lomo vetado')
+
+    def test_urls_absolutas_por_host(self):
+        for url in ('/api/platos/', self.url):
+            centro = self.client.get(url, HTTP_HOST='centro.test')
+            norte = self.client.get(url, HTTP_HOST='norte.test')
+            self.assertIn(b'http://centro.test/', centro.content)
+            self.assertIn(b'http://norte.test/', norte.content)
+            self.assertNotIn(b'centro.test', norte.content)
+            self.assertEqual(self.client.get(url, HTTP_HOST='norte.test')['X-Cache'], 'HIT')
+
+
+class TokenDispositivoTests(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        tokens.cache_tokens().clear()
+        self.mozo = User.objects.create_user('mozo', password='clave')
+        self.client.force_login(self.mozo)
+
+    def token_del_dashboard(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get('/dashboard/').context['token_dispositivo']
+
+    def test_dashboard_rota_el_token_de_la_sesion(self):
+        primero = self.token_del_dashboard()
+        self.assertEqual(self.client.get('/api/mesas/', HTTP_AUTHORIZATION=f'Token {primero}').status_code, 200)
+        # La sesión guarda solo el id del token
+        self.assertEqual(self.client.session[tokens.SESION], TokenDispositivo.objects.get().pk)
+        self.assertNotIn(primero, json.dumps(dict(self.client.session.items())))
+        segundo = self.token_del_dashboard()
+        self.assertIsNone(tokens.validar(primero))
+        self.assertEqual(tokens.validar(segundo)[0], self.mozo)
+        # El anterior se borra: la tabla no crece con cada carga de la página
+        self.token_del_dashboard()
+        self.assertEqual(TokenDispositivo.objects.count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get('/logout/')
+        self.assertFalse(TokenDispositivo.objects.exists())
+
+    def test_guardado_fuera_de_revocar_sale_de_la_cache(self):
+        registro, token = tokens.emitir(self.mozo)
+        self.assertEqual(tokens.validar(token)[0], self.mozo)
+        self.assertIn('revocado', TokenDispositivoAdmin(TokenDispositivo, admin.site).readonly_fields)
+        with self.captureOnCommitCallbacks(execute=True):
+            registro.revocado = True
+            registro.save()
+        self.assertIsNone(tokens.validar(token))
+
+    def test_token_sin_uso_vence(self):
+        _, token = tokens.emitir(self.mozo)
+        TokenDispositivo.objects.update(fecha_creacion=timezone.now() - settings.TOKENS_VIGENCIA - timedelta(minutes=1))
+        self.assertIsNone(tokens.validar(token))
+        TokenDispositivo.objects.update(ultimo_uso=timezone.now())
+        self.assertEqual(tokens.validar(token)[0], self.mozo)
+
+    def test_purgar_tokens(self):
+        viejo = timezone.now() - settings.TOKENS_VIGENCIA - timedelta(days=1)
+        vigente, _ = tokens.emitir(self.mozo)
+        vencido, _ = tokens.emitir(self.mozo)
+        revocado, _ = tokens.emitir(self.mozo)
+        revocado_hoy, _ = tokens.emitir(self.mozo)
+        TokenDispositivo.objects.filter(pk=vencido.pk).update(fecha_creacion=viejo)
+        TokenDispositivo.objects.filter(pk=revocado.pk).update(revocado=True, fecha_revocacion=viejo)
+        tokens.revocar(TokenDispositivo.objects.filter(pk=revocado_hoy.pk))
+        salida = StringIO()
+        call_command('purgar_tokens', stdout=salida)
+        self.assertIn('2 tokens borrados', salida.getvalue())
+        self.assertEqual(set(TokenDispositivo.objects.values_list('pk', flat=True)), {vigente.pk, revocado_hoy.pk})
+
+    def test_alta_con_limite_de_intentos(self):
+        cliente = Client()
+        respuestas = [
+            cliente.post('/api/tokens/', {'username': 'mozo', 'password': 'mala'}).status_code
+            for _ in range(11)
+        ]
+        self.assertEqual(respuestas, [400] * 10 + [429])
+
+
+class EscrituraSerializadaTests(TestCase):
+    def test_alta_de_token_comprueba_la_clave_fuera_del_lock(self):
+        User.objects.create_user('mozo', password='clave')
+        libre = []
+        original = views.authenticate
+
+        def authenticate(*args, **kwargs):
+            libre.append(lock_libre())
+            return original(*args, **kwargs)
+
+        with mock.patch.object(views, 'authenticate', authenticate):
+            respuesta = self.client.post('/api/tokens/', {'username': 'mozo', 'password': 'clave'})
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(libre, [True])
+
+    def test_alta_de_empleado_calcula_el_hash_fuera_del_lock(self):
+        self.client.force_login(User.objects.create_user('admin', password='clave', is_staff=True))
+        libre = []
+        original = serializers.make_password
+
+        def make_password(*args, **kwargs):
+            libre.append(lock_libre())
+            return original(*args, **kwargs)
+
+        with mock.patch.object(serializers, 'make_password', make_password):
+            respuesta = self.client.post('/api/empleados/', {
+                'username': 'mozo', 'password': 'clave-larga', 'perfil': {'rut': '1-9'},
+            }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(libre, [True])
+        self.assertTrue(User.objects.get(username='mozo').check_password('clave-larga'))
+
+
+class LecturasAsyncTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('mozo', password='clave')
+        self.client.force_login(self.usuario)
+        self.mesa = Mesa.objects.create(nombre='Mesa 1', piso=Piso.objects.create(nombre='Salón', numero=1))
+        pedido = Pedido.objects.create(mesa=self.mesa)
+        plato = Plato.objects.create(nombre='Lomo', precio=9000, categoria='Fondo', imagen='platos/lomo.jpg')
+        DetallePedido.objects.sumar(pedido, plato, 2)
+
+    def montar_lecturas(self, activas):
+        # urls.py decide al importarse si monta las vistas async
+        from . import urls
+        with override_settings(LECTURAS_ASYNC=activas):
+            importlib.reload(urls)
+        clear_url_caches()
+
+    async def test_pedido_abierto_igual_por_ambos_caminos(self):
+        url = f'/api/pedidos/?mesa={self.mesa.pk}&completado=false'
+        await self.async_client.aforce_login(self.usuario)
+        sync = await sync_to_async(self.client.get)(url)
+        self.montar_lecturas(True)
+        self.addCleanup(self.montar_lecturas, False)
+        self.assertEqual(resolve('/api/pedidos/').url_name, 'pedido-list-async')
+        asincrona = await self.async_client.get(url)
+        self.assertEqual(asincrona.status_code, 200)
+        self.assertIn(b'http://testserver/', asincrona.content)
+        self.assertEqual(asincrona.content, sync.content)
+
+    async def test_cocina_espera_sin_ocupar_un_hilo(self):
+        await self.async_client.aforce_login(self.usuario)
+        self.montar_lecturas(True)
+        self.addCleanup(self.montar_lecturas, False)
+        self.assertEqual(resolve('/api/cocina/esperar/').url_name, 'cocina-esperar-async')
+        desde = await TicketCocina.objects.filter(estacion='caliente').aaggregate(maximo=Max('id'))
+        url = f"/api/cocina/esperar/?estacion=caliente&desde={desde['maximo'] or 0}&espera=10"
+
+        async def llega_un_ticket():
+            await asyncio.sleep(0.2)
+            pedido = await Pedido.objects.aget(mesa=self.mesa)
+            plato = await Plato.objects.aget()
+            await sync_to_async(cocina.crear_ticket)(pedido.pk, plato, 1)
+            # En TestCase no se confirma la transacción: se avisa a mano
+            cocina.notificar()
+
+        inicio = time.monotonic()
+        respuesta, _ = await asyncio.gather(self.async_client.get(url), llega_un_ticket())
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertEqual([t['plato_nombre'] for t in respuesta.json()['tickets']], ['Lomo'])
+        # Los parámetros inválidos siguen respondiendo el ViewSet
+        self.assertEqual((await self.async_client.get('/api/cocina/esperar/?estacion=luna')).status_code, 400)
+
+
+class ImportarPlanoTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='clave', is_staff=True))
+        Piso.objects.create(nombre='Terraza', numero=1)
+        Piso.objects.create(nombre='Salón', numero=2)
+        Piso.objects.create(nombre='Bar', numero=3)
+
+    def importar(self, pisos):
+        return self.client.post('/api/pisos/importar/', {'pisos': pisos}, content_type='application/json')
+
+    def nombres(self):
+        return dict(Piso.objects.values_list('numero', 'nombre'))
+
+    def test_intercambiar_nombres(self):
+        respuesta = self.importar([
+            {'numero': 1, 'nombre': 'Salón', 'mesas': []},
+            {'numero': 2, 'nombre': 'Terraza', 'mesas': [{'nombre': 'Mesa 1', 'capacidad': 2}]},
+        ])
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.nombres(), {1: 'Salón', 2: 'Terraza', 3: 'Bar'})
+
+    def test_piso_nuevo_toma_el_nombre_de_uno_renombrado(self):
+        respuesta = self.importar([
+            {'numero': 1, 'nombre': 'Jardín', 'mesas': []},
+            {'numero': 4, 'nombre': 'Terraza', 'mesas': []},
+        ])
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        self.assertEqual(self.nombres(), {1: 'Jardín', 2: 'Salón', 3: 'Bar', 4: 'Terraza'})
+
+    def test_nombre_de_piso_fuera_del_archivo_da_400(self):
+        respuesta = self.importar([{'numero': 1, 'nombre': 'Bar', 'mesas': []}])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(self.nombres(), {1: 'Terraza', 2: 'Salón', 3: 'Bar'})
+
+
+class ImagenesTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        ajustes = override_settings(MEDIA_ROOT=media.name, IMAGENES_VARIANTES=True, IMAGENES_WORKERS=0)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def imagen(self, nombre, color):
+        contenido = io.BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camara'  # Make
+        Image.new('RGB', (1500, 1000), color).save(contenido, 'JPEG', exif=exif)
+        return SimpleUploadedFile(nombre, contenido.getvalue(), content_type='image/jpeg')
+
+    def test_variantes_generadas_al_guardar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            plato = Plato.objects.create(nombre='Lomo', precio=9000, categoria='Fondo', imagen=self.imagen('lomo.jpg', 'red'))
+        plato.refresh_from_db()
+        variantes = plato.imagen_variantes
+        self.assertEqual(variantes['origen'], plato.imagen.name)
+        self.assertEqual(set(variantes['formatos']), {'webp', 'jpg'})
+        for extension, formato in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+            self.assertEqual(set(variantes['formatos'][extension]), {'320', '640', '1024'})
+            for ancho, nombre in variantes['formatos'][extension].items():
+                with plato.imagen.storage.open(nombre) as archivo, Image.open(archivo) as variante:
+                    self.assertEqual(variante.format, formato)
+                    self.assertEqual(variante.size, (int(ancho), round(int(ancho) * 2 / 3)))
+                    self.assertFalse(variante.getexif())
+        self.assertIn(' 640w', plato.srcset_webp)
+
+        # Otra imagen reemplaza las variantes y borra las anteriores
+        anteriores = variantes['archivos']
+        with self.captureOnCommitCallbacks(execute=True):
+            plato.imagen = self.imagen('lomo2.jpg', 'blue')
+            plato.save()
+        plato.refresh_from_db()
+        self.assertNotEqual(plato.imagen_variantes['huella'], variantes['huella'])
+        self.assertFalse(any(plato.imagen.storage.exists(nombre) for nombre in anteriores))
+        self.assertTrue(all(plato.imagen.storage.exists(nombre) for nombre in plato.imagen_variantes['archivos']))
+
+
+class ReportesTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='clave', is_staff=True))
+        self.piso = Piso.objects.create(nombre='Salón', numero=1)
+        mesa = self.piso.mesas.create(nombre='Mesa 1', estado='Ocupada')
+        self.plato = Plato.objects.create(nombre='Lomo', precio=9000, categoria='Fondo', imagen='platos/lomo.jpg')
+        pedido = Pedido.objects.create(mesa=mesa)
+        DetallePedido.objects.create(pedido=pedido, plato=self.plato, cantidad=2)
+        self.assertEqual(self.client.post(f'/api/pedidos/{pedido.pk}/finalizar/').status_code, 200)
+
+    def nombres(self):
+        datos = self.client.get('/api/reportes/').json()
+        return [fila['nombre'] for fila in datos['platos']], [fila['nombre'] for fila in datos['pisos']]
+
+    def test_nombres_de_lo_vendido(self):
+        self.plato.nombre = 'Lomo vetado'
+        self.plato.save()
+        self.piso.nombre = 'Terraza'
+        self.piso.save()
+        self.assertEqual(self.nombres(), (['Lomo'], ['Salón']))
+        reportes.reconstruir()
+        self.assertEqual(self.nombres(), (['Lomo'], ['Salón']))
+        self.plato.delete()
+        self.assertEqual(self.nombres(), (['Lomo'], ['Salón']))
+
+    def test_reconstruir_lee_con_el_lock_tomado(self):
+        # Un finalizar que llegue durante la lectura espera a que se reemplacen las filas
+        libre = []
+        original = reportes._acumulados
+
+        def acumulados(comprobante):
+            libre.append(lock_libre())
+            return original(comprobante)
+
+        with mock.patch.object(reportes, '_acumulados', acumulados):
+            reportes.reconstruir()
+        self.assertEqual(libre, [False])
+
+
+class ReservaTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='clave', is_staff=True))
+        piso = Piso.objects.create(nombre='Salón', numero=1)
+        self.mesa = Mesa.objects.create(nombre='Mesa 1', piso=piso)
+        self.inicio = (timezone.now() + timedelta(days=1)).replace(hour=20, minute=0, second=0, microsecond=0)
+
+    def reservar(self, inicio, **datos):
+        respuesta = self.client.post('/api/reservas/', {
+            'mesa': self.mesa.pk, 'nombre_cliente': 'Cliente', 'cantidad_personas': 2,
+            'fecha_hora': inicio.isoformat(), 'fecha_hora_fin': (inicio + timedelta(hours=2)).isoformat(), **datos,
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        return respuesta.json()['id']
+
+    def test_mover_reserva_sobre_otra_es_rechazado(self):
+        self.reservar(self.inicio)
+        otra = self.reservar(self.inicio + timedelta(hours=3))
+        respuesta = self.client.patch(f'/api/reservas/{otra}/', {
+            'fecha_hora': (self.inicio + timedelta(hours=1)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual(Reserva.objects.get(pk=otra).fecha_hora, self.inicio + timedelta(hours=3))
+
+    def test_mover_reserva_a_horario_libre(self):
+        reserva = self.reservar(self.inicio)
+        respuesta = self.client.patch(f'/api/reservas/{reserva}/', {
+            'fecha_hora': (self.inicio + timedelta(hours=1)).isoformat(),
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+    def test_disponibilidad_rechaza_hasta_invalido(self):
+        respuesta = self.client.get('/api/reservas/disponibilidad/', {'desde': self.inicio.isoformat(), 'hasta': 'mal'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('hasta', respuesta.json())
+
+    def test_eliminar_reserva_no_libera_mesa_con_otra_vigente(self):
+        primera = self.reservar(self.inicio)
+        segunda = self.reservar(self.inicio + timedelta(hours=3))
+        self.assertEqual(self.client.delete(f'/api/reservas/{primera}/').status_code, 204)
+        self.mesa.refresh_from_db()
+        self.assertEqual(self.mesa.estado, 'Reservada')
+        self.assertEqual(self.client.delete(f'/api/reservas/{segunda}/').status_code, 204)
+        self.mesa.refresh_from_db()
+        self.assertEqual(self.mesa.estado, 'Libre')
+
+
+class VersionadoTests(TestCase):
+    def contador(self):
+        return VersionSincronizacion.objects.values_list('valor', flat=True).first() or 0
+
+    def test_version_y_fila_se_confirman_juntas(self):
+        piso = Piso.objects.create(nombre='Salón', numero=1)
+        self.assertEqual(piso.version, self.contador())
+        antes = self.contador()
+        # Si la fila no se guarda, tampoco avanza el contador que vería un ?since=
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Piso.objects.create(nombre='Salón', numero=2)
+        self.assertEqual(self.contador(), antes)
+
+    def test_transicion_usa_una_sola_version(self):
+        mesa = Mesa.objects.create(nombre='Mesa 1', piso=Piso.objects.create(nombre='Salón', numero=1))
+        antes = self.contador()
+        self.assertTrue(Mesa.objects.transicion(mesa, ('Libre',), 'Ocupada'))
+        self.assertEqual(self.contador(), antes + 1)
+        self.assertEqual(Mesa.objects.get().version, antes + 1)
+
+
+class PlanesConsultaTests(TestCase):
+    def test_endpoints_usan_indices(self):
+        # La misma verificación que el comando verificar_planes, sobre la base de pruebas
+        fallas = verificar_planes.Command(stdout=StringIO()).verificar()
+        self.assertEqual(fallas, [])
+
+    def test_detecta_recorridos(self):
+        self.assertTrue(verificar_planes.es_recorrido('SCAN Pagina_Web_pedido'))
+        self.assertTrue(verificar_planes.es_recorrido('USE TEMP B-TREE FOR ORDER BY'))
+        self.assertFalse(verificar_planes.es_recorrido('SCAN Pagina_Web_pedido USING INDEX pedido_abiertos_idx'))
+        self.assertFalse(verificar_planes.es_recorrido('SEARCH Pagina_Web_mesa USING INTEGER PRIMARY KEY (rowid=?)'))
+
+
+class TransicionMesaTests(TransactionTestCase):
+    def setUp(self):
+        self.mesa = Mesa.objects.create(nombre='Mesa 1', piso=Piso.objects.create(nombre='Salón', numero=1))
+
+    def test_un_solo_ganador_entre_hilos(self):
+        hilos, resultados = 8, []
+        barrera = threading.Barrier(hilos)
+
+        def intento():
+            try:
+                mesa = Mesa.objects.get(pk=self.mesa.pk)
+                # Todos leyeron la mesa libre antes de que alguno escriba. La base de pruebas
+                # en memoria no espera locks, así que las escrituras se turnan con escritura()
+                barrera.wait()
+                with escritura():
+                    resultados.append(Mesa.objects.transicion(mesa, ('Libre',), 'Ocupada'))
+            finally:
+                connections.close_all()
+
+        trabajadores = [threading.Thread(target=intento) for _ in range(hilos)]
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+        self.assertEqual(sorted(resultados), [False] * (hilos - 1) + [True])
+        self.assertEqual(Mesa.objects.get(pk=self.mesa.pk).estado, 'Ocupada')
+
+    def test_lectura_vieja_pierde(self):
+        primera, segunda = Mesa.objects.get(pk=self.mesa.pk), Mesa.objects.get(pk=self.mesa.pk)
+        self.assertTrue(Mesa.objects.transicion(primera, ('Libre',), 'Mantenimiento'))
+        self.assertTrue(Mesa.objects.transicion(primera, ('Mantenimiento',), 'Libre'))
+        # Vuelve a estar libre, pero 'segunda' la leyó con una versión anterior
+        self.assertFalse(Mesa.objects.transicion(segunda, ('Libre',), 'Ocupada'))
+
+    def test_iniciar_pedido_en_mesa_ocupada_da_409(self):
+        self.client.force_login(User.objects.create_user('mozo', password='clave'))
+        url = f'/api/mesas/{self.mesa.pk}/iniciar_pedido/'
+        self.assertEqual(self.client.post(url).status_code, 201)
+        respuesta = self.client.post(url)
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json()['estado'], 'Ocupada')
+        self.assertEqual(Pedido.objects.filter(mesa=self.mesa).count(), 1)
+
+
+class BusquedaTests(TestCase):
+    def ids(self, modelo, texto):
+        return sorted(busqueda.buscar(modelo.objects.all(), texto).values_list('pk', flat=True))
+
+    def test_indice_sigue_inserciones_cambios_y_borrados(self):
+        plato = Plato.objects.create(nombre='Ceviche mixto', descripcion='Pescado y mariscos', precio=9000, categoria='Entrada')
+        self.assertEqual(self.ids(Plato, 'cevi'), [plato.pk])
+        self.assertEqual(self.ids(Plato, 'mariscos'), [plato.pk])
+
+        plato.nombre = 'Tiradito'
+        plato.save()
+        self.assertEqual(self.ids(Plato, 'ceviche'), [])
+        self.assertEqual(self.ids(Plato, 'tiradito'), [plato.pk])
+
+        plato.delete()
+        self.assertEqual(self.ids(Plato, 'tiradito'), [])
+        busqueda.verificar(Plato)
+
+    def test_indice_sigue_escrituras_masivas(self):
+        # bulk_create y queryset.update() no pasan por save(): los cubren los triggers
+        creados = Incidente.objects.bulk_create([
+            Incidente(tipo='Queja', mensaje='El café llegó frío'),
+            Incidente(tipo='Sugerencia', mensaje='Más música en la terraza'),
+        ])
+        self.assertEqual(self.ids(Incidente, 'cafe frio'), [creados[0].pk])
+        Incidente.objects.filter(pk=creados[0].pk).update(mensaje='Demora en la cuenta')
+        self.assertEqual(self.ids(Incidente, 'café'), [])
+        self.assertEqual(self.ids(Incidente, 'demora'), [creados[0].pk])
+        Incidente.objects.filter(tipo='Sugerencia').delete()
+        self.assertEqual(self.ids(Incidente, 'terraza'), [])
+        busqueda.verificar(Incidente)
+
+    def test_api_resalta_coincidencias(self):
+        self.client.force_login(User.objects.create_user('mozo', password='clave'))
+        Incidente.objects.create(tipo='Queja', mensaje='La sopa <b>fría</b>')
+        resultados = self.client.get('/api/incidentes/', {'search': 'fria', 'fragmento': 1}).json()
+        self.assertEqual(len(resultados), 1)
+        self.assertIn('<mark>fría</mark>', resultados[0]['fragmento'])
+        self.assertIn('&lt;b&gt;', resultados[0]['fragmento'])
+
+
+class EstaticosTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.raiz = tempfile.TemporaryDirectory(prefix='estaticos_')
+        cls.ajustes = override_settings(
+            DEBUG=False, STATIC_ROOT=cls.raiz.name, ESTATICOS_COMPRIMIDOS=True,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'Pagina_Web.estaticos.AlmacenEstaticos'},
+            },
+        )
+        cls.ajustes.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(cls.raiz.name, 'staticfiles.json')) as archivo:
+            cls.manifiesto = json.load(archivo)['paths']
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        cls.raiz.cleanup()
+        super().tearDownClass()
+
+    def leer(self, nombre, extension=''):
+        with open(os.path.join(self.raiz.name, nombre + extension), 'rb') as archivo:
+            return archivo.read()
+
+    def test_manifiesto_con_hash(self):
+        con_hash = self.manifiesto['js/dashboard.js']
+        self.assertRegex(con_hash, r'^js/dashboard\.[0-9a-f]{12}\.js$')
+        self.assertRegex(self.manifiesto['css/dashboard.css'], r'^css/dashboard\.[0-9a-f]{12}\.css$')
+
+    def test_minificado_y_gzip(self):
+        for nombre in ('js/dashboard.js', 'css/dashboard.css'):
+            with open(finders.find(nombre), 'rb') as archivo:
+                fuente = archivo.read()
+            minificado = self.leer(self.manifiesto[nombre])
+            self.assertLess(len(minificado), len(fuente), nombre)
+            # La variante .gz es exactamente el archivo minificado
+            self.assertEqual(gzip.decompress(self.leer(self.manifiesto[nombre], '.gz')), minificado)
+        self.assertNotIn(b'\n//', self.leer(self.manifiesto['js/dashboard.js']))
+
+    @skipIf(estaticos.brotli is None, 'falta el paquete brotli (requirements.txt)')
+    def test_brotli(self):
+        nombre = self.manifiesto['js/dashboard.js']
+        self.assertEqual(estaticos.brotli.decompress(self.leer(nombre, '.br')), self.leer(nombre))
+        respuesta = Client().get('/static/' + nombre, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(respuesta['Content-Encoding'], 'br')
+
+    def test_middleware_sirve_variante_inmutable(self):
+        url = '/static/' + self.manifiesto['js/dashboard.js']
+        respuesta = Client().get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+        self.assertEqual(respuesta.content, self.leer(self.manifiesto['js/dashboard.js'], '.gz'))
+        # Sin hash se revalida con ETag
+        sin_hash = Client().get('/static/js/dashboard.js')
+        self.assertIn('must-revalidate', sin_hash['Cache-Control'])
+        self.assertEqual(Client().get('/static/js/dashboard.js', HTTP_IF_NONE_MATCH=sin_hash['ETag']).status_code, 304)
+
+    def test_minificadores(self):
+        self.assertEqual(estaticos.minificar_css('a {\n  color: red;\n}\n/* nota */\n'), 'a{color:red}\n')
+        self.assertEqual(
+            estaticos.minificar_js('// comentario\n  const a = 1;\n\n  const b = `x\n    y`;\n'),
+            'const a = 1;\nconst b = `x\n    y`;\n',
+        )
+
+
+class SucursalesTests(TestCase):
+    """Una sucursal 'norte' creada con crear_sucursal en una base temporal, junto a la principal."""
+    # '__all__' se resuelve en setUpClass, cuando 'norte' ya existe
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directorio = tempfile.TemporaryDirectory(prefix='sucursales_')
+        cls.ajustes = override_settings(
+            SUCURSALES={}, SUCURSALES_ARCHIVO=Path(cls.directorio.name) / 'sucursales.json',
+            SUCURSALES_DIRECTORIO=Path(cls.directorio.name),
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'norte.test'],
+        )
+        cls.ajustes.enable()
+        call_command('crear_sucursal', 'norte', nombre='Norte', host=['norte.test'], stdout=StringIO())
+        # La base de 'norte' no entra en las transacciones de TestCase: sus datos son de toda la clase
+        with sucursales.en_sucursal('norte'):
+            Mesa.objects.create(nombre='Mesa norte', piso=Piso.objects.create(nombre='Salón norte', numero=1))
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['norte'].close()
+        del connections['norte']
+        settings.DATABASES.pop('norte', None)
+        connections.settings.pop('norte', None)
+        cls.ajustes.disable()
+        cls.directorio.cleanup()
+
+    def setUp(self):
+        Mesa.objects.create(nombre='Mesa principal', piso=Piso.objects.create(nombre='Salón principal', numero=1))
+
+    def mesas(self, cliente, **cabeceras):
+        respuesta = cliente.get('/api/mesas/', **cabeceras)
+        if respuesta.status_code != 200:
+            return respuesta.status_code
+        return [mesa['nombre'] for mesa in respuesta.json()]
+
+    def test_router_separa_las_bases(self):
+        self.assertEqual(list(Mesa.objects.values_list('nombre', flat=True)), ['Mesa principal'])
+        with sucursales.en_sucursal('norte'):
+            self.assertEqual(router.db_for_write(Mesa), 'norte')
+            self.assertEqual(list(Mesa.objects.values_list('nombre', flat=True)), ['Mesa norte'])
+            # Usuarios y perfiles son de toda la empresa
+            self.assertEqual(router.db_for_write(Perfil), 'default')
+            self.assertEqual(router.db_for_write(User), 'default')
+            mesa = Mesa.objects.get()
+        # Las relaciones siguen en la base de la instancia aunque se lean fuera del bloque
+        self.assertEqual(mesa.piso.nombre, 'Salón norte')
+        self.assertEqual(json.loads(settings.SUCURSALES_ARCHIVO.read_text())['norte']['hosts'], ['norte.test'])
+
+    def test_eleccion_de_sucursal(self):
+        admin = Client()
+        admin.force_login(User.objects.create_user('admin', password='clave', is_staff=True))
+        self.assertEqual(self.mesas(admin), ['Mesa principal'])
+        self.assertEqual(self.mesas(admin, HTTP_X_SUCURSAL='norte'), ['Mesa norte'])
+        self.assertEqual(self.mesas(admin, HTTP_HOST='norte.test'), ['Mesa norte'])
+        self.assertEqual(self.mesas(admin, HTTP_X_SUCURSAL='luna'), 400)
+
+    def test_usuario_de_otra_sucursal_recibe_403(self):
+        mozo = User.objects.create_user('mozo', password='clave')
+        Perfil.objects.create(user=mozo, sucursal='norte')
+        cliente = Client()
+        cliente.force_login(mozo)
+        self.assertEqual(self.mesas(cliente), ['Mesa norte'])
+        self.assertEqual(self.mesas(cliente, HTTP_X_SUCURSAL='default'), 403)
+        self.assertEqual(self.mesas(cliente, HTTP_HOST='norte.test'), ['Mesa norte'])
+        # Al cambiar el perfil se olvida la sucursal guardada en caché
+        perfil = Perfil.objects.get(user=mozo)
+        perfil.sucursal = ''
+        perfil.save()
+        self.assertEqual(self.mesas(cliente, HTTP_X_SUCURSAL='default'), ['Mesa principal'])
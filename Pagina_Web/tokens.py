@@ -0,0 +1,164 @@
+"""
+Autenticación por token de dispositivo para las tablets del personal.
+
+El token se entrega una sola vez (en la página del dashboard o por POST /api/tokens/) y se envía
+en cada petición como 'Authorization: Token <token>'. La sesión guarda solo el id de su token:
+cada carga del dashboard borra el anterior y emite otro, que únicamente queda en la página. Un
+token sin usar durante settings.TOKENS_VIGENCIA deja de valer; el comando purgar_tokens borra
+los vencidos y los revocados hace más de ese tiempo. La validación pasa por la caché 'tokens' del
+proceso (acotada y con TTL), que guarda el usuario ya cargado: una petición autenticada así
+normalmente no hace ninguna consulta. Revocar un token o guardar su usuario (desactivarlo,
+quitarle is_staff) lo saca de la caché; en otros procesos el cambio se ve al vencer el TTL.
+"""
+import hashlib
+import secrets
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+
+from .models import TokenDispositivo
+
+PALABRA_CLAVE = 'Token'
+SESION = 'token_dispositivo'  # id del TokenDispositivo de la sesión; nunca el token en claro
+
+
+def cache_tokens():
+    return caches['tokens']
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _clave_cache(clave):
+    return f'token:{clave}'
+
+
+def emitir(usuario, dispositivo=''):
+    """Crea un token para el usuario. Devuelve (TokenDispositivo, token en claro)."""
+    token = secrets.token_urlsafe(32)
+    registro = TokenDispositivo.objects.create(
+        usuario=usuario, clave=hash_token(token), prefijo=token[:8], dispositivo=dispositivo[:100],
+    )
+    return registro, token
+
+
+def emitir_para_sesion(request):
+    """Borra el token de la sesión (si tenía) y emite otro. Devuelve el token en claro, que no se guarda."""
+    borrar_de_sesion(request)
+    registro, token = emitir(request.user, request.headers.get('User-Agent', ''))
+    request.session[SESION] = registro.pk
+    return token
+
+
+def borrar_de_sesion(request):
+    # Los de sesión se borran en vez de revocarse: cada carga del dashboard emite uno y la tabla
+    # crecería con cada página. post_delete los saca de la caché (ver signals.py)
+    if request.session.get(SESION):
+        TokenDispositivo.objects.filter(pk=request.session.pop(SESION), usuario=request.user).delete()
+
+
+def purgar():
+    """Borra los tokens vencidos y los revocados hace más de TOKENS_VIGENCIA. Devuelve cuántos borró."""
+    limite = timezone.now() - settings.TOKENS_VIGENCIA
+    borrados, _ = TokenDispositivo.objects.filter(
+        Q(revocado=True, fecha_revocacion__lt=limite)
+        | Q(ultimo_uso__lt=limite)
+        | Q(ultimo_uso__isnull=True, fecha_creacion__lt=limite)
+    ).delete()
+    return borrados
+
+
+def olvidar(claves):
+    # Tras confirmar la transacción, así ninguna lectura concurrente vuelve a guardar el estado anterior
+    claves = [_clave_cache(clave) for clave in claves]
+    if claves:
+        transaction.on_commit(lambda: cache_tokens().delete_many(claves))
+
+
+def revocar(tokens):
+    """Revoca los tokens del queryset y los quita de la caché. Devuelve cuántos se revocaron."""
+    claves = list(tokens.filter(revocado=False).values_list('clave', flat=True))
+    revocados = TokenDispositivo.objects.filter(clave__in=claves).update(revocado=True, fecha_revocacion=timezone.now())
+    olvidar(claves)
+    return revocados
+
+
+def olvidar_usuario(usuario):
+    olvidar(TokenDispositivo.objects.filter(usuario=usuario, revocado=False).values_list('clave', flat=True))
+
+
+def _buscar(clave):
+    limite = timezone.now() - settings.TOKENS_VIGENCIA
+    registro = (
+        TokenDispositivo.objects.select_related('usuario')
+        .filter(clave=clave, revocado=False, usuario__is_active=True)
+        .filter(Q(ultimo_uso__gte=limite) | Q(ultimo_uso__isnull=True, fecha_creacion__gte=limite)).first()
+    )
+    if registro is None:
+        return None
+    # Se anota al cargarlo en la caché: a lo sumo una escritura por token y TTL
+    TokenDispositivo.objects.filter(pk=registro.pk).update(ultimo_uso=timezone.now())
+    return registro.usuario, registro.pk
+
+
+def validar(token):
+    """Devuelve (usuario, id del token) o None si el token no existe, está revocado o vencido, o su usuario inactivo."""
+    clave = hash_token(token)
+    encontrado = cache_tokens().get(_clave_cache(clave))
+    if encontrado is None:
+        encontrado = _buscar(clave)
+        if encontrado is not None:
+            cache_tokens().set(_clave_cache(clave), encontrado)
+    return encontrado
+
+
+async def avalidar(token):
+    clave = hash_token(token)
+    encontrado = await cache_tokens().aget(_clave_cache(clave))
+    if encontrado is None:
+        encontrado = await sync_to_async(_buscar)(clave)
+        if encontrado is not None:
+            await cache_tokens().aset(_clave_cache(clave), encontrado)
+    return encontrado
+
+
+def token_de(request):
+    """El token del encabezado Authorization, '' si no viene, o None si el encabezado está mal formado."""
+    partes = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if not partes or partes[0] != PALABRA_CLAVE:
+        return ''
+    return partes[1] if len(partes) == 2 else None
+
+
+async def ausuario(request):
+    """Usuario de una vista async: por token si viene uno, si no por sesión. None si el token no es válido."""
+    token = token_de(request)
+    if token == '':
+        return await request.auser()
+    encontrado = await avalidar(token) if token else None
+    return encontrado[0] if encontrado else None
+
+
+class TokenDispositivoAuthentication(BaseAuthentication):
+    """
+    Sin encabezado 'Authorization: Token ...' deja pasar a la autenticación por sesión.
+    No define authenticate_header, así las peticiones sin credenciales siguen recibiendo 403.
+    """
+
+    def authenticate(self, request):
+        token = token_de(request)
+        if token == '':
+            return None
+        if token is None:
+            raise exceptions.AuthenticationFailed('Encabezado de token inválido.')
+        encontrado = validar(token)
+        if encontrado is None:
+            raise exceptions.AuthenticationFailed('Token inválido o revocado.')
+        return encontrado
@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
@@ -11,8 +13,14 @@ router.register(r'pedidos', views.PedidoViewSet, basename='pedido')
 router.register(r'detalles', views.DetallePedidoViewSet, basename='detallepedido')
 router.register(r'empleados', views.EmpleadoViewSet, basename='empleado')
 router.register(r'reservas', views.ReservaViewSet, basename='reserva')
+router.register(r'espera', views.EsperaViewSet, basename='espera')
 router.register(r'incidentes', views.IncidenteViewSet, basename='incidente')
 router.register(r'pisos', views.PisoViewSet, basename='piso')
+router.register(r'reportes', views.ReporteViewSet, basename='reporte')
+router.register(r'bootstrap', views.BootstrapViewSet, basename='bootstrap')
+router.register(r'cocina', views.CocinaViewSet, basename='cocina')
+router.register(r'tokens', views.TokenDispositivoViewSet, basename='token')
+router.register(r'comprobantes', views.ComprobanteViewSet, basename='comprobante')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -23,6 +31,17 @@ urlpatterns = [
     path('historial/', views.historial_view, name='historial'),
     path('restaurante/', views.restaurante_view, name='restaurante'),
     path('carta/', views.carta_view, name='carta'),
+    path('api/eventos/', views.eventos_view, name='eventos'),
+    path('api/cache/', views.cache_estadisticas, name='cache_estadisticas'),
+    path('api/metricas/', views.metricas_view, name='metricas'),
     path('api/', include(router.urls)),
     path('', lambda request: redirect('login')),
-]
\ No newline at end of file
+]
+
+if settings.LECTURAS_ASYNC:
+    # Bajo ASGI las lecturas de los tableros van primero por las vistas async
+    from Pagina_Web import lecturas
+    urlpatterns = lecturas.urlpatterns + urlpatterns
+
+if settings.DEBUG:
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
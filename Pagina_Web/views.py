@@ -1,22 +1,53 @@
+import asyncio
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.throttling import ScopedRateThrottle
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Mesa, Plato, Pedido, DetallePedido, Reserva, Incidente, Piso
+from .models import Mesa, Plato, Pedido, DetallePedido, Reserva, Incidente, Piso, TicketCocina, TokenDispositivo, Comprobante, Espera, duracion_reserva_defecto
 from .forms import PlatoForm
 from .serializers import (
     MesaSerializer, PlatoSerializer, PedidoSerializer, 
     DetallePedidoSerializer, UserSerializer, CreateUserSerializer,
-    ReservaSerializer, IncidenteSerializer, PisoSerializer
+    ReservaSerializer, IncidenteSerializer, PisoSerializer, TicketCocinaSerializer,
+    TokenDispositivoSerializer, ComprobanteSerializer, EsperaSerializer,
 )
 from .permissions import IsAdminUser
+from . import cache, cocina, comprobantes, espera, eventos, exportacion, metricas, plano, reportes, sucursales, tokens
+from .signals import filas_actualizadas, linea_modificada
+from .filters import BusquedaTextoFilter, ComprobanteFilter, PedidoFilter
+from .pagination import FechaCursorPagination
+from .sincronizacion import VersionadoListMixin
+from .db import EscrituraSerializadaMixin
+
+class Conflicto(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'El recurso cambió mientras se procesaba la petición.'
+    default_code = 'conflicto'
+
+def conflicto_mesa(mesa, desde, mensaje):
+    # 409 con el estado actual de la mesa, para que el cliente la recargue antes de reintentar
+    actual = Mesa.objects.filter(pk=mesa.pk).values_list('estado', flat=True).first()
+    if actual in desde:
+        # Seguía en un estado válido: la ganó otra petición que la modificó en el medio
+        mensaje = 'La mesa cambió mientras se procesaba la petición. Vuelva a intentarlo.'
+    raise Conflicto({'error': mensaje, 'estado': actual})
 
 # --- Vistas de Páginas HTML ---
 def login_view(request):
@@ -33,6 +64,8 @@ def login_view(request):
     return render(request, 'Pagina_Web/login.html', {'form': form})
 
 def logout_view(request):
+    if request.user.is_authenticated:
+        tokens.borrar_de_sesion(request)
     logout(request)
     messages.info(request, "Has cerrado sesión correctamente.")
     return redirect('login')
@@ -41,7 +74,9 @@ def logout_view(request):
 def dashboard_view(request):
     if request.user.is_staff:
         return redirect('admin_dashboard')
-    return render(request, 'Pagina_Web/dashboard.html')
+    # Las tablets de los mozos usan un token de dispositivo en la API (ver tokens.py); cada carga
+    # rota el de la sesión y el token en claro solo viaja en esta página
+    return render(request, 'Pagina_Web/dashboard.html', {'token_dispositivo': tokens.emitir_para_sesion(request)})
 
 @login_required
 def admin_dashboard_view(request):
@@ -51,7 +86,7 @@ def admin_dashboard_view(request):
 
 @login_required
 def historial_view(request):
-    pedidos = Pedido.objects.all().order_by('-fecha_creacion')
+    # Los pedidos se cargan por páginas desde /api/pedidos/ (ver historial.js)
     return render(request, 'Pagina_Web/historial.html')
 
 @login_required
@@ -60,16 +95,100 @@ def restaurante_view(request):
         return redirect('dashboard') 
     return render(request, 'Pagina_Web/restaurante.html')
 
+# --- Canal de eventos (Server-Sent Events) ---
+
+async def eventos_view(request):
+    # Mantiene una conexión abierta por cliente, así que solo se sirve bajo ASGI (asgi.py).
+    # Bajo WSGI responde 204, con lo que EventSource deja de reconectar y el cliente
+    # sigue recargando como antes.
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=403)
+    if 'wsgi.version' in request.META:
+        return HttpResponse(status=204)
+
+    suscripcion = eventos.get_broker().suscribir()
+
+    async def flujo():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    evento = await asyncio.wait_for(suscripcion.siguiente(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                yield f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            suscripcion.cerrar()
+
+    response = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # --- VISTAS DE LA API (ViewSets) ---
 
-class PisoViewSet(viewsets.ModelViewSet):
-    queryset = Piso.objects.all()
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_estadisticas(request):
+    return Response(cache.estadisticas())
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metricas_view(request):
+    # Formato de texto de Prometheus; se arma a mano para no pasar por los renderers de DRF
+    return HttpResponse(metricas.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class PisoViewSet(EscrituraSerializadaMixin, VersionadoListMixin, cache.RespuestaCacheMixin, viewsets.ModelViewSet):
+    queryset = Piso.objects.prefetch_related('mesas')
     serializer_class = PisoSerializer
     permission_classes = [IsAdminUser]
+    modelos_version = (Piso, Mesa)
+    cache_grupo = 'piso'
+    cache_detalle_por_generacion = True
 
-class MesaViewSet(viewsets.ModelViewSet):
+    def filtrar_cambios(self, queryset, since):
+        # Un piso cambia también cuando cambia alguna de sus mesas anidadas
+        return queryset.filter(Q(version__gt=since) | Q(mesas__version__gt=since))
+
+    @action(detail=False, methods=['get'])
+    def exportar(self, request):
+        # ?formato=json|csv; ver plano.py para el formato de cada uno
+        formato = request.query_params.get('formato', 'json')
+        if formato not in plano.FORMATOS:
+            raise ValidationError({'formato': f'Debe ser uno de: {", ".join(plano.FORMATOS)}.'})
+        if formato == 'json':
+            return Response(plano.exportar('json'))
+        response = HttpResponse(plano.exportar('csv'), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="plano.csv"'
+        return response
+
+    @action(detail=False, methods=['post'])
+    def importar(self, request):
+        # Un archivo 'archivo' (.json o .csv) o el plano en JSON en el cuerpo
+        archivo = request.FILES.get('archivo')
+        try:
+            if archivo:
+                formato = request.data.get('formato') or archivo.name.rsplit('.', 1)[-1].lower()
+                if formato not in plano.FORMATOS:
+                    raise ValidationError({'formato': f'Debe ser uno de: {", ".join(plano.FORMATOS)}.'})
+                pisos = plano.leer(archivo.read().decode('utf-8-sig'), formato)
+            else:
+                pisos = plano.leer(request.data, 'json')
+            with self.escritura():
+                resumen = plano.importar(pisos)
+        except (DjangoValidationError, ValueError) as exc:
+            raise ValidationError({'plano': getattr(exc, 'messages', [str(exc)])})
+        except IntegrityError:
+            # Otro cambio del plano se cruzó con la importación; la transacción ya se deshizo
+            raise ValidationError({'plano': ['El plano cambió durante la importación; vuelva a intentarlo.']})
+        return Response(resumen)
+
+class MesaViewSet(EscrituraSerializadaMixin, VersionadoListMixin, viewsets.ModelViewSet):
     queryset = Mesa.objects.all()
     serializer_class = MesaSerializer
+    modelos_version = (Mesa,)
     
     def get_permissions(self):
         if self.action in ['list', 'retrieve', 'iniciar_pedido']:
@@ -81,11 +200,11 @@ class MesaViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def iniciar_pedido(self, request, pk=None):
         mesa = self.get_object()
-        if mesa.estado != 'Libre':
-            return Response({'error': 'La mesa debe estar libre.'}, status=status.HTTP_400_BAD_REQUEST)
-        pedido = Pedido.objects.create(mesa=mesa)
-        mesa.estado = 'Ocupada'
-        mesa.save()
+        with self.escritura():
+            # Si dos mozos la abren a la vez, solo el primer UPDATE encuentra la mesa libre
+            if not Mesa.objects.transicion(mesa, ('Libre',), 'Ocupada'):
+                conflicto_mesa(mesa, ('Libre',), 'La mesa debe estar libre.')
+            pedido = Pedido.objects.create(mesa=mesa)
         serializer = PedidoSerializer(pedido)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -100,19 +219,18 @@ class MesaViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if mesa.estado == 'Ocupada':
-            return Response(
-                {'error': 'No se puede cambiar el estado de una mesa con un pedido activo.'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        mesa.estado = nuevo_estado
-        mesa.save()
+        desde = ('Libre', 'Reservada', 'Mantenimiento')
+        with self.escritura():
+            cambiada = Mesa.objects.transicion(mesa, desde, nuevo_estado)
+        if not cambiada:
+            conflicto_mesa(mesa, desde, 'No se puede cambiar el estado de una mesa con un pedido activo.')
         return Response(MesaSerializer(mesa).data, status=status.HTTP_200_OK)
 
-class PlatoViewSet(viewsets.ModelViewSet):
+class PlatoViewSet(EscrituraSerializadaMixin, cache.RespuestaCacheMixin, viewsets.ModelViewSet):
     queryset = Plato.objects.all()
     serializer_class = PlatoSerializer
+    cache_grupo = 'plato'
+    filter_backends = [BusquedaTextoFilter]
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [IsAuthenticated]
@@ -120,76 +238,336 @@ class PlatoViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
-class PedidoViewSet(viewsets.ModelViewSet):
-    queryset = Pedido.objects.all()
+class PedidoViewSet(EscrituraSerializadaMixin, viewsets.ModelViewSet):
+    queryset = Pedido.objects.con_totales()
     serializer_class = PedidoSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['mesa', 'completado']
+    filterset_class = PedidoFilter
+    pagination_class = FechaCursorPagination
+
+    def pedido_actualizado(self, pedido):
+        # Vuelve a leer el pedido para que los totales anotados reflejen los cambios
+        return self.get_queryset().get(pk=pedido.pk)
+
+    def cantidad_solicitada(self, request):
+        # 'cantidad' es opcional (1 por defecto) y debe ser un entero entre 1 y CANTIDAD_MAXIMA
+        try:
+            cantidad = int(request.data.get('cantidad', 1))
+        except (TypeError, ValueError):
+            return None
+        return cantidad if 0 < cantidad <= DetallePedido.CANTIDAD_MAXIMA else None
 
     @action(detail=True, methods=['post'])
     def agregar_plato(self, request, pk=None):
         pedido, plato_id = self.get_object(), request.data.get('plato_id')
+        cantidad = self.cantidad_solicitada(request)
+        if cantidad is None:
+            return Response({'error': f'La cantidad debe ser un entero entre 1 y {DetallePedido.CANTIDAD_MAXIMA}.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
             plato = Plato.objects.get(id=plato_id)
-            detalle, created = DetallePedido.objects.get_or_create(pedido=pedido, plato=plato)
-            if not created:
-                detalle.cantidad += 1
-                detalle.save()
-            return Response(self.get_serializer(pedido).data)
-        except Plato.DoesNotExist:
+            with self.escritura():
+                DetallePedido.objects.sumar(pedido, plato, cantidad)
+            return Response(self.get_serializer(self.pedido_actualizado(pedido)).data)
+        except (Plato.DoesNotExist, ValueError):
             return Response({'error': 'El plato no existe.'}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=True, methods=['post'])
     def remover_plato(self, request, pk=None):
         pedido, plato_id = self.get_object(), request.data.get('plato_id')
+        cantidad = self.cantidad_solicitada(request)
+        if cantidad is None:
+            return Response({'error': f'La cantidad debe ser un entero entre 1 y {DetallePedido.CANTIDAD_MAXIMA}.'}, status=status.HTTP_400_BAD_REQUEST)
         try:
-            detalle = DetallePedido.objects.get(pedido=pedido, plato_id=plato_id)
-            if detalle.cantidad > 1:
-                detalle.cantidad -= 1
-                detalle.save()
-            else:
-                detalle.delete()
-            return Response(self.get_serializer(pedido).data)
-        except DetallePedido.DoesNotExist:
+            with self.escritura():
+                removido = DetallePedido.objects.restar(pedido, plato_id, cantidad)
+        except ValueError:
+            removido = False
+        if not removido:
             return Response({'error': 'Este plato no está en el pedido.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(self.pedido_actualizado(pedido)).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def exportar(self, request):
+        # Pedidos completados con sus líneas para contabilidad, en streaming (ver exportacion.py).
+        # ?formato=csv|ndjson, ?desde=/?hasta= (AAAA-MM-DD, inclusivas) y ?gzip=1
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in exportacion.FORMATOS:
+            raise ValidationError({'formato': f'Debe ser uno de: {", ".join(exportacion.FORMATOS)}.'})
+        fechas = {}
+        for nombre in ('desde', 'hasta'):
+            valor = request.query_params.get(nombre)
+            fechas[nombre] = parse_date(valor) if valor else None
+            if valor and fechas[nombre] is None:
+                raise ValidationError({nombre: 'Fecha inválida (AAAA-MM-DD).'})
+        comprimir = request.query_params.get('gzip') in ('1', 'true')
+
+        # Bajo ASGI el contenido tiene que ser un iterador async para no juntarse en memoria
+        generar = exportacion.generar if 'wsgi.version' in request.META else exportacion.agenerar
+        response = StreamingHttpResponse(
+            generar(formato, comprimir=comprimir, **fechas),
+            content_type='application/gzip' if comprimir else exportacion.FORMATOS[formato],
+        )
+        nombre = exportacion.nombre_archivo(formato, comprimir=comprimir, **fechas)
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
 
     @action(detail=True, methods=['post'])
     def finalizar(self, request, pk=None):
         pedido = self.get_object()
-        pedido.completado = True
-        pedido.save()
         mesa = pedido.mesa
-        mesa.estado = 'Libre'
-        mesa.save()
+        with self.escritura():
+            # La mesa se libera si sigue ocupada tal como se leyó; si cambió, no se cierra nada
+            if mesa.estado == 'Ocupada' and not Mesa.objects.transicion(mesa, ('Ocupada',), 'Libre'):
+                conflicto_mesa(mesa, ('Ocupada',), 'La mesa ya no está ocupada.')
+            # Solo el primer finalizar cierra el pedido; el segundo deshace lo anterior
+            if not Pedido.objects.filter(pk=pedido.pk, completado=False).update(completado=True):
+                raise Conflicto({'error': 'El pedido ya estaba finalizado.'})
+            filas_actualizadas.send(sender=Pedido, queryset=Pedido.objects.filter(pk=pedido.pk))
+            # Precios y nombres quedan fijos desde aquí; los reportes suman desde el comprobante
+            reportes.acumular_pedido(comprobantes.congelar(pedido))
         return Response({'status': 'Pedido finalizado'}, status=status.HTTP_200_OK)
 
-class DetallePedidoViewSet(viewsets.ModelViewSet):
-    queryset = DetallePedido.objects.all()
+class ComprobanteViewSet(viewsets.ReadOnlyModelViewSet):
+    # Historial de pedidos cerrados, leído de los comprobantes sin unir mesas ni platos
+    queryset = Comprobante.objects.all()
+    serializer_class = ComprobanteSerializer
+    permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ComprobanteFilter
+    pagination_class = FechaCursorPagination
+
+class DetallePedidoViewSet(EscrituraSerializadaMixin, viewsets.ModelViewSet):
+    queryset = DetallePedido.objects.con_subtotales()
     serializer_class = DetallePedidoSerializer
     permission_classes = [IsAuthenticated]
 
-class ReservaViewSet(viewsets.ModelViewSet):
-    queryset = Reserva.objects.all()
+    # Los cambios de cantidad hechos aquí también llegan a la cocina
+    def perform_update(self, serializer):
+        anterior = serializer.instance.cantidad
+        with self.escritura():
+            detalle = serializer.save()
+            linea_modificada.send(sender=DetallePedido, pedido_id=detalle.pedido_id, plato=detalle.plato, cantidad=detalle.cantidad - anterior)
+
+    def perform_destroy(self, instance):
+        with self.escritura():
+            linea_modificada.send(sender=DetallePedido, pedido_id=instance.pedido_id, plato=instance.plato, cantidad=-instance.cantidad)
+            instance.delete()
+
+class CocinaViewSet(viewsets.GenericViewSet):
+    """
+    Pantallas de cocina. list: cola pendiente de ?estacion=.
+    esperar: long-poll con ?estacion=&desde=<último id recibido>&espera=<segundos>.
+    """
+    serializer_class = TicketCocinaSerializer
+    permission_classes = [IsAuthenticated]
+    espera_maxima = 30
+
+    def get_queryset(self):
+        return TicketCocina.objects.all()
+
+    def estacion(self, request):
+        estacion = request.query_params.get('estacion')
+        estaciones = [clave for clave, _ in TicketCocina.ESTACION_CHOICES]
+        if estacion not in estaciones:
+            raise ValidationError({'estacion': f'Debe ser una de: {", ".join(estaciones)}.'})
+        return estacion
+
+    def list(self, request):
+        tickets = cocina.cola(self.estacion(request))
+        return Response(self.get_serializer(tickets, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def esperar(self, request):
+        estacion = self.estacion(request)
+        try:
+            desde = int(request.query_params.get('desde', 0))
+            espera = min(float(request.query_params.get('espera', 25)), self.espera_maxima)
+        except ValueError:
+            raise ValidationError({'desde': 'desde y espera deben ser números.'})
+        if hasattr(request, 'metricas'):
+            request.metricas.espera_larga = True
+        tickets = cocina.esperar_tickets(estacion, desde, max(espera, 0))
+        return Response({
+            'cursor': tickets[-1].id if tickets else desde,
+            'tickets': self.get_serializer(tickets, many=True).data,
+        })
+
+    @action(detail=True, methods=['post'])
+    def listo(self, request, pk=None):
+        if not pk.isdigit() or not cocina.marcar_listo(int(pk)):
+            return Response({'error': 'El ticket no existe o ya estaba listo.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'status': 'ticket listo'})
+
+class ReservaViewSet(EscrituraSerializadaMixin, VersionadoListMixin, viewsets.ModelViewSet):
+    queryset = Reserva.objects.select_related('mesa')
     serializer_class = ReservaSerializer
     permission_classes = [IsAdminUser] # Solo los admins pueden gestionar reservas
+    modelos_version = (Reserva, Mesa)
+
+    def filtrar_cambios(self, queryset, since):
+        # mesa_nombre se serializa junto a la reserva
+        return queryset.filter(Q(version__gt=since) | Q(mesa__version__gt=since))
+
+    def comprobar_horario(self, mesa, inicio, fin, excluir=None):
+        cruzadas = Reserva.objects.filter(mesa=mesa).solapadas(inicio, fin)
+        if excluir is not None:
+            cruzadas = cruzadas.exclude(pk=excluir.pk)
+        if mesa and cruzadas.exists():
+            raise ValidationError({'mesa': 'La mesa ya tiene una reserva que se cruza con ese horario.'})
+
+    def reservar_mesa(self, mesa):
+        # Una mesa ocupada o en mantenimiento conserva su estado: la reserva es para otro horario
+        if mesa and mesa.estado == 'Libre' and not Mesa.objects.transicion(mesa, ('Libre',), 'Reservada'):
+            conflicto_mesa(mesa, ('Libre',), 'La mesa cambió de estado; vuelva a intentarlo.')
+
+    def liberar_mesa(self, mesa, reserva):
+        # La mesa vuelve a estar 'Libre' solo si ninguna otra reserva vigente la sigue ocupando
+        if not mesa or mesa.estado != 'Reservada':
+            return
+        if Reserva.objects.filter(mesa=mesa).activas().exclude(pk=reserva.pk).exists():
+            return
+        if not Mesa.objects.transicion(mesa, ('Reservada',), 'Libre'):
+            conflicto_mesa(mesa, ('Reservada',), 'La mesa cambió de estado; vuelva a intentarlo.')
 
     def perform_create(self, serializer):
-        reserva = serializer.save()
-        mesa = reserva.mesa
-        if mesa:
-            mesa.estado = 'Reservada'
-            mesa.save()
+        datos = serializer.validated_data
+        with self.escritura():
+            mesa = datos.get('mesa')
+            self.comprobar_horario(mesa, datos['fecha_hora'], datos['fecha_hora_fin'])
+            serializer.save()
+            self.reservar_mesa(mesa)
+
+    def perform_update(self, serializer):
+        datos, reserva = serializer.validated_data, serializer.instance
+        anterior = reserva.mesa
+        with self.escritura():
+            mesa = datos.get('mesa', anterior)
+            self.comprobar_horario(
+                mesa, datos.get('fecha_hora', reserva.fecha_hora), datos.get('fecha_hora_fin', reserva.fecha_hora_fin),
+                excluir=reserva,
+            )
+            serializer.save()
+            if mesa != anterior:
+                self.liberar_mesa(anterior, reserva)
+                self.reservar_mesa(mesa)
+
+    @action(detail=False, methods=['get'])
+    def disponibilidad(self, request):
+        # ?personas=N&desde=T1[&hasta=T2][&piso=id] -> mesas libres de reservas en [T1, T2), por piso
+        try:
+            personas = int(request.query_params.get('personas', 1))
+        except ValueError:
+            raise ValidationError({'personas': 'Debe ser un número entero.'})
+        desde = parse_datetime(request.query_params.get('desde') or '')
+        if desde is None:
+            raise ValidationError({'desde': 'Fecha y hora inválida (formato ISO 8601).'})
+        if timezone.is_naive(desde):
+            desde = timezone.make_aware(desde)
+        if request.query_params.get('hasta'):
+            hasta = parse_datetime(request.query_params['hasta'])
+            if hasta is None:
+                raise ValidationError({'hasta': 'Fecha y hora inválida (formato ISO 8601).'})
+        else:
+            hasta = desde + duracion_reserva_defecto()
+        if timezone.is_naive(hasta):
+            hasta = timezone.make_aware(hasta)
+        if hasta <= desde:
+            raise ValidationError({'hasta': 'Debe ser posterior a desde.'})
+
+        ocupadas = Reserva.objects.solapadas(desde, hasta).filter(mesa__isnull=False).values('mesa_id')
+        mesas = (
+            Mesa.objects.select_related('piso')
+            .filter(capacidad__gte=personas)
+            .exclude(estado='Mantenimiento')
+            .exclude(id__in=ocupadas)
+        )
+        if request.query_params.get('piso'):
+            try:
+                mesas = mesas.filter(piso_id=int(request.query_params['piso']))
+            except ValueError:
+                raise ValidationError({'piso': 'Debe ser un id de piso.'})
+
+        pisos = {}
+        for mesa in mesas:
+            piso = pisos.setdefault(mesa.piso_id, {
+                'id': mesa.piso_id, 'nombre': mesa.piso.nombre, 'numero': mesa.piso.numero, 'mesas': [],
+            })
+            piso['mesas'].append(MesaSerializer(mesa).data)
+        for piso in pisos.values():
+            # La mesa más chica que alcanza primero
+            piso['mesas'].sort(key=lambda m: m['capacidad'])
+        return Response({
+            'desde': desde, 'hasta': hasta, 'personas': personas,
+            'pisos': sorted(pisos.values(), key=lambda p: p['numero']),
+        })
 
     def perform_destroy(self, instance):
-        # Al eliminar la reserva, la mesa vuelve a estar 'Libre' si no está ocupada
-        mesa = instance.mesa
-        if mesa:
-            mesa.estado = 'Libre'
-            mesa.save()
-        instance.delete()
-
-class EmpleadoViewSet(viewsets.ModelViewSet):
+        with self.escritura():
+            self.liberar_mesa(instance.mesa, instance)
+            instance.delete()
+
+class EsperaViewSet(EscrituraSerializadaMixin, viewsets.ModelViewSet):
+    """
+    Lista de espera de grupos sin reserva (ver espera.py). list: los que esperan, en orden de
+    llegada y con su espera estimada en minutos (?estado= para ver los sentados o cancelados).
+    asignar: sienta al grupo en la mesa libre que mejor le calza; asignar_fila: a toda la fila.
+    """
+    queryset = Espera.objects.select_related('mesa')
+    serializer_class = EsperaSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            estado = self.request.query_params.get('estado', 'Esperando')
+            estados = [clave for clave, _ in Espera.ESTADO_CHOICES]
+            if estado not in estados:
+                raise ValidationError({'estado': f'Debe ser uno de: {", ".join(estados)}.'})
+            queryset = queryset.filter(estado=estado)
+        return queryset
+
+    def get_serializer_context(self):
+        contexto = super().get_serializer_context()
+        if self.action in ['list', 'retrieve']:
+            # Cada estimación depende de los que esperan antes: se calcula toda la fila de una vez
+            contexto['estimadas'] = espera.estimar(Espera.objects.filter(estado='Esperando'))
+        return contexto
+
+    def perform_create(self, serializer):
+        with self.escritura():
+            serializer.save()
+        serializer.context['estimadas'] = espera.estimar(Espera.objects.filter(estado='Esperando'))
+
+    @action(detail=True, methods=['post'])
+    def asignar(self, request, pk=None):
+        grupo = self.get_object()
+        with self.escritura():
+            mesa = espera.asignar(grupo)
+        if mesa is None:
+            grupo.refresh_from_db()
+            if grupo.estado != 'Esperando':
+                raise Conflicto({'error': 'El grupo ya no está esperando.', 'estado': grupo.estado})
+            raise Conflicto({'error': 'No hay una mesa libre donde quepa el grupo.', 'estado': grupo.estado})
+        return Response(self.get_serializer(grupo).data)
+
+    @action(detail=False, methods=['post'])
+    def asignar_fila(self, request):
+        with self.escritura():
+            sentados = espera.asignar_fila()
+        return Response(self.get_serializer(sentados, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def cancelar(self, request, pk=None):
+        grupo = self.get_object()
+        with self.escritura():
+            cancelado = Espera.objects.filter(pk=grupo.pk, estado='Esperando').update(estado='Cancelado')
+        grupo.refresh_from_db()
+        if not cancelado:
+            raise Conflicto({'error': 'El grupo ya no está esperando.', 'estado': grupo.estado})
+        return Response(self.get_serializer(grupo).data)
+
+class EmpleadoViewSet(EscrituraSerializadaMixin, viewsets.ModelViewSet):
     permission_classes = [IsAdminUser]
     queryset = User.objects.filter(is_staff=False)
     def get_serializer_class(self):
@@ -197,6 +575,57 @@ class EmpleadoViewSet(viewsets.ModelViewSet):
             return CreateUserSerializer
         return UserSerializer
     
+class TokenDispositivoViewSet(EscrituraSerializadaMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    # Alta con usuario y contraseña (la app de la tablet); el admin lista y revoca
+    queryset = TokenDispositivo.objects.select_related('usuario')
+    serializer_class = TokenDispositivoSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['usuario', 'revocado']
+    throttle_scope = 'tokens'
+
+    def get_throttles(self):
+        # Solo el alta comprueba contraseñas sin sesión
+        return [ScopedRateThrottle()] if self.action == 'create' else []
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [AllowAny()]
+        if self.action == 'revocar':
+            return [IsAuthenticated()]
+        return [IsAdminUser()]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'revocar' and not self.request.user.is_staff:
+            # Cada mozo puede revocar sus propios tokens
+            queryset = queryset.filter(usuario=self.request.user)
+        return queryset
+
+    def create(self, request):
+        user = authenticate(request, username=request.data.get('username'), password=request.data.get('password'))
+        if user is None:
+            return Response({'error': 'Usuario o contraseña inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+        # La contraseña ya se comprobó: el lock de escritura se toma solo para el alta
+        with self.escritura():
+            registro, token = tokens.emitir(user, str(request.data.get('dispositivo') or request.headers.get('User-Agent', '')))
+        return Response({**self.get_serializer(registro).data, 'token': token}, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def revocar(self, request, pk=None):
+        registro = self.get_object()
+        with self.escritura():
+            tokens.revocar(TokenDispositivo.objects.filter(pk=registro.pk))
+        registro.refresh_from_db()
+        return Response(self.get_serializer(registro).data)
+
+    @action(detail=False, methods=['post'])
+    def revocar_usuario(self, request):
+        usuario = str(request.data.get('usuario', ''))
+        if not usuario.isdigit():
+            raise ValidationError({'usuario': 'Debe ser el id de un usuario.'})
+        with self.escritura():
+            revocados = tokens.revocar(TokenDispositivo.objects.filter(usuario=usuario))
+        return Response({'revocados': revocados})
 
 def carta_view(request):
     platos = Plato.objects.all()
@@ -210,9 +639,13 @@ def carta_view(request):
     platos = Plato.objects.all()
     return render(request, 'carta.html', {'platos': platos, 'form': form})
 
-class IncidenteViewSet(viewsets.ModelViewSet):
+class IncidenteViewSet(EscrituraSerializadaMixin, viewsets.ModelViewSet):
     queryset = Incidente.objects.all()
     serializer_class = IncidenteSerializer
+    filter_backends = [DjangoFilterBackend, BusquedaTextoFilter]
+    filterset_fields = ['visto']
+    # ?search= mira las 5000 coincidencias más recientes del registro (ver busqueda.buscar)
+    busqueda_ventana = 5000
 
     def get_permissions(self):
         # El admin (staff) puede hacer de todo.
@@ -229,5 +662,70 @@ class IncidenteViewSet(viewsets.ModelViewSet):
     def marcar_visto(self, request, pk=None):
         incidente = self.get_object()
         incidente.visto = True
-        incidente.save()
-        return Response({'status': 'incidente marcado como visto'}, status=status.HTTP_200_OK)
\ No newline at end of file
+        with self.escritura():
+            incidente.save()
+        return Response({'status': 'incidente marcado como visto'}, status=status.HTTP_200_OK)
+
+class ReporteViewSet(viewsets.ViewSet):
+    # Tableros de ventas servidos desde los acumulados diarios (ResumenVentas)
+    permission_classes = [IsAdminUser]
+
+    def periodo_y_fecha(self, request):
+        periodo = request.query_params.get('periodo', 'semana')
+        if periodo not in reportes.PERIODOS:
+            raise ValidationError({'periodo': f'Debe ser uno de: {", ".join(reportes.PERIODOS)}.'})
+        fecha = request.query_params.get('fecha')
+        fecha = parse_date(fecha) if fecha else timezone.localdate()
+        if fecha is None:
+            raise ValidationError({'fecha': 'Fecha inválida (AAAA-MM-DD).'})
+        return periodo, fecha
+
+    def list(self, request):
+        return Response(reportes.resumen_periodo(*self.periodo_y_fecha(request)))
+
+    @action(detail=False, methods=['get'], url_path='sucursales')
+    def por_sucursal(self, request):
+        # Los mismos acumulados de todas las sucursales (o las de ?sucursales=a,b) y su suma
+        periodo, fecha = self.periodo_y_fecha(request)
+        elegidas = request.query_params.get('sucursales')
+        elegidas = [s.strip() for s in elegidas.split(',') if s.strip()] if elegidas else None
+        desconocidas = [s for s in elegidas or [] if s not in sucursales.todas()]
+        if desconocidas:
+            raise ValidationError({'sucursales': f'Sucursales desconocidas: {", ".join(desconocidas)}.'})
+        return Response(reportes.resumen_sucursales(periodo, fecha, elegidas))
+
+class BootstrapViewSet(viewsets.ViewSet):
+    """
+    Todo lo que necesita cada tablero al abrirse, en una sola respuesta.
+    ?campos=mesas,platos limita las secciones; cada sección cuesta un número fijo de consultas.
+    """
+    secciones_dashboard = {
+        'mesas': lambda request: MesaSerializer(Mesa.objects.all(), many=True).data,
+        'platos': lambda request: PlatoSerializer(Plato.objects.all(), many=True, context={'request': request}).data,
+        'incidentes': lambda request: IncidenteSerializer(Incidente.objects.filter(visto=False), many=True).data,
+    }
+    secciones_admin = {
+        'pisos': lambda request: PisoSerializer(Piso.objects.prefetch_related('mesas'), many=True).data,
+        'reservas': lambda request: ReservaSerializer(Reserva.objects.select_related('mesa'), many=True).data,
+    }
+
+    def get_permissions(self):
+        if self.action == 'admin':
+            return [IsAdminUser()]
+        return [IsAuthenticated()]
+
+    def armar(self, request, secciones):
+        campos = request.query_params.get('campos')
+        elegidas = [c.strip() for c in campos.split(',') if c.strip()] if campos else list(secciones)
+        desconocidas = [c for c in elegidas if c not in secciones]
+        if desconocidas:
+            raise ValidationError({'campos': f'Secciones desconocidas: {", ".join(desconocidas)}. Disponibles: {", ".join(secciones)}.'})
+        return Response({campo: secciones[campo](request) for campo in elegidas})
+
+    @action(detail=False, methods=['get'])
+    def dashboard(self, request):
+        return self.armar(request, self.secciones_dashboard)
+
+    @action(detail=False, methods=['get'])
+    def admin(self, request):
+        return self.armar(request, self.secciones_admin)